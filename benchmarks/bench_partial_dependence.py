@@ -0,0 +1,395 @@
+"""
+Benchmark how :func:`pdpilot.partial_dependence` scales.
+
+Each benchmark runs ``partial_dependence`` on a synthetic dataset with a cheap,
+deterministic prediction function, so that the time measured is spent in
+PDPilot rather than in a model. Starting from a base configuration, one
+parameter at a time is swept: the number of rows, the number of features,
+``resolution``, ``num_clusters_extent``, ``n_jobs``, and
+``compute_two_way_pdps``. For each configuration, this reports the wall time,
+the number of rows scored per second, and the time of each phase from the
+run's profile. With ``--memory``, each configuration is run once more with
+tracemalloc to measure the peak memory of each phase. This is only done when
+``n_jobs`` is 1, since the memory of other processes is not traced.
+
+Results can be saved as a baseline and later runs compared against it::
+
+    python benchmarks/bench_partial_dependence.py --suite quick --save-baseline main
+    python benchmarks/bench_partial_dependence.py --suite quick --compare main
+
+Baselines are stored in ``benchmarks/baselines`` and are only comparable
+between runs on the same machine.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import pdpilot
+from pdpilot import partial_dependence
+
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+
+SUITES = {
+    "quick": {
+        "base": {
+            "num_rows": 2000,
+            "num_features": 4,
+            "resolution": 20,
+            "num_clusters_extent": (2, 5),
+            "n_jobs": 1,
+            "compute_two_way_pdps": False,
+        },
+        "sweeps": {
+            "num_rows": [1000, 2000, 10_000],
+            "num_features": [4, 8],
+            "resolution": [10, 20, 40],
+            "num_clusters_extent": [(2, 3), (2, 5), (2, 8)],
+            "n_jobs": [1, 2],
+            "compute_two_way_pdps": [False, True],
+        },
+    },
+    "full": {
+        "base": {
+            "num_rows": 10_000,
+            "num_features": 8,
+            "resolution": 20,
+            "num_clusters_extent": (2, 5),
+            "n_jobs": 1,
+            "compute_two_way_pdps": False,
+        },
+        "sweeps": {
+            "num_rows": [1000, 10_000, 100_000, 1_000_000],
+            "num_features": [4, 8, 16, 32],
+            "resolution": [10, 20, 40],
+            "num_clusters_extent": [(2, 3), (2, 5), (2, 8)],
+            "n_jobs": [1, 2, 4],
+            "compute_two_way_pdps": [False, True],
+        },
+    },
+}
+
+# phases that are never nested within one another, so that the peak memory
+# of each one can be measured separately
+MEMORY_PHASES = [
+    "metadata",
+    "ice_lines",
+    "clustering",
+    "silhouette",
+    "explanation",
+    "two_way_grid",
+]
+
+
+class LinearPredict:
+    """A cheap model with one interaction, so that some ICE lines have
+    clusters and some pairs of features get two-way PDPs."""
+
+    def __init__(self, num_features):
+        self.weights = np.linspace(1, 0.1, num_features)
+
+    def __call__(self, data):
+        x = np.asarray(data, dtype=float)
+        return x @ self.weights + 2 * x[:, 0] * x[:, 1]
+
+
+def make_dataset(num_rows, num_features, seed=0):
+    """Make a dataset whose even columns are continuous and whose odd columns
+    are integers from 0 to 9."""
+    rng = np.random.default_rng(seed)
+
+    return pd.DataFrame(
+        {
+            f"x{i}": (
+                rng.uniform(low=-1, high=1, size=num_rows)
+                if i % 2 == 0
+                else rng.integers(0, 10, size=num_rows)
+            )
+            for i in range(num_features)
+        }
+    )
+
+
+def get_configs(suite):
+    """Get the configurations of a suite, each with a name that identifies it
+    in a baseline."""
+    base = SUITES[suite]["base"]
+    configs = {"base": base}
+
+    for param, values in SUITES[suite]["sweeps"].items():
+        for value in values:
+            if value != base[param]:
+                configs[f"{param}={value}"] = {**base, param: value}
+
+    return configs
+
+
+class _PhaseMemory:
+    """A profile hook that records the peak memory that a phase allocates."""
+
+    peaks = {}
+
+    def __init__(self, phase):
+        self.phase = phase
+
+    def __enter__(self):
+        self.start, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+
+    def __exit__(self, *args):
+        _, peak = tracemalloc.get_traced_memory()
+        previous = _PhaseMemory.peaks.get(self.phase, 0)
+        _PhaseMemory.peaks[self.phase] = max(previous, peak - self.start)
+
+
+def _run(config, df, **kwargs):
+    profiles = []
+
+    partial_dependence(
+        predict=LinearPredict(config["num_features"]),
+        df=df,
+        features=list(df.columns),
+        resolution=config["resolution"],
+        num_clusters_extent=config["num_clusters_extent"],
+        n_jobs=config["n_jobs"],
+        compute_two_way_pdps=config["compute_two_way_pdps"],
+        seed=0,
+        logging_level="ERROR",
+        profile_callback=profiles.append,
+        **kwargs,
+    )
+
+    return profiles[0]
+
+
+def _get_stage_rows_per_second(profile, task, phase):
+    tasks = [t for t in profile["tasks"] if t["task"] == task]
+    rows = sum(t["phases"].get("predict", {}).get("rows", 0) for t in tasks)
+    seconds = sum(t["phases"].get(phase, {}).get("seconds", 0) for t in tasks)
+    return rows / seconds if seconds > 0 else None
+
+
+def _make_memory_hook(phase):
+    return lambda: _PhaseMemory(phase)
+
+
+def _measure_memory(config, df):
+    _PhaseMemory.peaks = {}
+    hooks = {phase: _make_memory_hook(phase) for phase in MEMORY_PHASES}
+
+    tracemalloc.start()
+
+    try:
+        _run(config, df, profile_hooks=hooks)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # the peak since the last phase started, or since the run started
+    peak = max([peak, *_PhaseMemory.peaks.values()])
+    return peak, dict(_PhaseMemory.peaks)
+
+
+def run_benchmark(name, config, repeat=1, memory=False):
+    """Run one configuration and summarize its profile.
+
+    :param name: The name of the configuration.
+    :type name: str
+    :param config: The parameters of the run.
+    :type config: dict
+    :param repeat: The number of times to run it. The fastest run is kept.
+    :type repeat: int
+    :param memory: Whether to also measure the peak memory of each phase.
+    :type memory: bool
+    :return: The summary.
+    :rtype: dict
+    """
+    df = make_dataset(config["num_rows"], config["num_features"])
+
+    best_seconds = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        profile = _run(config, df)
+        seconds = time.perf_counter() - start
+
+        if best_seconds is None or seconds < best_seconds:
+            best_seconds = seconds
+            best_profile = profile
+
+    rows_scored = best_profile["phases"].get("predict", {}).get("rows", 0)
+
+    phases = {
+        phase: {"seconds": totals["seconds"], "calls": totals["calls"]}
+        for phase, totals in best_profile["phases"].items()
+    }
+
+    for phase, task in [("ice_lines", "one_way"), ("two_way_grid", "two_way")]:
+        if phase in phases:
+            phases[phase]["rows_per_second"] = _get_stage_rows_per_second(
+                best_profile, task, phase
+            )
+
+    result = {
+        "name": name,
+        "params": {
+            **config,
+            "num_clusters_extent": list(config["num_clusters_extent"]),
+        },
+        "seconds": best_seconds,
+        "rows_scored": rows_scored,
+        "rows_per_second": rows_scored / best_seconds,
+        "num_two_way_pdps": sum(t["task"] == "two_way" for t in best_profile["tasks"]),
+        "peak_memory_mb": None,
+        "phases": phases,
+    }
+
+    if memory and config["n_jobs"] == 1:
+        peak, phase_peaks = _measure_memory(config, df)
+        result["peak_memory_mb"] = peak / 2**20
+
+        for phase, phase_peak in phase_peaks.items():
+            if phase in phases:
+                phases[phase]["peak_memory_mb"] = phase_peak / 2**20
+
+    return result
+
+
+def get_environment():
+    """Describe the machine and the versions that the benchmarks ran with."""
+    return {
+        "pdpilot": pdpilot.__version__,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print how the time and memory of each configuration changed from the
+    baseline.
+
+    :return: The names of the configurations that got slower or used more
+        memory by more than ``threshold``, as a fraction of the baseline.
+    :rtype: list[str]
+    """
+    name_to_baseline = {result["name"]: result for result in baseline["results"]}
+    regressions = []
+
+    print(
+        f"{'benchmark':<32} {'seconds':>10} {'change':>8} {'memory MB':>10} {'change':>8}"
+    )
+
+    for result in results:
+        old = name_to_baseline.get(result["name"])
+
+        if old is None:
+            continue
+
+        time_change = result["seconds"] / old["seconds"] - 1
+
+        if result["peak_memory_mb"] is not None and old["peak_memory_mb"]:
+            memory = f"{result['peak_memory_mb']:.1f}"
+            memory_change = result["peak_memory_mb"] / old["peak_memory_mb"] - 1
+            memory_change_str = f"{memory_change:+.0%}"
+        else:
+            memory = memory_change_str = "-"
+            memory_change = 0
+
+        regressed = time_change > threshold or memory_change > threshold
+
+        if regressed:
+            regressions.append(result["name"])
+
+        print(
+            f"{result['name']:<32} {result['seconds']:>10.3f} {time_change:>+8.0%}"
+            f" {memory:>10} {memory_change_str:>8}{'  !' if regressed else ''}"
+        )
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--suite", choices=list(SUITES), default="quick")
+    parser.add_argument(
+        "--only",
+        action="append",
+        help="Only run the configurations with this name, such as num_rows=1000.",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--memory", action="store_true", help="Also measure peak memory."
+    )
+    parser.add_argument("--output", type=Path, help="Write the results to this file.")
+    parser.add_argument(
+        "--save-baseline", metavar="NAME", help="Save the results as a baseline."
+    )
+    parser.add_argument(
+        "--compare", metavar="NAME", help="Compare the results to a baseline."
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="The relative increase in time or memory that counts as a regression.",
+    )
+    args = parser.parse_args(argv)
+
+    configs = get_configs(args.suite)
+
+    if args.only:
+        configs = {name: configs[name] for name in args.only}
+
+    results = []
+
+    for name, config in configs.items():
+        result = run_benchmark(name, config, repeat=args.repeat, memory=args.memory)
+        results.append(result)
+
+        print(
+            f"{name:<32} {result['seconds']:>8.3f} s"
+            f" {result['rows_per_second']:>12,.0f} rows/s",
+            flush=True,
+        )
+
+    report = {
+        "suite": args.suite,
+        "environment": get_environment(),
+        "results": results,
+    }
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    if args.save_baseline:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        path = BASELINE_DIR / f"{args.save_baseline}.json"
+        path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Saved baseline to {path}.")
+
+    if args.compare:
+        path = BASELINE_DIR / f"{args.compare}.json"
+        baseline = json.loads(path.read_text(encoding="utf-8"))
+        print()
+        regressions = compare(results, baseline, args.threshold)
+
+        if regressions:
+            print(f"\n{len(regressions)} benchmarks regressed.")
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,7 +2,11 @@
 # coding: utf-8
 
 from pdpilot.widget import PDPilotWidget
-from pdpilot.pdp import partial_dependence
+from pdpilot.pdp import iter_partial_dependence, partial_dependence
+from pdpilot.streaming import partial_dependence_streaming
+from pdpilot.results_file import read_results, write_results
+from pdpilot.async_predict import AsyncPredictor
+from pdpilot.additive import AdditiveModel, LinearModel
 from pdpilot._version import __version__, version_info
 
 
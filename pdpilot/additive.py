@@ -0,0 +1,115 @@
+"""
+Adapters for additive models, such as linear models and GAMs, whose output is
+an intercept plus a contribution from each column, optionally passed through a
+link function.
+
+When one of these is passed as ``predict`` to
+:func:`pdpilot.partial_dependence`, the ICE lines and PDPs are computed from
+the contributions directly: every grid value only changes the contributions of
+the perturbed feature's columns, so the model does not need to be evaluated on
+a perturbed copy of the dataset for each one.
+"""
+
+from abc import ABC, abstractmethod
+
+import numpy as np
+from scipy.special import expit
+
+LINKS = ["identity", "logistic"]
+
+
+class AdditiveModel(ABC):
+    """Base class for additive models. Subclasses implement
+    :meth:`contributions`, and cannot be instantiated without it.
+
+    The model's prediction for an instance is
+    ``inverse_link(intercept + sum(contributions))``. With the identity link,
+    every two-way PDP is the sum of its one-way PDPs, so its ``H`` statistic
+    is zero.
+
+    :param intercept: The model's output when every contribution is zero.
+        Defaults to 0.
+    :type intercept: float, optional
+    :param link: "identity" for regression, or "logistic" for a binary
+        classifier whose contributions are on the log-odds scale and whose
+        predictions are probabilities. Defaults to "identity".
+    :type link: str, optional
+    """
+
+    def __init__(self, intercept=0.0, link="identity"):
+        if link not in LINKS:
+            raise ValueError(f"Unknown link {link}.")
+
+        self.intercept = intercept
+        self.link = link
+
+    @abstractmethod
+    def contributions(self, data):
+        """Get the contribution of each column to the prediction for each
+        instance.
+
+        :param data: Instances in the same form that ``predict`` is passed,
+            a DataFrame or a 2-D array with the columns of the dataset.
+        :type data: pd.DataFrame | np.ndarray
+        :return: Array with shape (number of instances, number of columns).
+        :rtype: np.ndarray
+        """
+
+    def inverse_link(self, raw):
+        """Convert the sum of the intercept and contributions to predictions."""
+        if self.link == "logistic":
+            return expit(raw)
+
+        return raw
+
+    def __call__(self, data):
+        raw = self.intercept + self.contributions(data).sum(axis=1)
+        return self.inverse_link(raw)
+
+
+class LinearModel(AdditiveModel):
+    """A linear model, where each column's contribution is its value times its
+    coefficient.
+
+    :param coef: One coefficient per column of the dataset.
+    :type coef: list[float] | np.ndarray
+    :param intercept: The intercept. Defaults to 0.
+    :type intercept: float, optional
+    :param link: See :class:`AdditiveModel`. Defaults to "identity".
+    :type link: str, optional
+    """
+
+    def __init__(self, coef, intercept=0.0, link="identity"):
+        super().__init__(intercept=intercept, link=link)
+        self.coef = np.asarray(coef, dtype=float)
+
+    def contributions(self, data):
+        return np.asarray(data, dtype=float) * self.coef
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Create an adapter for a fitted scikit-learn linear model, such as
+        ``LinearRegression``, ``Ridge``, or binary ``LogisticRegression``. For
+        classifiers, the predictions are the probabilities of the positive
+        class, as given by ``model.predict_proba(data)[:, 1]``.
+
+        :param model: The fitted model.
+        :type model: sklearn.base.BaseEstimator
+        :raises ValueError: If the model has more than one output or class.
+        :return: The adapter.
+        :rtype: LinearModel
+        """
+        coef = np.asarray(model.coef_)
+
+        if coef.ndim > 1 and coef.shape[0] != 1:
+            raise ValueError(
+                "Only linear models with one output or two classes are supported."
+            )
+
+        is_classifier = hasattr(model, "classes_")
+
+        return cls(
+            coef=coef.ravel(),
+            intercept=np.ravel(model.intercept_)[0].item(),
+            link="logistic" if is_classifier else "identity",
+        )
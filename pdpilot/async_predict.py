@@ -0,0 +1,202 @@
+"""
+Call an asynchronous prediction function, such as a client for a remote model
+server, from the synchronous code that computes the PDPs.
+"""
+
+import asyncio
+import inspect
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+class AsyncPredictor:
+    """Wraps an ``async`` prediction function so that it can be called like a
+    regular one. Calls from any thread are run on an event loop in a background
+    thread, so calls made by different threads are sent concurrently.
+
+    :param predict: An ``async`` function whose input is a DataFrame or a 2-D
+        array of instances and that returns the model's predictions on them.
+    :type predict: Callable[[pd.DataFrame | np.ndarray], Awaitable[list[float]]]
+    :param max_in_flight: The maximum number of calls to ``predict`` that can
+        be awaited at once. Defaults to 8.
+    :type max_in_flight: int, optional
+    :param max_batch_rows: If set, calls with fewer rows than this that are
+        made within ``max_delay`` seconds of each other are combined into one
+        call to ``predict`` with up to this many rows. Defaults to None.
+    :type max_batch_rows: int | None, optional
+    :param max_delay: How long to wait for more calls to combine, in seconds.
+        Defaults to 0.005.
+    :type max_delay: float, optional
+    :param max_retries: The number of times to retry a call to ``predict``
+        that raises one of ``retry_on``. Defaults to 3.
+    :type max_retries: int, optional
+    :param retry_delay: The number of seconds to wait before the first retry.
+        The wait doubles with each retry. Defaults to 0.1.
+    :type retry_delay: float, optional
+    :param retry_on: The exceptions that are treated as transient failures.
+        Defaults to ``(OSError, EOFError, asyncio.TimeoutError)``, which
+        includes connection errors and connections that close early.
+    :type retry_on: tuple[type[Exception], ...], optional
+    """
+
+    def __init__(
+        self,
+        predict,
+        max_in_flight=8,
+        max_batch_rows=None,
+        max_delay=0.005,
+        max_retries=3,
+        retry_delay=0.1,
+        retry_on=(OSError, EOFError, asyncio.TimeoutError),
+    ):
+        if max_in_flight < 1:
+            raise ValueError(
+                f"max_in_flight must be positive, but got {max_in_flight}."
+            )
+
+        self.predict = predict
+        self.max_in_flight = max_in_flight
+        self.max_batch_rows = max_batch_rows
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.retry_on = retry_on
+        self._set_up()
+
+    def _set_up(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._reset_loop_state()
+
+    def _reset_loop_state(self):
+        # these are bound to the event loop that they were made on
+        self._semaphore = None
+        # calls waiting to be combined, as (data, future) pairs
+        self._pending = []
+        self._pending_rows = 0
+        self._flush_handle = None
+
+    def __call__(self, data):
+        loop = self._get_loop()
+        future = asyncio.run_coroutine_threadsafe(self._submit(data), loop)
+        return future.result()
+
+    def close(self):
+        """Stop the event loop. It is started again if the predictor is called."""
+        with self._lock:
+            if self._loop is None:
+                return
+
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+            self._reset_loop_state()
+
+    def _get_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="pdpilot-async", daemon=True
+                )
+                self._thread.start()
+
+            return self._loop
+
+    async def _submit(self, data):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        if self.max_batch_rows is None or len(data) >= self.max_batch_rows:
+            return await self._call(data)
+
+        if self._pending_rows + len(data) > self.max_batch_rows:
+            self._flush()
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((data, future))
+        self._pending_rows += len(data)
+
+        if self._pending_rows >= self.max_batch_rows:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                self.max_delay, self._flush
+            )
+
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        if self._pending:
+            asyncio.ensure_future(self._call_combined(self._pending))
+            self._pending = []
+            self._pending_rows = 0
+
+    async def _call_combined(self, batch):
+        try:
+            parts = [data for data, _ in batch]
+
+            if isinstance(parts[0], pd.DataFrame):
+                combined = pd.concat(parts, ignore_index=True)
+            else:
+                combined = np.concatenate(parts)
+
+            predictions = await self._call(combined)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        start = 0
+
+        for data, future in batch:
+            future.set_result(predictions[start : start + len(data)])
+            start += len(data)
+
+    async def _call(self, data):
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    return np.asarray(await self.predict(data))
+                except self.retry_on:
+                    if attempt == self.max_retries:
+                        raise
+
+                await asyncio.sleep(self.retry_delay * 2**attempt)
+
+    def __getstate__(self):
+        # the event loop is not sent to other processes. each one starts its own.
+        state = self.__dict__.copy()
+
+        for key in [
+            "_lock",
+            "_loop",
+            "_thread",
+            "_semaphore",
+            "_pending",
+            "_pending_rows",
+            "_flush_handle",
+        ]:
+            del state[key]
+
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._set_up()
+
+
+def is_async_function(fn):
+    """Check if calling a function returns a coroutine that needs to be awaited."""
+    return inspect.iscoroutinefunction(fn) or inspect.iscoroutinefunction(
+        getattr(fn, "__call__", None)
+    )
@@ -0,0 +1,158 @@
+"""
+Persistent on-disk cache of model predictions.
+
+ICE matrices and two-way grids are stored as ``.npy`` files named by a hash of
+the model, the dataset, the features, and the grid values. Since none of the
+clustering parameters affect the predictions, rerunning
+:func:`pdpilot.partial_dependence` with different clustering parameters can
+reuse them without calling the model.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+from pdpilot.async_predict import AsyncPredictor
+
+
+class PredictionCache:
+    """A size-bounded directory of cached predictions. When the directory
+    grows larger than ``max_size``, the least recently used files are deleted.
+    Files are written atomically, so the cache can be shared by parallel workers.
+
+    :param directory: The directory to store the predictions in. It is created
+        if it does not exist.
+    :type directory: str | Path
+    :param model_id: Identifies the model that made the predictions.
+    :type model_id: str
+    :param dataset_id: Identifies the dataset that the predictions were made on.
+    :type dataset_id: str
+    :param max_size: The maximum total size of the cached files in bytes.
+    :type max_size: int
+    """
+
+    def __init__(self, directory, model_id, dataset_id, max_size):
+        self.directory = Path(directory).resolve()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.model_id = model_id
+        self.dataset_id = dataset_id
+        self.max_size = max_size
+
+    def key(self, kind, features, cells):
+        """Get the key for the predictions of a grid.
+
+        :param kind: The type of the predictions, such as "ice" or "two_way".
+        :param features: The names of the features in the grid.
+        :param cells: The values of the features in each cell of the grid.
+        :return: A hex digest.
+        :rtype: str
+        """
+        description = json.dumps(
+            [self.model_id, self.dataset_id, kind, features, cells], default=str
+        )
+        return hashlib.sha256(description.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Get cached predictions, or None if they are not in the cache."""
+        path = self._path(key)
+
+        try:
+            predictions = np.load(path)
+        except (OSError, ValueError):
+            return None
+
+        try:
+            # mark as recently used
+            os.utime(path)
+        except OSError:
+            pass
+
+        return predictions
+
+    def put(self, key, predictions):
+        """Add predictions to the cache and evict old ones if it is too large."""
+        predictions = np.asarray(predictions)
+
+        if predictions.nbytes > self.max_size:
+            return
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, predictions)
+
+        os.replace(tmp_path, self._path(key))
+
+        self._evict()
+
+    def _path(self, key):
+        return self.directory / f"{key}.npy"
+
+    def _evict(self):
+        entries = []
+
+        for path in self.directory.glob("*.npy"):
+            try:
+                stat = path.stat()
+            except OSError:
+                # deleted by another worker
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total_size <= self.max_size:
+                break
+
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+            total_size -= size
+
+
+def get_model_id(predict):
+    """Hash a prediction function. For a bound method such as ``model.predict``,
+    this includes the fitted model, and for a callable object, such as an
+    :class:`pdpilot.AdditiveModel`, it includes the object's attributes.
+
+    :raises ValueError: Raised when the function cannot be hashed, or when it is
+        a plain function. Only the name of a function is hashed, not the model
+        that it calls, so the model could change without changing its hash.
+    """
+    # an AsyncPredictor is identified by the function that it wraps, since its
+    # settings and event loop do not change the predictions
+    if isinstance(predict, AsyncPredictor):
+        predict = predict.predict
+
+    if inspect.isfunction(predict):
+        raise ValueError(
+            f"Cannot identify the model that the function {predict.__qualname__}"
+            " calls, so the cache could return the predictions of another model."
+            " Pass cache_model_id, or pass a method of the model such as"
+            " model.predict."
+        )
+
+    if inspect.ismethod(predict):
+        predict = (predict.__self__, predict.__name__)
+
+    try:
+        return joblib.hash(predict)
+    except Exception as e:
+        raise ValueError(
+            "Could not hash the predict function to identify the model in the "
+            "cache. Pass cache_model_id instead."
+        ) from e
+
+
+def get_dataset_id(df):
+    """Hash a DataFrame's contents."""
+    return joblib.hash(df)
@@ -0,0 +1,84 @@
+"""
+Save the finished parts of a :func:`pdpilot.partial_dependence` run so that an
+interrupted run can be resumed.
+
+Each one-way and two-way result is written to its own file as soon as it is
+done. The files for a run are stored in a subdirectory named by a hash of the
+model, the dataset, the parameters, and the seed, so a rerun with the same
+inputs finds them and runs with different inputs do not.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import joblib
+
+
+class Checkpoint:
+    """A directory of finished results for one run.
+    Files are written atomically, so a run that is stopped while writing
+    does not leave behind a partial result.
+
+    :param directory: The directory to store the checkpoints of all runs in.
+        It is created if it does not exist.
+    :type directory: str | Path
+    :param run_id: Identifies the run. See :func:`get_run_id`.
+    :type run_id: str
+    """
+
+    def __init__(self, directory, run_id):
+        self.directory = Path(directory).resolve() / run_id
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def get(self, kind, features):
+        """Get a saved result, or None if it has not been saved.
+
+        :param kind: The type of the result, such as "one_way" or "two_way".
+        :type kind: str
+        :param features: The features that the result is for.
+        :type features: list[str]
+        """
+        try:
+            return joblib.load(self._path(kind, features))
+        except Exception:
+            # the file is missing, or it is truncated or corrupt, which makes
+            # unpickling raise errors such as UnpicklingError, KeyError, or
+            # struct.error. either way, the result is computed again.
+            return None
+
+    def put(self, kind, features, result):
+        """Save a result."""
+        path = self._path(kind, features)
+        path.parent.mkdir(exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+
+        with os.fdopen(fd, "wb") as f:
+            joblib.dump(result, f)
+
+        os.replace(tmp_path, path)
+
+    def _path(self, kind, features):
+        name = hashlib.sha256(json.dumps(list(features)).encode("utf-8")).hexdigest()
+        return self.directory / kind / f"{name}.pkl"
+
+
+def get_run_id(model_id, dataset_id, params):
+    """Hash the inputs that determine the results of a run.
+
+    :param model_id: Identifies the model.
+    :type model_id: str
+    :param dataset_id: Identifies the dataset.
+    :type dataset_id: str
+    :param params: The parameters of the run, including the seed.
+    :type params: dict
+    :return: A hex digest.
+    :rtype: str
+    """
+    description = json.dumps(
+        [model_id, dataset_id, params], sort_keys=True, default=str
+    )
+    return hashlib.sha256(description.encode("utf-8")).hexdigest()
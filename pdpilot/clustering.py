@@ -0,0 +1,392 @@
+"""
+Cluster ICE lines and choose the number of clusters.
+"""
+
+import warnings
+
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.metrics import silhouette_score
+from sklearn.metrics.pairwise import euclidean_distances
+
+from pdpilot.profiling import profile_phase
+
+CLUSTER_METHODS = ["kmeans", "minibatch", "batched"]
+
+SILHOUETTE_METHODS = ["auto", "exact", "chunked", "sampled", "simplified"]
+
+# the maximum number of pairwise distances to hold in memory at once
+# when computing the silhouette score in chunks
+_CHUNK_NUM_DISTANCES = 2**24
+
+# the maximum number of values in the arrays of one batch of batched k-means
+_BATCH_NUM_VALUES = 2**24
+
+
+def iter_clusterings(lines, num_clusters_extent, method, sample_size, random_state):
+    """Cluster the lines with each number of clusters in ``num_clusters_extent``.
+
+    :param lines: The lines to cluster, with one row per line.
+    :type lines: np.ndarray
+    :param num_clusters_extent: The minimum and maximum number of clusters.
+    :type num_clusters_extent: tuple[int, int]
+    :param method: "kmeans" runs k-means with several initializations on all
+        of the lines for each number of clusters. "minibatch" runs mini-batch
+        k-means on a random sample of at most ``sample_size`` lines and then
+        assigns every line to its nearest center. The clustering with k + 1
+        clusters starts from the centers for k clusters plus one new center.
+        "batched" runs :func:`batched_kmeans` on these lines alone, which is
+        mainly useful for clustering the lines of many features at once.
+    :type method: str
+    :param sample_size: The number of lines to fit on for "minibatch".
+    :type sample_size: int
+    :param random_state: Used to initialize the clusters and sample the lines.
+    :type random_state: np.random.RandomState
+    :return: Yields the number of clusters, the cluster of each line, and the
+        cluster centers.
+    :rtype: Iterator[tuple[int, np.ndarray, np.ndarray]]
+    """
+    if method == "kmeans":
+        for n_clusters in range(num_clusters_extent[0], num_clusters_extent[1] + 1):
+            cluster_model = KMeans(
+                n_clusters=n_clusters,
+                init="k-means++",
+                n_init=5,
+                max_iter=300,
+                algorithm="lloyd",
+                random_state=random_state,
+            )
+            _fit_quietly(cluster_model, lines)
+
+            yield n_clusters, cluster_model.labels_, cluster_model.cluster_centers_
+
+        return
+
+    if method == "batched":
+        with profile_phase("clustering"):
+            [clusterings] = batched_kmeans(
+                lines[np.newaxis], num_clusters_extent, random_state
+            )
+        yield from clusterings
+        return
+
+    if lines.shape[0] > sample_size:
+        sample = lines[random_state.choice(lines.shape[0], sample_size, replace=False)]
+    else:
+        sample = lines
+
+    centers = None
+
+    for n_clusters in range(num_clusters_extent[0], num_clusters_extent[1] + 1):
+        if centers is None:
+            init = "k-means++"
+            n_init = 3
+        else:
+            # warm start from the previous solution
+            init = np.vstack([centers, _get_new_center(sample, centers, random_state)])
+            n_init = 1
+
+        cluster_model = MiniBatchKMeans(
+            n_clusters=n_clusters,
+            init=init,
+            n_init=n_init,
+            batch_size=1024,
+            random_state=random_state,
+        )
+        _fit_quietly(cluster_model, sample)
+
+        centers = cluster_model.cluster_centers_
+        labels = (
+            cluster_model.labels_ if sample is lines else cluster_model.predict(lines)
+        )
+
+        yield n_clusters, labels, centers
+
+
+def batched_kmeans(lines, num_clusters_extent, random_state, n_init=3, max_iter=100):
+    """Cluster the lines of several features at once with k-means, using
+    NumPy operations over all of the features rather than separate calls to
+    scikit-learn for each feature and number of clusters.
+
+    :param lines: Array with shape (number of features, number of lines,
+        number of dimensions).
+    :type lines: np.ndarray
+    :param num_clusters_extent: The minimum and maximum number of clusters.
+    :type num_clusters_extent: tuple[int, int]
+    :param random_state: Used to initialize the clusters.
+    :type random_state: np.random.RandomState
+    :param n_init: The number of k-means++ initializations to run. The one
+        with the lowest inertia is kept.
+    :type n_init: int
+    :param max_iter: The maximum number of iterations of Lloyd's algorithm.
+    :type max_iter: int
+    :return: For each feature, a list of the number of clusters, the cluster
+        of each line, and the cluster centers, in the same form as
+        :func:`iter_clusterings`.
+    :rtype: list[list[tuple[int, np.ndarray, np.ndarray]]]
+    """
+    num_features, num_lines, num_dims = lines.shape
+    max_clusters = num_clusters_extent[1]
+
+    # bound the memory used for the distances and the repeated lines
+    batch_size = max(
+        1, _BATCH_NUM_VALUES // (n_init * num_lines * max(max_clusters, num_dims))
+    )
+
+    results = [[] for _ in range(num_features)]
+
+    for start in range(0, num_features, batch_size):
+        end = min(start + batch_size, num_features)
+
+        # each initialization is an extra entry along the first axis
+        batch = np.repeat(lines[start:end], n_init, axis=0)
+        squared_norms = np.square(batch).sum(axis=2)
+
+        for n_clusters in range(num_clusters_extent[0], max_clusters + 1):
+            centers = _batched_kmeans_plusplus(
+                batch, squared_norms, n_clusters, random_state
+            )
+            labels, inertia, centers = _batched_lloyd(
+                batch, squared_norms, centers, max_iter
+            )
+
+            best = inertia.reshape(end - start, n_init).argmin(axis=1)
+
+            for i in range(end - start):
+                j = i * n_init + best[i]
+                results[start + i].append((n_clusters, labels[j], centers[j]))
+
+    return results
+
+
+def _batched_squared_distances(lines, squared_norms, centers):
+    # squared distance from every line to every center, for each feature
+    return np.maximum(
+        squared_norms[:, :, np.newaxis]
+        - 2 * np.einsum("fnd,fkd->fnk", lines, centers)
+        + np.square(centers).sum(axis=2)[:, np.newaxis, :],
+        0,
+    )
+
+
+def _batched_kmeans_plusplus(lines, squared_norms, n_clusters, random_state):
+    num_features, num_lines, _ = lines.shape
+    features = np.arange(num_features)
+
+    first = random_state.randint(num_lines, size=num_features)
+    centers = [lines[features, first]]
+    closest = _batched_squared_distances(
+        lines, squared_norms, centers[0][:, np.newaxis]
+    )[:, :, 0]
+
+    for _ in range(1, n_clusters):
+        # choose each line with probability proportional to its squared
+        # distance to the nearest center
+        cumulative = np.cumsum(closest, axis=1)
+        thresholds = random_state.uniform(size=num_features) * cumulative[:, -1]
+        chosen = np.minimum(
+            (cumulative < thresholds[:, np.newaxis]).sum(axis=1), num_lines - 1
+        )
+
+        centers.append(lines[features, chosen])
+        closest = np.minimum(
+            closest,
+            _batched_squared_distances(
+                lines, squared_norms, centers[-1][:, np.newaxis]
+            )[:, :, 0],
+        )
+
+    return np.stack(centers, axis=1)
+
+
+def _batched_lloyd(lines, squared_norms, centers, max_iter):
+    n_clusters = centers.shape[1]
+    previous_labels = None
+
+    for _ in range(max_iter):
+        labels = _batched_squared_distances(lines, squared_norms, centers).argmin(
+            axis=2
+        )
+
+        if previous_labels is not None and np.array_equal(labels, previous_labels):
+            break
+
+        previous_labels = labels
+
+        one_hot = (labels[:, :, np.newaxis] == np.arange(n_clusters)).astype(
+            lines.dtype
+        )
+        counts = one_hot.sum(axis=1)[:, :, np.newaxis]
+        sums = np.einsum("fnk,fnd->fkd", one_hot, lines)
+
+        # empty clusters keep their previous centers
+        centers = np.where(counts > 0, sums / np.maximum(counts, 1), centers)
+
+    distances = _batched_squared_distances(lines, squared_norms, centers)
+    labels = distances.argmin(axis=2)
+    inertia = distances.min(axis=2).sum(axis=1)
+
+    return labels, inertia, centers
+
+
+def _fit_quietly(cluster_model, lines):
+    with profile_phase("clustering"), warnings.catch_warnings():
+        # Supress ConvergenceWarning warning.
+        warnings.simplefilter("ignore", category=ConvergenceWarning)
+        cluster_model.fit(lines)
+
+
+def _get_new_center(lines, centers, random_state):
+    # choose a line with probability proportional to its squared distance
+    # to the nearest center, as in k-means++
+    distances = euclidean_distances(lines, centers, squared=True).min(axis=1)
+    total = distances.sum()
+
+    if total == 0:
+        return lines[random_state.randint(lines.shape[0])]
+
+    return lines[random_state.choice(lines.shape[0], p=distances / total)]
+
+
+class SilhouetteScorer:
+    """Computes the silhouette scores of several clusterings of the same lines.
+    Anything that is shared between the clusterings, such as the distances
+    between the lines, is computed once.
+
+    :param lines: The lines that are clustered, with one row per line.
+    :type lines: np.ndarray
+    :param method: How to compute the score. "exact" computes the distances
+        between every pair of lines at once, which uses memory quadratic in
+        the number of lines. "chunked" gives the same scores while only holding
+        the distances for a chunk of lines in memory. "sampled" computes the
+        exact score for a random sample of ``sample_size`` lines. "simplified"
+        uses the distances from each line to the cluster centers rather than
+        to the other lines, which takes linear time. "auto" uses "exact" when
+        there are at most ``sample_size`` lines and "sampled" otherwise.
+    :type method: str
+    :param sample_size: The number of lines to use for "sampled" and the
+        threshold for "auto".
+    :type sample_size: int
+    :param random_state: Used to sample the lines.
+    :type random_state: np.random.RandomState
+    """
+
+    def __init__(self, lines, method, sample_size, random_state):
+        if method == "auto":
+            method = "exact" if lines.shape[0] <= sample_size else "sampled"
+
+        self.lines = lines
+        self.method = method
+
+        if method == "exact":
+            self.rows = None
+            self.distances = euclidean_distances(lines, lines)
+        elif method == "sampled":
+            self.rows = np.sort(
+                random_state.choice(
+                    lines.shape[0], min(sample_size, lines.shape[0]), replace=False
+                )
+            )
+            sample = lines[self.rows]
+            # passing the same array twice makes the diagonal exactly 0
+            self.distances = euclidean_distances(sample, sample)
+
+    def score(self, labels, centers):
+        """Get the silhouette score of a clustering.
+
+        :param labels: The cluster of each line.
+        :type labels: np.ndarray
+        :param centers: The center of each cluster.
+        :type centers: np.ndarray
+        :return: The mean silhouette coefficient.
+        :rtype: float
+        """
+        if self.method in ("exact", "sampled"):
+            if self.rows is not None:
+                labels = labels[self.rows]
+
+            if len(np.unique(labels)) < 2:
+                # the sample only contains one cluster
+                return -1.0
+
+            return silhouette_score(self.distances, labels, metric="precomputed")
+        elif self.method == "chunked":
+            return chunked_silhouette_score(self.lines, labels)
+        else:
+            return simplified_silhouette_score(self.lines, labels, centers)
+
+
+def chunked_silhouette_score(lines, labels):
+    """Get the same silhouette score as :func:`sklearn.metrics.silhouette_score`
+    without computing all of the pairwise distances at once.
+
+    :param lines: The clustered lines, with one row per line.
+    :type lines: np.ndarray
+    :param labels: The cluster of each line, from 0 to k - 1.
+    :type labels: np.ndarray
+    :return: The mean silhouette coefficient.
+    :rtype: float
+    """
+    num_lines = lines.shape[0]
+    num_clusters = labels.max() + 1
+
+    one_hot = np.zeros((num_lines, num_clusters))
+    one_hot[np.arange(num_lines), labels] = 1
+    cluster_sizes = one_hot.sum(axis=0)
+
+    chunk_size = max(1, _CHUNK_NUM_DISTANCES // num_lines)
+    coefficients = np.empty(num_lines)
+
+    for start in range(0, num_lines, chunk_size):
+        end = min(start + chunk_size, num_lines)
+        chunk_labels = labels[start:end]
+
+        # sum of the distances from each line in the chunk to each cluster
+        sums = euclidean_distances(lines[start:end], lines) @ one_hot
+
+        own_sizes = cluster_sizes[chunk_labels]
+        rows = np.arange(end - start)
+
+        # the distance from a line to itself is 0, so exclude it from the mean
+        a = sums[rows, chunk_labels] / np.maximum(own_sizes - 1, 1)
+
+        means = sums / cluster_sizes
+        means[rows, chunk_labels] = np.inf
+        b = means.min(axis=1)
+
+        with np.errstate(invalid="ignore"):
+            s = (b - a) / np.maximum(a, b)
+
+        # lines in clusters of size 1 have a coefficient of 0, as in sklearn
+        coefficients[start:end] = np.where(own_sizes > 1, np.nan_to_num(s), 0)
+
+    return coefficients.mean().item()
+
+
+def simplified_silhouette_score(lines, labels, centers):
+    """Get the simplified silhouette score, which uses the distance from each
+    line to the center of its cluster and to the nearest other center, rather
+    than the mean distances to the lines in those clusters.
+
+    :param lines: The clustered lines, with one row per line.
+    :type lines: np.ndarray
+    :param labels: The cluster of each line, from 0 to k - 1.
+    :type labels: np.ndarray
+    :param centers: The center of each cluster, with one row per cluster.
+    :type centers: np.ndarray
+    :return: The mean simplified silhouette coefficient.
+    :rtype: float
+    """
+    rows = np.arange(lines.shape[0])
+    distances = euclidean_distances(lines, centers)
+
+    a = distances[rows, labels]
+    distances[rows, labels] = np.inf
+    b = distances.min(axis=1)
+
+    with np.errstate(invalid="ignore"):
+        s = (b - a) / np.maximum(a, b)
+
+    # lines that are equal to both centers have a coefficient of 0
+    return np.nan_to_num(s).mean().item()
@@ -0,0 +1,179 @@
+"""
+Explain clusters of ICE lines with decision trees that are fit on the
+instances' feature values.
+"""
+
+import numpy as np
+from sklearn.tree import DecisionTreeClassifier
+
+EXPLANATION_METHODS = ["one_vs_rest", "multiclass"]
+
+
+class ClusterExplainer:
+    """Finds the features that distinguish the clusters of a clustering.
+
+    The dataset is converted to a float array once, and optionally binned, so
+    that the same array is reused by every tree that is fit for a feature.
+
+    :param data: The dataset, with one row per ICE line.
+    :type data: pd.DataFrame
+    :param one_hot_encoded_col_name_to_feature: Map from the name of a one-hot
+        encoded column to the name of its feature.
+    :type one_hot_encoded_col_name_to_feature: dict[str, str]
+    :param decision_tree_params: The parameters to pass to
+        ``DecisionTreeClassifier``.
+    :type decision_tree_params: dict
+    :param random_state: Used to fit the trees.
+    :type random_state: np.random.RandomState | int | None
+    :param method: "one_vs_rest" fits a tree for each cluster that separates
+        it from the other clusters and adds up their feature importances.
+        "multiclass" fits a single tree for the whole clustering. Defaults to
+        "one_vs_rest".
+    :type method: str, optional
+    :param sample_size: The maximum number of rows to fit the trees on. Larger
+        datasets are sampled so that each cluster keeps its share of the rows.
+        If None, all rows are used. Defaults to None.
+    :type sample_size: int | None, optional
+    :param max_bins: If set, numeric columns with more unique values than
+        this are replaced by the indices of their quantile bins, which reduces
+        the number of splits that the trees consider. Defaults to None.
+    :type max_bins: int | None, optional
+    :param sample_random_state: Used to sample the rows. It is kept apart from
+        ``random_state``, which may be shared with the clustering, so that
+        sampling does not change the clusterings or the trees. If None,
+        ``random_state`` is used. Defaults to None.
+    :type sample_random_state: np.random.RandomState | None, optional
+    """
+
+    def __init__(
+        self,
+        data,
+        one_hot_encoded_col_name_to_feature,
+        decision_tree_params,
+        random_state,
+        method="one_vs_rest",
+        sample_size=None,
+        max_bins=None,
+        sample_random_state=None,
+    ):
+        self.columns = list(data.columns)
+        self.one_hot_encoded_col_name_to_feature = one_hot_encoded_col_name_to_feature
+        self.decision_tree_params = decision_tree_params
+        self.random_state = random_state
+        self.method = method
+        self.sample_size = sample_size
+        self.sample_random_state = (
+            sample_random_state if sample_random_state is not None else random_state
+        )
+
+        # decision trees convert their input to float32, so doing it here
+        # means that it is done once rather than for every fit
+        self.X = np.asarray(data, dtype=np.float32)
+
+        if max_bins is not None:
+            self.X = _bin_columns(self.X, max_bins)
+
+    def interacting_features(self, labels, n_clusters):
+        """Get the importance of each feature for separating the clusters.
+
+        :param labels: The cluster of each row.
+        :type labels: np.ndarray
+        :param n_clusters: The number of clusters.
+        :type n_clusters: int
+        :return: Map from feature name to importance, for the features with
+            non-zero importance.
+        :rtype: dict[str, float]
+        """
+        X = self.X
+
+        if self.sample_size is not None and labels.shape[0] > self.sample_size:
+            rows = _stratified_sample(
+                labels, self.sample_size, self.sample_random_state
+            )
+            X = X[rows]
+            labels = labels[rows]
+
+        if self.method == "multiclass":
+            return _get_interacting_features(
+                X=X,
+                y=labels,
+                columns=self.columns,
+                one_hot_encoded_col_name_to_feature=self.one_hot_encoded_col_name_to_feature,
+                decision_tree_params=self.decision_tree_params,
+                random_state=self.random_state,
+            )
+
+        importances = {}
+
+        for i in range(n_clusters):
+            y = (labels == i).astype(int)
+
+            cluster_importances = _get_interacting_features(
+                X=X,
+                y=y,
+                columns=self.columns,
+                one_hot_encoded_col_name_to_feature=self.one_hot_encoded_col_name_to_feature,
+                decision_tree_params=self.decision_tree_params,
+                random_state=self.random_state,
+            )
+
+            for feat, imp in cluster_importances.items():
+                importances[feat] = importances.get(feat, 0) + imp
+
+        return importances
+
+
+def _get_interacting_features(
+    X,
+    y,
+    one_hot_encoded_col_name_to_feature,
+    decision_tree_params,
+    random_state,
+    columns=None,
+):
+    if columns is None:
+        columns = X.columns
+
+    clf = DecisionTreeClassifier(
+        **decision_tree_params,
+        random_state=random_state,
+    )
+    clf.fit(X, y)
+
+    importances = {}
+
+    for i in np.nonzero(clf.feature_importances_)[0]:
+        feat = one_hot_encoded_col_name_to_feature.get(columns[i], columns[i])
+        importances[feat] = clf.feature_importances_[i]
+
+    return importances
+
+
+def _stratified_sample(labels, sample_size, random_state):
+    # sample rows so that each cluster keeps its share of the rows, with at
+    # least one row from each cluster
+    clusters, counts = np.unique(labels, return_counts=True)
+    sizes = np.maximum(1, np.round(counts * sample_size / labels.shape[0])).astype(int)
+
+    rows = [
+        random_state.choice(np.flatnonzero(labels == cluster), size, replace=False)
+        for cluster, size in zip(clusters, np.minimum(sizes, counts))
+    ]
+
+    return np.sort(np.concatenate(rows))
+
+
+def _bin_columns(X, max_bins):
+    X = X.copy()
+
+    for j in range(X.shape[1]):
+        column = X[:, j]
+
+        if np.unique(column).shape[0] <= max_bins:
+            continue
+
+        quantiles = np.linspace(0, 1, max_bins + 1)[1:-1]
+        edges = np.unique(np.quantile(column, quantiles))
+        X[:, j] = np.searchsorted(edges, column, side="right")
+
+    return X
@@ -0,0 +1,469 @@
+"""
+Evaluate a model on grids of perturbed copies of a dataset.
+
+A grid is described by a list of features and a list of cells. Each cell is a
+tuple containing one value for each of the features. Evaluating a cell means
+setting the features to the cell's values for every instance in the dataset
+and getting the model's predictions on the result.
+
+The dataset can either be a DataFrame or a 2-D NumPy array. For arrays,
+``column_indices`` gives the positions of each feature's columns, as computed
+by :func:`pdpilot.metadata.get_column_indices`.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from pdpilot.additive import AdditiveModel
+from pdpilot.metadata import get_column_indices
+from pdpilot.profiling import profile_calls
+
+
+def predict_grid(
+    predict,
+    data,
+    data_copy,
+    features,
+    cells,
+    feature_info,
+    batch_size=None,
+    column_indices=None,
+):
+    """Get the model's predictions for every cell in a grid.
+
+    :param predict: The model's prediction function.
+    :param data: The dataset as a DataFrame or 2-D array. It is modified in
+        place when a single cell is evaluated on all of the instances at once,
+        but it is restored before the function returns. Read-only arrays are
+        never modified.
+    :param data_copy: An unmodified copy of the dataset. Not used for arrays,
+        since their perturbed columns are saved and restored directly.
+    :param features: The names of the features that make up the grid.
+    :param cells: List of tuples containing a value for each feature.
+    :param feature_info: Dictionary from feature name to its metadata.
+    :param batch_size: The maximum number of rows to pass to ``predict``
+        in one call. If None, each cell is evaluated in a separate call.
+    :param column_indices: The positions of each feature's columns. Required
+        when ``data`` is an array.
+    :return: Array with shape (number of cells, number of instances).
+    :rtype: np.ndarray
+    """
+    predictions = np.empty((len(cells), data.shape[0]))
+
+    for cell_slice, row_slice, chunk_predictions in iter_grid_predictions(
+        predict,
+        data,
+        data_copy,
+        features,
+        cells,
+        feature_info,
+        batch_size,
+        column_indices,
+    ):
+        predictions[cell_slice, row_slice] = chunk_predictions
+
+    return predictions
+
+
+def mean_grid_predictions(
+    predict,
+    data,
+    data_copy,
+    features,
+    cells,
+    feature_info,
+    batch_size=None,
+    column_indices=None,
+):
+    """Get the model's mean prediction for every cell in a grid. Only the
+    predictions for one chunk are held in memory at a time, so ``batch_size``
+    also bounds the memory used.
+
+    The parameters are the same as for :func:`predict_grid`.
+
+    :return: Array with shape (number of cells,).
+    :rtype: np.ndarray
+    """
+    sums = np.zeros(len(cells))
+
+    for cell_slice, _, chunk_predictions in iter_grid_predictions(
+        predict,
+        data,
+        data_copy,
+        features,
+        cells,
+        feature_info,
+        batch_size,
+        column_indices,
+    ):
+        sums[cell_slice] += chunk_predictions.sum(axis=1)
+
+    return sums / data.shape[0]
+
+
+def estimate_grid_means(
+    predict,
+    data,
+    data_copy,
+    features,
+    cells,
+    feature_info,
+    tolerance,
+    block_size,
+    random_state,
+    batch_size=None,
+    column_indices=None,
+):
+    """Estimate the model's mean prediction for every cell in a grid by
+    evaluating it on random blocks of rows until the standard error of every
+    mean is at most ``tolerance`` or all of the rows have been used.
+
+    The other parameters are the same as for :func:`predict_grid`.
+
+    :param tolerance: The target standard error.
+    :param block_size: The number of rows to add in each step.
+    :param random_state: Used to shuffle the rows.
+    :return: The estimated means, the largest standard error of the means,
+        and the number of rows used.
+    :rtype: tuple[np.ndarray, float, int]
+    """
+    order = random_state.permutation(data.shape[0])
+
+    means = np.zeros(len(cells))
+    # sum of squared differences from the mean
+    m2 = np.zeros(len(cells))
+    num_rows = 0
+
+    for start in range(0, len(order), block_size):
+        rows = order[start : start + block_size]
+        block_data, block_data_copy = take_rows(data, data_copy, rows)
+
+        predictions = predict_grid(
+            predict,
+            block_data,
+            block_data_copy,
+            features,
+            cells,
+            feature_info,
+            batch_size,
+            column_indices,
+        )
+
+        means, m2, num_rows = update_statistics(means, m2, num_rows, predictions)
+
+        standard_error = get_standard_error(m2, num_rows)
+
+        if standard_error <= tolerance:
+            break
+
+    return means, standard_error, num_rows
+
+
+def update_statistics(means, m2, num_rows, predictions):
+    """Combine running means and sums of squared differences from the means
+    with those of a new block of predictions, which has one row per mean.
+
+    https://en.wikipedia.org/wiki/Algorithms_for_calculating_variance#Parallel_algorithm
+    """
+    block_num_rows = predictions.shape[1]
+    block_means = predictions.mean(axis=1)
+    block_m2 = np.square(predictions - block_means.reshape(-1, 1)).sum(axis=1)
+
+    total = num_rows + block_num_rows
+    delta = block_means - means
+
+    means = means + delta * block_num_rows / total
+    m2 = m2 + block_m2 + np.square(delta) * num_rows * block_num_rows / total
+
+    return means, m2, total
+
+
+def get_standard_error(m2, num_rows):
+    """Get the largest standard error of a set of means, given the sum of
+    squared differences from each mean."""
+    if num_rows < 2:
+        return np.inf
+    return np.sqrt(m2.max() / (num_rows - 1) / num_rows).item()
+
+
+def take_rows(data, data_copy, rows):
+    """Get a new dataset made of the given rows, along with its unmodified copy."""
+    if isinstance(data, np.ndarray):
+        return data[rows], None
+
+    rows_copy = data_copy.iloc[rows].reset_index(drop=True)
+    return rows_copy.copy(), rows_copy
+
+
+def iter_grid_predictions(
+    predict,
+    data,
+    data_copy,
+    features,
+    cells,
+    feature_info,
+    batch_size=None,
+    column_indices=None,
+):
+    """Evaluate a grid in chunks. For each chunk, this yields a slice of the
+    cells, a slice of the rows, and an array of predictions with shape
+    (number of cells in the chunk, number of rows in the chunk).
+
+    The parameters are the same as for :func:`predict_grid`.
+    """
+    num_rows = data.shape[0]
+    cells_per_chunk, rows_per_chunk = get_chunk_shape(num_rows, batch_size)
+    is_array = isinstance(data, np.ndarray)
+
+    if isinstance(predict, AdditiveModel):
+        yield from _iter_additive_predictions(
+            predict,
+            data if is_array else data_copy,
+            features,
+            cells,
+            feature_info,
+            cells_per_chunk,
+            rows_per_chunk,
+            column_indices,
+        )
+        return
+
+    # records each call when the run is profiled
+    predict = profile_calls(predict, "predict")
+
+    if is_array:
+        # reused for every chunk so that the block is only allocated once
+        buffer = np.empty(
+            (
+                min(cells_per_chunk, len(cells)) * min(rows_per_chunk, num_rows),
+                data.shape[1],
+            ),
+            dtype=data.dtype,
+        )
+
+    for cell_start in range(0, len(cells), cells_per_chunk):
+        cell_end = min(cell_start + cells_per_chunk, len(cells))
+        chunk_cells = cells[cell_start:cell_end]
+
+        for row_start in range(0, num_rows, rows_per_chunk):
+            row_end = min(row_start + rows_per_chunk, num_rows)
+
+            if (
+                len(chunk_cells) == 1
+                and row_end - row_start == num_rows
+                and (not is_array or data.flags.writeable)
+            ):
+                # the chunk is the whole dataset, so we can avoid making a copy
+                if is_array:
+                    chunk_predictions = _predict_array_in_place(
+                        predict, data, features, chunk_cells[0], column_indices
+                    )
+                else:
+                    for feature, value in zip(features, chunk_cells[0]):
+                        set_feature(feature, value, data, feature_info[feature])
+
+                    chunk_predictions = np.asarray(predict(data))
+
+                    for feature in features:
+                        reset_feature(feature, data, data_copy, feature_info[feature])
+            elif is_array:
+                block = make_array_block(
+                    data[row_start:row_end],
+                    features,
+                    chunk_cells,
+                    column_indices,
+                    buffer,
+                )
+                chunk_predictions = np.asarray(predict(block))
+            else:
+                block = make_block(
+                    data_copy.iloc[row_start:row_end],
+                    features,
+                    chunk_cells,
+                    feature_info,
+                )
+                chunk_predictions = np.asarray(predict(block))
+
+            yield (
+                slice(cell_start, cell_end),
+                slice(row_start, row_end),
+                chunk_predictions.reshape(len(chunk_cells), row_end - row_start),
+            )
+
+
+def _iter_additive_predictions(
+    model,
+    data,
+    features,
+    cells,
+    feature_info,
+    cells_per_chunk,
+    rows_per_chunk,
+    column_indices,
+):
+    # a cell only changes the contributions of its features' columns, so each
+    # prediction is the sum of a part for the row and a part for the cell
+    if column_indices is None:
+        column_indices = get_column_indices(
+            data.columns, {feature: feature_info[feature] for feature in features}
+        )
+
+    positions = [i for feature in features for i in column_indices[feature]["indices"]]
+
+    contributions = profile_calls(model.contributions, "predict")
+
+    row_contributions = contributions(data)
+    row_parts = (
+        model.intercept
+        + row_contributions.sum(axis=1)
+        - row_contributions[:, positions].sum(axis=1)
+    )
+
+    # one instance per cell, with the features set to the cell's values
+    if isinstance(data, np.ndarray):
+        cell_rows = make_array_block(
+            data[:1],
+            features,
+            cells,
+            column_indices,
+            np.empty((len(cells), data.shape[1]), dtype=data.dtype),
+        )
+    else:
+        cell_rows = make_block(data.iloc[:1], features, cells, feature_info)
+
+    cell_parts = contributions(cell_rows)[:, positions].sum(axis=1)
+
+    for cell_start in range(0, len(cells), cells_per_chunk):
+        cell_end = min(cell_start + cells_per_chunk, len(cells))
+
+        for row_start in range(0, data.shape[0], rows_per_chunk):
+            row_end = min(row_start + rows_per_chunk, data.shape[0])
+            raw = (
+                cell_parts[cell_start:cell_end, np.newaxis]
+                + row_parts[np.newaxis, row_start:row_end]
+            )
+            yield (
+                slice(cell_start, cell_end),
+                slice(row_start, row_end),
+                model.inverse_link(raw),
+            )
+
+
+def _predict_array_in_place(predict, data, features, cell, column_indices):
+    # only the perturbed columns are saved, rather than a copy of the dataset
+    indices = [i for feature in features for i in column_indices[feature]["indices"]]
+    original = data[:, indices]
+
+    for feature, value in zip(features, cell):
+        set_array_feature(value, data, column_indices[feature])
+
+    try:
+        return np.asarray(predict(data))
+    finally:
+        data[:, indices] = original
+
+
+def get_chunk_shape(num_rows, batch_size):
+    """Get the number of cells and rows to evaluate in each call to predict
+    so that no call is passed more than ``batch_size`` rows."""
+    if num_rows < 1:
+        raise ValueError("The dataset must have at least one row.")
+
+    if batch_size is None:
+        return 1, num_rows
+
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be positive, but got {batch_size}.")
+
+    if num_rows <= batch_size:
+        return batch_size // num_rows, num_rows
+
+    return 1, batch_size
+
+
+def get_num_predict_calls(num_rows, num_cells, batch_size):
+    """Get the number of calls to predict needed to evaluate a grid."""
+    cells_per_chunk, rows_per_chunk = get_chunk_shape(num_rows, batch_size)
+    return math.ceil(num_cells / cells_per_chunk) * math.ceil(
+        num_rows / rows_per_chunk
+    )
+
+
+def make_block(rows, features, cells, feature_info):
+    """Stack one copy of ``rows`` per cell and set the features in each copy
+    to that cell's values."""
+    num_rows = rows.shape[0]
+    block = pd.concat([rows] * len(cells), ignore_index=True)
+
+    for i, feature in enumerate(features):
+        values = [cell[i] for cell in cells]
+        set_feature_block(feature, values, num_rows, block, feature_info[feature])
+
+    return block
+
+
+def make_array_block(rows, features, cells, column_indices, buffer):
+    """Broadcast one copy of ``rows`` per cell into the start of ``buffer`` and
+    set the features in each copy to that cell's values."""
+    num_rows, num_cols = rows.shape
+    block = buffer[: len(cells) * num_rows]
+    block.reshape(len(cells), num_rows, num_cols)[:] = rows
+
+    for j, cell in enumerate(cells):
+        copy = block[j * num_rows : (j + 1) * num_rows]
+        for feature, value in zip(features, cell):
+            set_array_feature(value, copy, column_indices[feature])
+
+    return block
+
+
+def set_array_feature(value, data, indices):
+    """Set a feature to the given value for all rows of an array."""
+    if "value_to_index" in indices:
+        data[:, indices["indices"]] = 0
+        data[:, indices["value_to_index"][value]] = 1
+    else:
+        data[:, indices["indices"][0]] = value
+
+
+def set_feature(feature, value, data, feature_info):
+    """Set a feature to the given value for all instances."""
+    if feature_info["subkind"] == "one_hot":
+        col = feature_info["value_to_column"][feature_info["value_map"][value]]
+        all_features = [feat for feat, _ in feature_info["columns_and_values"]]
+        data[all_features] = 0
+        data[col] = 1
+    else:
+        data[feature] = value
+
+
+def set_feature_block(feature, values, num_rows, block, feature_info):
+    """Set a feature in a block of stacked copies of the dataset, where
+    each copy has ``num_rows`` rows and is given one of ``values``."""
+    if feature_info["subkind"] == "one_hot":
+        selected = np.array(
+            [
+                feature_info["value_to_column"][feature_info["value_map"][value]]
+                for value in values
+            ]
+        )
+        for col, _ in feature_info["columns_and_values"]:
+            block[col] = np.repeat((selected == col).astype(int), num_rows)
+    else:
+        block[feature] = np.repeat(values, num_rows)
+
+
+def reset_feature(
+    feature,
+    data,
+    data_copy,
+    feature_info,
+):
+    """Restore a feature to its original values."""
+    if feature_info["subkind"] == "one_hot":
+        all_features = [col for col, _ in feature_info["columns_and_values"]]
+        data[all_features] = data_copy[all_features]
+    else:
+        data[feature] = data_copy[feature]
@@ -243,3 +243,31 @@ class Metadata:
                         "percents": percents.tolist(),
                     },
                 }
+
+        # column positions for predicting on NumPy arrays
+        self.column_indices = get_column_indices(df.columns, self.feature_info)
+
+
+def get_column_indices(columns, feature_info):
+    """Get the positions of each feature's columns in a dataset with the given
+    columns. For one-hot encoded features, this also maps from each feature
+    value to the position of its column."""
+    column_to_index = {col: i for i, col in enumerate(columns)}
+    column_indices = {}
+
+    for feature, info in feature_info.items():
+        if info["subkind"] == "one_hot":
+            value_to_index = {
+                value: column_to_index[info["value_to_column"][name]]
+                for value, name in info["value_map"].items()
+            }
+            column_indices[feature] = {
+                "indices": [
+                    column_to_index[col] for col, _ in info["columns_and_values"]
+                ],
+                "value_to_index": value_to_index,
+            }
+        else:
+            column_indices[feature] = {"indices": [column_to_index[feature]]}
+
+    return column_indices
@@ -8,33 +8,67 @@ Compute partial dependence plots
 import json
 import logging
 import math
-import warnings
 from collections import defaultdict
 from operator import itemgetter
+from concurrent.futures import Executor
+from contextlib import nullcontext
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Tuple, Union
+from typing import Any, Callable, Dict, Iterator, List, Tuple, Union
 
 import numpy as np
 import pandas as pd
-from joblib import Parallel, delayed
+from joblib import effective_n_jobs
+from joblib.externals.loky import get_reusable_executor
 from numpy.random import MT19937, RandomState, SeedSequence
-from sklearn.cluster import KMeans
-from sklearn.exceptions import ConvergenceWarning
-from sklearn.metrics import silhouette_score
-from sklearn.metrics.pairwise import euclidean_distances
-from sklearn.tree import DecisionTreeClassifier
-from tqdm import tqdm
 from tqdm.contrib.logging import logging_redirect_tqdm
 
+from pdpilot.async_predict import AsyncPredictor, is_async_function
+from pdpilot.cache import PredictionCache, get_dataset_id, get_model_id
+from pdpilot.checkpoint import Checkpoint, get_run_id
+from pdpilot.clustering import (
+    CLUSTER_METHODS,
+    SILHOUETTE_METHODS,
+    SilhouetteScorer,
+    batched_kmeans,
+    iter_clusterings,
+)
+from pdpilot.explanation import (
+    EXPLANATION_METHODS,
+    ClusterExplainer,
+    # moved to pdpilot.explanation, and still imported from here
+    _get_interacting_features,
+)
+from pdpilot.grid import (
+    estimate_grid_means,
+    get_standard_error,
+    mean_grid_predictions,
+    predict_grid,
+    take_rows,
+    update_statistics,
+)
 from pdpilot.metadata import Metadata
-from pdpilot.tqdm_joblib import tqdm_joblib
+from pdpilot.profiling import Profiler, profile_phase
+from pdpilot.progress import ProgressTracker
+from pdpilot.recursion import (
+    check_recursion_columns,
+    get_recursion_model,
+    recursion_grid_means,
+)
+from pdpilot.results_file import write_results
+from pdpilot.scheduler import (
+    LimitedThreadPoolExecutor,
+    TaskScheduler,
+    estimate_one_way_cost,
+    estimate_two_way_cost,
+)
+from pdpilot.shared_data import SharedDataset, ThreadLocalDataset
 
 logger = logging.getLogger("pdpilot")
 
 
 def partial_dependence(
     *,
-    predict: Callable[[pd.DataFrame], List[float]],
+    predict: Callable[[Union[pd.DataFrame, np.ndarray]], List[float]],
     df: pd.DataFrame,
     features: List[str],
     resolution: int = 20,
@@ -47,19 +81,60 @@ def partial_dependence(
     mixed_shape_tolerance: float = 0.29,
     compute_two_way_pdps: bool = True,
     cluster_preprocessing: str = "diff",
+    cluster_method: str = "kmeans",
+    cluster_sample_size: int = 10_000,
+    silhouette_method: str = "auto",
+    silhouette_sample_size: int = 5000,
+    explanation_method: str = "one_vs_rest",
+    explanation_sample_size: Union[int, None] = None,
+    explanation_max_bins: Union[int, None] = None,
+    batch_size: Union[int, None] = None,
+    predict_input: str = "dataframe",
+    pdp_method: str = "brute",
+    cache_dir: Union[str, None] = None,
+    cache_model_id: Union[str, None] = None,
+    cache_max_size: int = 2**30,
+    checkpoint_dir: Union[str, None] = None,
+    progressive_tolerance: Union[float, None] = None,
+    progressive_block_size: int = 1000,
     n_jobs: int = 1,
+    backend: str = "processes",
+    executor: Union[Executor, None] = None,
+    shared_data_dir: Union[str, None] = None,
     seed: Union[int, None] = None,
     output_path: Union[str, None] = None,
+    output_format: str = "json",
     logging_level: str = "INFO",
+    progress_callback: Union[Callable[[dict], None], None] = None,
+    profile: bool = False,
+    profile_callback: Union[Callable[[dict], None], None] = None,
+    profile_hooks: Union[Dict[str, Callable[[], Any]], None] = None,
 ) -> Union[dict, None]:
     """Calculates the data needed for the widget. This includes computing the
     data for the PDP and ICE plots, calculating the metrics
     to rank the plots by, and clustering the lines within
-    each ICE plot.
+    each ICE plot. See :func:`iter_partial_dependence` to get each PDP as soon
+    as it is done.
 
     :param predict: A function whose input is a DataFrame of instances and
-        returns the model's predictions on those instances.
-    :type predict: Callable[[pd.DataFrame], list[float]]
+        returns the model's predictions on those instances. See ``predict_input``
+        for passing a NumPy array instead. It can also be an ``async``
+        function, such as a client for a remote model server, or an
+        :class:`pdpilot.AsyncPredictor` that wraps one. Then the tasks run in
+        threads, as with ``backend="threads"``, so that requests to the model
+        are sent concurrently. If ``n_jobs`` is 1, it is set to the number of
+        requests that can be in flight at once, which is 8 unless an
+        :class:`pdpilot.AsyncPredictor` with a different ``max_in_flight`` is
+        given. The event loop of the :class:`pdpilot.AsyncPredictor` is
+        stopped when the run ends, and it starts again if it is called. For
+        ``cache_dir`` and ``checkpoint_dir``, the model is identified by the
+        function that it wraps.
+        For linear and other additive models, it can be an
+        :class:`pdpilot.AdditiveModel`, such as a :class:`pdpilot.LinearModel`,
+        which gives the contribution of each column. Then the ICE lines and
+        PDPs are computed from the contributions rather than by calling the
+        model once per grid value.
+    :type predict: Callable[[pd.DataFrame | np.ndarray], list[float]]
     :param df: Instances to use to compute the PDPs and ICE plots.
     :type df: pd.DataFrame
     :param features: List of feature names in the dataset.
@@ -104,40 +179,337 @@ def partial_dependence(
         successive points in the lines using `np.diff`. "center" centers the ICE
         lines so that they all begin at `y = 0`. Defaults to "diff".
     :type cluster_preprocessing: str
+    :param cluster_method: How to cluster the ICE lines. "kmeans" runs k-means
+        with five initializations on all of the lines for each number of
+        clusters. "minibatch" is faster for large datasets. It runs mini-batch
+        k-means on a random sample of ``cluster_sample_size`` lines and then
+        assigns every line to its nearest cluster center. Each number of
+        clusters starts from the centers found for one fewer cluster.
+        "batched" computes the ICE lines of every feature first and then
+        clusters the lines of all features at once with vectorized NumPy
+        k-means, which avoids fitting a separate model for each feature and
+        number of clusters. Defaults to "kmeans".
+    :type cluster_method: str, optional
+    :param cluster_sample_size: The maximum number of lines to fit the
+        clusters on when ``cluster_method`` is "minibatch". Defaults to 10,000.
+    :type cluster_sample_size: int, optional
+    :param silhouette_method: How to compute the silhouette scores that are used
+        to choose the number of clusters. "exact" computes the distances between
+        all pairs of ICE lines at once, which uses memory quadratic in the number
+        of instances. "chunked" computes the same scores in memory-bounded chunks.
+        "sampled" computes the scores on a random sample of
+        ``silhouette_sample_size`` lines. "simplified" uses the distances to the
+        cluster centers, which takes time linear in the number of instances.
+        "auto" uses "exact" for up to ``silhouette_sample_size`` instances and
+        "sampled" otherwise. The method used for each feature is reported as
+        ``silhouette_method`` in its ICE data. Defaults to "auto".
+    :type silhouette_method: str, optional
+    :param silhouette_sample_size: The sample size for the "sampled" silhouette
+        method and the number of instances above which "auto" switches to it.
+        Defaults to 5000.
+    :type silhouette_sample_size: int, optional
+    :param explanation_method: How to fit the decision trees that find the
+        features that interact with a feature by explaining its clusters.
+        "one_vs_rest" fits a tree for each cluster that separates it from the
+        other clusters. "multiclass" fits a single tree for each clustering,
+        which is faster and usually ranks the features similarly.
+        Defaults to "one_vs_rest".
+    :type explanation_method: str, optional
+    :param explanation_sample_size: The maximum number of instances to fit the
+        decision trees on. Larger datasets are sampled so that each cluster
+        keeps its share of the instances. The sample does not change the
+        clusterings. If None, all instances are used. Defaults to None.
+    :type explanation_sample_size: int | None, optional
+    :param explanation_max_bins: If set, numeric features with more unique
+        values than this are binned by quantiles before the decision trees are
+        fit, which reduces the number of splits they consider. Defaults to None.
+    :type explanation_max_bins: int | None, optional
+    :param batch_size: The maximum number of rows to pass to ``predict`` in a
+        single call. If set, the perturbed copies of the dataset for several grid
+        values are concatenated and scored together, which reduces the per-call
+        overhead of the model. If None, ``predict`` is called once per grid value.
+        Defaults to None.
+    :type batch_size: int | None, optional
+    :param predict_input: The type of input that ``predict`` takes. "dataframe"
+        passes a DataFrame with the same columns as ``df``. "numpy" passes a 2-D
+        array whose columns are in the same order as ``df.columns``. With "numpy",
+        features are perturbed by writing directly into a single array, which
+        avoids the overhead of pandas and keeps only one copy of the data.
+        Defaults to "dataframe".
+    :type predict_input: str, optional
+    :param pdp_method: How the mean predictions of the PDPs are computed.
+        "brute" averages the model's predictions on the perturbed copies of
+        ``df``. "recursion" traverses the trees of a scikit-learn tree model
+        instead, which makes two-way PDPs almost free to compute. It requires
+        ``predict`` to be the ``predict`` method of a fitted
+        ``GradientBoostingRegressor``, ``HistGradientBoostingRegressor``,
+        ``RandomForestRegressor``, or ``DecisionTreeRegressor``, or the
+        ``decision_function`` method of a binary ``GradientBoostingClassifier``
+        or ``HistGradientBoostingClassifier``, trained on the columns of
+        ``df``. The traversal weights each branch by the model's training
+        data, so the PDPs are with respect to the training data rather than
+        ``df``. ICE lines are still computed by calling ``predict``, since they
+        are needed for clustering. With scikit-learn versions before 1.7, the
+        PDPs are computed by brute force with a warning. Defaults to "brute".
+    :type pdp_method: str, optional
+    :param cache_dir: A directory to cache the model's predictions in. ICE lines
+        and two-way PDPs that are in the cache are loaded from it rather than
+        computed, so that rerunning this function with different clustering
+        parameters does not need to call ``predict``. If None, predictions are
+        not cached. Defaults to None.
+    :type cache_dir: str | None, optional
+    :param cache_model_id: A string that identifies the model in the cache and in
+        ``checkpoint_dir``. It must
+        change whenever the model changes. If None, ``predict`` is hashed, which
+        includes the fitted model for methods such as ``model.predict``. It is
+        required when ``predict`` is a plain function, such as one that calls a
+        model, since the hash of a function does not include the model.
+        Defaults to None.
+    :type cache_model_id: str | None, optional
+    :param cache_max_size: The maximum size of ``cache_dir`` in bytes. When it is
+        exceeded, the least recently used predictions are deleted.
+        Defaults to 2**30 (1 GiB).
+    :type cache_max_size: int, optional
+    :param checkpoint_dir: A directory to save each one-way and two-way PDP to as
+        soon as it is done. If the function is run again with the same model,
+        dataset, parameters, and ``seed``, then the saved PDPs are loaded rather
+        than computed, so an interrupted run picks up where it left off. The model
+        is identified as for ``cache_dir``. If None, nothing is saved.
+        Defaults to None.
+    :type checkpoint_dir: str | None, optional
+    :param progressive_tolerance: If set, PDPs are estimated from random blocks of
+        rows rather than from every row in ``df``. Blocks are added until the
+        largest standard error of the PDP's mean predictions is at most this value.
+        The one-way PDPs share the same rows, so that their ICE lines line up
+        with one sample of the dataset. Each two-way PDP stops on its own.
+        The rows that were used are returned as ``row_indices``, and each PDP
+        reports its ``standard_error`` and ``num_rows_scored``. Predictions are
+        not cached in this mode. If None, all rows are used. Defaults to None.
+    :type progressive_tolerance: float | None, optional
+    :param progressive_block_size: The number of rows in each block when
+        ``progressive_tolerance`` is set. Defaults to 1000.
+    :type progressive_block_size: int, optional
     :param n_jobs: Number of jobs to use to parallelize computation,
-        defaults to 1.
+        defaults to 1. When greater than 1, the dataset is written once to a
+        temporary memory-mapped file that the workers read from. When
+        ``executor`` is given, this is the number of tasks that are submitted
+        to it at a time, so it should match the executor's number of workers.
     :type n_jobs: int, optional
+    :param backend: How tasks are run when ``n_jobs`` is not 1. "processes" runs
+        them in separate processes. "threads" runs them in threads of this
+        process, which avoids copying the model and the dataset into other
+        processes. It is faster for models that release the GIL and use their
+        own threads, such as LightGBM, XGBoost, and ONNX Runtime. Each thread
+        perturbs its own copy of the dataset, and the OpenMP and BLAS threads
+        that the model uses are limited so that the CPUs are not oversubscribed.
+        When ``executor`` is given, "threads" must be used for thread-based
+        executors. Defaults to "processes".
+    :type backend: str, optional
+    :param executor: A ``concurrent.futures.Executor``, such as a process pool or
+        an executor that runs tasks on the nodes of a cluster, to run the tasks
+        on. Each task computes the PDP of one feature or pair of features and is
+        sent the path to the dataset's file rather than the dataset, and the
+        results are gathered in the order that the tasks finish. The executor
+        is not shut down. If None, joblib's process pool is used when ``n_jobs``
+        is not 1. Defaults to None.
+    :type executor: concurrent.futures.Executor | None, optional
+    :param shared_data_dir: The directory to write the dataset's file to for the
+        parallel workers. When ``executor`` runs tasks on other machines, this
+        must be on a file system that they can read. If None, a temporary
+        directory is used. Defaults to None.
+    :type shared_data_dir: str | None, optional
     :param seed:  Random state for clustering. Defaults to None.
     :type seed: int | None, optional
     :param output_path: A file path to write the results to.
         If None, then the results are instead returned.
     :type output_path: str | None, optional
+    :param output_format: How to write the results to ``output_path``. Must be
+        "json" or "binary". "binary" writes a directory of ``.npy`` arrays and a
+        JSON manifest, which is smaller and faster to read and write for large
+        datasets. See :func:`pdpilot.write_results`. Defaults to "json".
+    :type output_format: str, optional
     :param logging_level: The verbosity of printed messages. Must be "DEBUG", "INFO",
         "WARNING", or "ERROR". Defaults to "INFO".
     :type logging_level: string, optional
+    :param progress_callback: A function that is called with an event whenever
+        a task, such as computing a one-way or two-way PDP, is started and
+        finished. Events have the task's features, time taken, number of rows
+        scored, and PDP, as well as the number of tasks done and the estimated
+        time remaining. See :mod:`pdpilot.progress` for their keys. Events are
+        sent from the calling thread for every ``n_jobs``, ``backend``, and
+        ``executor``. Defaults to None.
+    :type progress_callback: Callable[[dict], None] | None, optional
+    :param profile: Whether to record the wall time, number of calls, and
+        number of rows scored of each phase of the computation, such as
+        calling ``predict``, clustering, computing silhouette scores, and
+        fitting the decision trees that explain the clusters. The totals are
+        returned in ``profile["phases"]`` and the phases of each one-way and
+        two-way PDP in ``profile["tasks"]``. Phases can be nested, such as
+        ``predict`` within ``ice_lines``, so the time of a phase includes the
+        time of the phases within it. Defaults to False.
+    :type profile: bool, optional
+    :param profile_callback: If given, the phases are recorded and this
+        function is called with the profile at the end of the run, after the
+        results are written, so that it also includes the ``output`` phase.
+        Defaults to None.
+    :type profile_callback: Callable[[dict], None] | None, optional
+    :param profile_hooks: If given, the phases are recorded, and this maps the
+        names of phases to functions that return a context manager, which is
+        entered whenever the phase starts and exited when it ends. For example,
+        ``{"clustering": cProfile.Profile}`` runs cProfile only while ICE lines
+        are clustered. Hooks run in the process and thread that runs the phase,
+        so they must be picklable when tasks run in other processes.
+        Defaults to None.
+    :type profile_hooks: dict[str, Callable[[], ContextManager]] | None, optional
     :raises OSError: Raised when the ``output_path``, if provided, cannot be written to.
     :return: Wigdet data, or None if an ``output_path`` is provided.
     :rtype: dict | None
     """
 
-    # set up logging
+    items = iter_partial_dependence(
+        predict=predict,
+        df=df,
+        features=features,
+        resolution=resolution,
+        one_hot_features=one_hot_features,
+        nominal_features=nominal_features,
+        ordinal_features=ordinal_features,
+        feature_value_mappings=feature_value_mappings,
+        num_clusters_extent=num_clusters_extent,
+        decision_tree_params=decision_tree_params,
+        mixed_shape_tolerance=mixed_shape_tolerance,
+        compute_two_way_pdps=compute_two_way_pdps,
+        cluster_preprocessing=cluster_preprocessing,
+        cluster_method=cluster_method,
+        cluster_sample_size=cluster_sample_size,
+        silhouette_method=silhouette_method,
+        silhouette_sample_size=silhouette_sample_size,
+        explanation_method=explanation_method,
+        explanation_sample_size=explanation_sample_size,
+        explanation_max_bins=explanation_max_bins,
+        batch_size=batch_size,
+        predict_input=predict_input,
+        pdp_method=pdp_method,
+        cache_dir=cache_dir,
+        cache_model_id=cache_model_id,
+        cache_max_size=cache_max_size,
+        checkpoint_dir=checkpoint_dir,
+        progressive_tolerance=progressive_tolerance,
+        progressive_block_size=progressive_block_size,
+        n_jobs=n_jobs,
+        backend=backend,
+        executor=executor,
+        shared_data_dir=shared_data_dir,
+        seed=seed,
+        output_path=output_path,
+        output_format=output_format,
+        logging_level=logging_level,
+        progress_callback=progress_callback,
+        profile=profile,
+        profile_callback=profile_callback,
+        profile_hooks=profile_hooks,
+    )
 
-    valid_levels = ["DEBUG", "INFO", "WARNING", "ERROR"]
-    if logging_level not in valid_levels:
-        raise ValueError(f"Unknown logging_level {logging_level}.")
+    for item in items:
+        if item["type"] == "results":
+            results = item["results"]
 
-    log_level = logging.getLevelName(logging_level)
-    logger.setLevel(log_level)
+    if not output_path:
+        return results
 
-    ch = logging.StreamHandler()
-    formatter = logging.Formatter("%(name)s - %(levelname)s - %(message)s")
-    ch.setFormatter(formatter)
-    logger.addHandler(ch)
 
-    # check for valid cluster preprocessing
-    valid_preprocessing = ["diff", "center"]
-    if cluster_preprocessing not in valid_preprocessing:
-        raise ValueError(f"Unknown cluster_preprocessing {cluster_preprocessing}.")
+def iter_partial_dependence(
+    *,
+    predict: Callable[[Union[pd.DataFrame, np.ndarray]], List[float]],
+    df: pd.DataFrame,
+    features: List[str],
+    resolution: int = 20,
+    one_hot_features: Union[Dict[str, List[Tuple[str, str]]], None] = None,
+    nominal_features: Union[List[str], None] = None,
+    ordinal_features: Union[List[str], None] = None,
+    feature_value_mappings: Union[Dict[str, Dict[str, str]], None] = None,
+    num_clusters_extent: Tuple[int, int] = (2, 5),
+    decision_tree_params: Union[Dict[str, Any], None] = None,
+    mixed_shape_tolerance: float = 0.29,
+    compute_two_way_pdps: bool = True,
+    cluster_preprocessing: str = "diff",
+    cluster_method: str = "kmeans",
+    cluster_sample_size: int = 10_000,
+    silhouette_method: str = "auto",
+    silhouette_sample_size: int = 5000,
+    explanation_method: str = "one_vs_rest",
+    explanation_sample_size: Union[int, None] = None,
+    explanation_max_bins: Union[int, None] = None,
+    batch_size: Union[int, None] = None,
+    predict_input: str = "dataframe",
+    pdp_method: str = "brute",
+    cache_dir: Union[str, None] = None,
+    cache_model_id: Union[str, None] = None,
+    cache_max_size: int = 2**30,
+    checkpoint_dir: Union[str, None] = None,
+    progressive_tolerance: Union[float, None] = None,
+    progressive_block_size: int = 1000,
+    n_jobs: int = 1,
+    backend: str = "processes",
+    executor: Union[Executor, None] = None,
+    shared_data_dir: Union[str, None] = None,
+    seed: Union[int, None] = None,
+    output_path: Union[str, None] = None,
+    output_format: str = "json",
+    logging_level: str = "INFO",
+    progress_callback: Union[Callable[[dict], None], None] = None,
+    profile: bool = False,
+    profile_callback: Union[Callable[[dict], None], None] = None,
+    profile_hooks: Union[Dict[str, Callable[[], Any]], None] = None,
+) -> Iterator[dict]:
+    """Calculates the same data as :func:`partial_dependence`, but yields each
+    one-way and two-way PDP as soon as it is done, so that they can be shown or
+    saved while the rest are computed. The parameters are the same.
+
+    Each item is a dictionary whose ``type`` is one of:
+
+    - "one_way": ``features`` is a list with the feature, ``pdp`` is its
+      one-way PDP, including the clusterings of its ICE lines, and
+      ``ice_lines`` are its ICE lines, as they appear in ``one_way_pds`` and
+      ``feature_to_ice_lines`` of the results.
+    - "two_way": ``features`` is the pair of features and ``pdp`` is their
+      two-way PDP, as it appears in ``two_way_pds``.
+    - "results": The last item. ``results`` is the widget data that
+      :func:`partial_dependence` returns, including the extents across all of
+      the plots. It is given even when ``output_path`` is provided.
+
+    PDPs are yielded in the order that they finish, which depends on
+    ``n_jobs`` and ``backend``. PDPs that are loaded from ``checkpoint_dir``
+    are yielded first.
+
+    Nothing is computed until the first item is requested, so invalid
+    parameters are raised then. Closing the generator before its end, such as
+    with ``contextlib.closing``, stops starting new tasks and releases the
+    workers and the dataset's shared file.
+
+    :return: Yields the PDPs as they finish, followed by the results.
+    :rtype: Iterator[dict]
+    """
+
+    log_level = _set_up_logging(logging_level)
+
+    _check_params(
+        cluster_preprocessing=cluster_preprocessing,
+        cluster_method=cluster_method,
+        silhouette_method=silhouette_method,
+        explanation_method=explanation_method,
+        predict_input=predict_input,
+        batch_size=batch_size,
+        pdp_method=pdp_method,
+    )
+
+    if df.shape[0] == 0:
+        raise ValueError("df must have at least one row.")
+
+    if progressive_tolerance is not None and progressive_block_size < 2:
+        raise ValueError(
+            f"progressive_block_size must be at least 2, but got {progressive_block_size}."
+        )
 
     # check that the output path exists if provided so that the function
     # can fail quickly, rather than waiting until all the work is done
@@ -146,6 +518,47 @@ def partial_dependence(
         if not path.parent.is_dir():
             raise OSError(f"Cannot write to {path.parent}")
 
+    valid_backends = ["processes", "threads"]
+    if backend not in valid_backends:
+        raise ValueError(f"Unknown backend {backend}.")
+
+    # async predict functions are called from threads that share one event
+    # loop, so that several requests to the model are in flight at once
+    if is_async_function(predict):
+        predict = AsyncPredictor(predict)
+
+    recursion_model = (
+        get_recursion_model(predict) if pdp_method == "recursion" else None
+    )
+
+    if recursion_model is not None:
+        check_recursion_columns(recursion_model, df.columns)
+
+    # the event loop is stopped at the end of the run, including the loop of an
+    # AsyncPredictor that was passed in, which starts again if it is called
+    async_predictor = predict if isinstance(predict, AsyncPredictor) else None
+
+    if async_predictor is not None:
+        backend = "threads"
+
+        if n_jobs == 1 and executor is None:
+            n_jobs = predict.max_in_flight
+
+    valid_output_formats = ["json", "binary"]
+    if output_format not in valid_output_formats:
+        raise ValueError(f"Unknown output_format {output_format}.")
+
+    # progress events include the number of rows that each task scored
+    if (
+        profile
+        or profile_callback is not None
+        or profile_hooks is not None
+        or progress_callback is not None
+    ):
+        profiler = Profiler(hooks=profile_hooks)
+    else:
+        profiler = None
+
     # set default values
 
     if decision_tree_params is None:
@@ -153,37 +566,265 @@ def partial_dependence(
 
     # calculate feature metadata
 
-    md = Metadata(
-        df,
-        resolution,
-        features,
-        one_hot_features,
-        nominal_features,
-        ordinal_features,
-        feature_value_mappings,
+    with _profile_phase(profiler, "metadata"):
+        md = Metadata(
+            df,
+            resolution,
+            features,
+            one_hot_features,
+            nominal_features,
+            ordinal_features,
+            feature_value_mappings,
+        )
+
+    if predict_input == "numpy":
+        # features are restored from saved columns, so the only copy
+        # needed is the array that gets perturbed
+        subset = df.to_numpy(copy=True)
+        subset_copy = df
+    else:
+        # TODO: reset index?
+        subset = df.copy()
+        subset_copy = df.copy()
+
+    if cache_dir is not None or checkpoint_dir is not None:
+        model_id = (
+            cache_model_id if cache_model_id is not None else get_model_id(predict)
+        )
+        dataset_id = get_dataset_id(df)
+
+    if cache_dir is not None:
+        cache = PredictionCache(
+            directory=cache_dir,
+            model_id=model_id,
+            dataset_id=dataset_id,
+            max_size=cache_max_size,
+        )
+    else:
+        cache = None
+
+    if checkpoint_dir is not None:
+        # the parameters that affect the results. compute_two_way_pdps is left
+        # out so that two-way PDPs can be added to a finished run.
+        checkpoint = Checkpoint(
+            directory=checkpoint_dir,
+            run_id=get_run_id(
+                model_id=model_id,
+                dataset_id=dataset_id,
+                params={
+                    "features": features,
+                    "resolution": resolution,
+                    "one_hot_features": one_hot_features,
+                    "nominal_features": nominal_features,
+                    "ordinal_features": ordinal_features,
+                    "feature_value_mappings": feature_value_mappings,
+                    "num_clusters_extent": num_clusters_extent,
+                    "decision_tree_params": decision_tree_params,
+                    "mixed_shape_tolerance": mixed_shape_tolerance,
+                    "cluster_preprocessing": cluster_preprocessing,
+                    "cluster_method": cluster_method,
+                    "cluster_sample_size": cluster_sample_size,
+                    "silhouette_method": silhouette_method,
+                    "silhouette_sample_size": silhouette_sample_size,
+                    "explanation_method": explanation_method,
+                    "explanation_sample_size": explanation_sample_size,
+                    "explanation_max_bins": explanation_max_bins,
+                    "pdp_method": pdp_method,
+                    "progressive_tolerance": progressive_tolerance,
+                    "progressive_block_size": progressive_block_size,
+                    "seed": seed,
+                },
+            ),
+        )
+    else:
+        checkpoint = None
+
+    # the tasks run in this process when there is one job and no executor
+    in_process = n_jobs == 1 and executor is None
+    thread_pool = None
+
+    if executor is None and not in_process:
+        num_workers = effective_n_jobs(n_jobs)
+
+        if backend == "threads":
+            executor = thread_pool = LimitedThreadPoolExecutor(num_workers)
+        else:
+            executor = get_reusable_executor(max_workers=num_workers)
+
+    # otherwise, the dataset is written to a memory-mapped file once rather
+    # than being pickled into every task, or each thread gets its own copy
+    shared_data = (
+        _share_dataset(subset, subset_copy, md, backend, shared_data_dir)
+        if not in_process
+        else None
     )
 
-    # TODO: reset index?
-    subset = df.copy()
-    subset_copy = df.copy()
+    progress = ProgressTracker(
+        callback=progress_callback, show_bar=log_level <= logging.INFO
+    )
 
     # one-way
 
     seed_sequence = SeedSequence(seed)
     seeds = seed_sequence.spawn(len(md.features_to_plot))
 
+    if progressive_tolerance is not None:
+        progressive_seed = seed_sequence.spawn(1)[0]
+        progressive = (
+            checkpoint.get("progressive", []) if checkpoint is not None else None
+        )
+
+        if progressive is None:
+            logger.info("Estimating ICE lines from random blocks of rows.")
+
+            progressive = _calc_ice_progressively(
+                predict=predict,
+                data=subset,
+                data_copy=subset_copy,
+                md=md,
+                shared_data=shared_data,
+                tolerance=progressive_tolerance,
+                block_size=progressive_block_size,
+                random_state=RandomState(MT19937(progressive_seed)),
+                batch_size=batch_size,
+                n_jobs=n_jobs,
+                executor=executor,
+                profiler=profiler,
+                progress=progress,
+            )
+
+            if checkpoint is not None:
+                checkpoint.put("progressive", [], progressive)
+
+        (
+            row_indices,
+            feature_to_sample_ice_lines,
+            feature_to_standard_error,
+        ) = progressive
+
+        logger.info("Using %d of %d rows.", len(row_indices), md.size)
+
+        # the rest of the one-way computation only uses the sampled rows
+        sample_df = df.iloc[row_indices].reset_index(drop=True)
+        one_way_data = (
+            subset[row_indices] if predict_input == "numpy" else sample_df.copy()
+        )
+        one_way_data_copy = sample_df
+        one_way_shared_data = (
+            _share_dataset(
+                one_way_data, one_way_data_copy, md, backend, shared_data_dir
+            )
+            if not in_process
+            else None
+        )
+    else:
+        row_indices = None
+        feature_to_sample_ice_lines = {}
+        sample_df = df
+        one_way_data = subset
+        one_way_data_copy = subset_copy
+        one_way_shared_data = shared_data
+
+    # one-way results that were saved by an earlier run
+    feature_to_result = {}
+
+    if checkpoint is not None:
+        for feature in md.features_to_plot:
+            result = checkpoint.get("one_way", [feature])
+
+            if result is not None:
+                feature_to_result[feature] = result
+
+        if feature_to_result:
+            logger.info(
+                "Loaded %d one-way PDPs from the checkpoint.", len(feature_to_result)
+            )
+
+    if cluster_method == "batched":
+        batched_seed = seed_sequence.spawn(1)[0]
+
+    num_unfinished = len(md.features_to_plot) - len(feature_to_result)
+
+    if cluster_method == "batched" and num_unfinished > 0:
+        # the ICE lines of all features are computed first, so that they can
+        # be clustered together
+        missing = [
+            feature
+            for feature in md.features_to_plot
+            if feature not in feature_to_sample_ice_lines
+        ]
+
+        if missing:
+            logger.info("Calculating ICE lines for %d features.", len(missing))
+
+        ice_lines_scheduler = _get_scheduler(executor, n_jobs, profiler, progress)
+
+        if in_process:
+            ice_lines_fn = _calc_ice_lines
+            data_args = {"data": one_way_data, "data_copy": one_way_data_copy, "md": md}
+        else:
+            ice_lines_fn = _calc_ice_lines_shared
+            data_args = {"shared_data": one_way_shared_data}
+
+        for feature in missing:
+            ice_lines_scheduler.submit(
+                key=("ice_lines", (feature,)),
+                cost=len(md.feature_info[feature]["values"]),
+                fn=ice_lines_fn,
+                kwargs={
+                    **data_args,
+                    "predict": predict,
+                    "feature": feature,
+                    "batch_size": batch_size,
+                    "cache": cache,
+                },
+            )
+
+        missing_ice_lines = {
+            feature: ice_lines
+            for (_, (feature,)), ice_lines in ice_lines_scheduler.as_completed()
+        }
+
+        # in the order of the features, since it affects the batched clustering
+        feature_to_sample_ice_lines = {
+            **feature_to_sample_ice_lines,
+            **{feature: missing_ice_lines[feature] for feature in missing},
+        }
+
+        logger.info("Clustering ICE lines.")
+
+        with _profile_phase(profiler, "clustering"):
+            feature_to_clusterings = _cluster_ice_lines_batched(
+                feature_to_ice_lines=feature_to_sample_ice_lines,
+                num_clusters_extent=num_clusters_extent,
+                cluster_preprocessing=cluster_preprocessing,
+                random_state=RandomState(MT19937(batched_seed)),
+            )
+    else:
+        ice_lines_scheduler = None
+        feature_to_clusterings = {}
+
     one_way_work = [
         {
             "predict": predict,
-            "data": subset,
-            "data_copy": subset_copy,
             "feature": feature,
-            "md": md,
             "num_clusters_extent": num_clusters_extent,
             "mixed_shape_tolerance": mixed_shape_tolerance,
             "cluster_preprocessing": cluster_preprocessing,
+            "cluster_method": cluster_method,
+            "cluster_sample_size": cluster_sample_size,
+            "silhouette_method": silhouette_method,
+            "silhouette_sample_size": silhouette_sample_size,
+            "explanation_method": explanation_method,
+            "explanation_sample_size": explanation_sample_size,
+            "explanation_max_bins": explanation_max_bins,
             "decision_tree_params": decision_tree_params,
+            "batch_size": batch_size,
+            "cache": cache,
             "seed_sequence": seeds[i],
+            "ice_lines": feature_to_sample_ice_lines.get(feature),
+            "candidate_clusterings": feature_to_clusterings.get(feature),
+            "recursion_model": recursion_model,
         }
         for i, feature in enumerate(md.features_to_plot)
     ]
@@ -191,64 +832,356 @@ def partial_dependence(
     num_one_way = len(md.features_to_plot)
     logger.info("Calculating %d one-way PDPs.", num_one_way)
 
-    disable_tqdm = log_level > logging.INFO
+    if compute_two_way_pdps:
+        logger.info(
+            "Two-way PDPs are calculated once the one-way PDPs of both features"
+            " are done."
+        )
 
-    if n_jobs == 1:
-        one_way_results = [
-            _calc_one_way_pd(**args)
-            for args in tqdm(one_way_work, ncols=80, disable=disable_tqdm)
-        ]
+    # each pair gets a seed based on the positions of its features, so that
+    # it does not depend on the order that the one-way PDPs finish in
+    pair_seed_sequence = seed_sequence.spawn(1)[0]
+    feature_to_index = {feature: i for i, feature in enumerate(md.features_to_plot)}
+
+    scheduler = _get_scheduler(executor, n_jobs, profiler, progress)
+
+    if in_process:
+        one_way_fn = _calc_one_way_pd
+        one_way_data_args = {
+            "data": one_way_data,
+            "data_copy": one_way_data_copy,
+            "md": md,
+        }
+        two_way_fn = _calc_two_way_pd
+        two_way_data_args = {
+            "data": subset,
+            "data_copy": subset_copy,
+            "feature_info": md.feature_info,
+            "column_indices": md.column_indices,
+        }
     else:
-        with tqdm_joblib(
-            tqdm(total=num_one_way, unit="PDP", ncols=80, disable=disable_tqdm)
-        ) as _:
-            one_way_results = Parallel(n_jobs=n_jobs)(
-                delayed(_calc_one_way_pd)(**args) for args in one_way_work
+        one_way_fn = _calc_one_way_pd_shared
+        one_way_data_args = {"shared_data": one_way_shared_data}
+        two_way_fn = _calc_two_way_pd_shared
+        two_way_data_args = {"shared_data": shared_data}
+
+    for args in one_way_work:
+        feature = args["feature"]
+
+        if feature in feature_to_result:
+            continue
+
+        scheduler.submit(
+            key=("one_way", (feature,)),
+            cost=estimate_one_way_cost(
+                num_values=len(md.feature_info[feature]["values"]),
+                num_rows=sample_df.shape[0],
+                num_clusters_extent=num_clusters_extent,
+                predict=args["ice_lines"] is None,
+            ),
+            fn=one_way_fn,
+            kwargs={**one_way_data_args, **args},
+        )
+
+    pair_to_pd = {}
+    found_pairs = set()
+    started_pairs = set()
+
+    def start_ready_pairs(one_way_result):
+        # start the pairs whose one-way PDPs are both done, yielding the ones
+        # that were saved by an earlier run
+        if not compute_two_way_pdps:
+            return
+
+        found_pairs.update(one_way_result[1])
+        ready_pairs = sorted(
+            pair
+            for pair in found_pairs - started_pairs
+            if pair[0] in feature_to_result and pair[1] in feature_to_result
+        )
+
+        for pair in ready_pairs:
+            started_pairs.add(pair)
+
+            if checkpoint is not None:
+                saved = checkpoint.get("two_way", pair)
+
+                if saved is not None:
+                    pair_to_pd[pair] = saved
+                    yield {"type": "two_way", "features": list(pair), "pdp": saved}
+                    continue
+
+            x_info, y_info = (md.feature_info[f] for f in pair)
+
+            scheduler.submit(
+                key=("two_way", pair),
+                # the trees are traversed once per cell, rather than once per
+                # cell and row
+                cost=estimate_two_way_cost(
+                    num_x_values=len(x_info["values"]),
+                    num_y_values=len(y_info["values"]),
+                    num_rows=md.size if recursion_model is None else 1,
+                ),
+                fn=two_way_fn,
+                kwargs={
+                    **two_way_data_args,
+                    "predict": predict,
+                    "pair": pair,
+                    "feature_to_pd": {f: feature_to_result[f][0] for f in pair},
+                    "batch_size": batch_size,
+                    "cache": cache,
+                    "progressive_tolerance": progressive_tolerance,
+                    "progressive_block_size": progressive_block_size,
+                    "recursion_model": recursion_model,
+                    "seed_sequence": SeedSequence(
+                        pair_seed_sequence.entropy,
+                        spawn_key=pair_seed_sequence.spawn_key
+                        + tuple(feature_to_index[f] for f in pair),
+                    ),
+                },
             )
+
+    def get_one_way_item(feature):
+        par_dep, _, ice_lines = feature_to_result[feature]
+
+        if progressive_tolerance is not None:
+            par_dep["standard_error"] = feature_to_standard_error[feature]
+            par_dep["num_rows_scored"] = len(row_indices)
+
+        return {
+            "type": "one_way",
+            "features": [feature],
+            "pdp": par_dep,
+            "ice_lines": ice_lines,
+        }
+
+    # the workers and the shared dataset are also released when the caller
+    # closes the generator before it is done
+    try:
+        for feature, result in list(feature_to_result.items()):
+            yield get_one_way_item(feature)
+            yield from start_ready_pairs(result)
+
+        for (kind, key), result in scheduler.as_completed():
+            if checkpoint is not None:
+                checkpoint.put(kind, key, result)
+
+            if kind == "two_way":
+                pair_to_pd[key] = result
+                yield {"type": "two_way", "features": list(key), "pdp": result}
+                continue
+
+            [feature] = key
+            feature_to_result[feature] = result
+
+            yield get_one_way_item(feature)
+            yield from start_ready_pairs(result)
+    finally:
+        progress.close()
+
+        if one_way_shared_data is not None and one_way_shared_data is not shared_data:
+            one_way_shared_data.close()
+
+        if shared_data is not None:
+            shared_data.close()
+
+        if thread_pool is not None:
+            thread_pool.shutdown()
+
+        if async_predictor is not None:
+            async_predictor.close()
+
+    one_way_results = [feature_to_result[f] for f in md.features_to_plot]
+
     # TODO: why are we sorting here?
     one_way_pds = sorted(
         [x[0] for x in one_way_results], key=itemgetter("deviation"), reverse=True
     )
-    feature_pairs = {pair for x in one_way_results for pair in x[1]}
+
     feature_to_ice_lines = {
         owp["x_feature"]: lines for owp, _, lines in one_way_results
     }
 
-    feature_to_pd = _get_feature_to_pd(one_way_pds) if one_way_pds else None
+    # sorted so that the order does not depend on when each pair finished
+    two_way_pds = [pair_to_pd[pair] for pair in sorted(pair_to_pd)]
+
+    results = _get_results(
+        one_way_pds=one_way_pds,
+        feature_to_ice_lines=feature_to_ice_lines,
+        two_way_pds=two_way_pds,
+        md=md,
+        df=sample_df,
+        params={
+            "resolution": resolution,
+            "num_clusters_extent": num_clusters_extent,
+            "decision_tree_params": decision_tree_params,
+            "mixed_shape_tolerance": mixed_shape_tolerance,
+            "compute_two_way_pdps": compute_two_way_pdps,
+            "cluster_preprocessing": cluster_preprocessing,
+            "cluster_method": cluster_method,
+            "cluster_sample_size": cluster_sample_size,
+            "silhouette_method": silhouette_method,
+            "silhouette_sample_size": silhouette_sample_size,
+            "explanation_method": explanation_method,
+            "explanation_sample_size": explanation_sample_size,
+            "explanation_max_bins": explanation_max_bins,
+            "batch_size": batch_size,
+            "predict_input": predict_input,
+            "pdp_method": pdp_method,
+            "progressive_tolerance": progressive_tolerance,
+            "progressive_block_size": progressive_block_size,
+        },
+    )
+
+    if row_indices is not None:
+        results["row_indices"] = row_indices.tolist()
 
-    # two-way
+    results["timings"] = [
+        {
+            "task": kind,
+            "features": list(features),
+            "estimated_cost": timing["cost"],
+            "seconds": timing["seconds"],
+        }
+        for timing in scheduler.timings
+        for kind, features in [timing["key"]]
+    ]
 
-    if compute_two_way_pdps:
-        two_way_work = [
-            {
-                "predict": predict,
-                "data": subset,
-                "data_copy": subset_copy,
-                "pair": pair,
-                "feature_info": md.feature_info,
-                "feature_to_pd": feature_to_pd,
-            }
-            for pair in feature_pairs
+    if profiler is not None:
+        # the batched ICE lines are computed in tasks of their own
+        task_timings = [
+            (timing["key"][0], list(timing["key"][1]), timing)
+            for timing in (
+                ice_lines_scheduler.timings if ice_lines_scheduler is not None else []
+            )
+        ]
+        task_timings += [
+            (timing["key"][0], list(timing["key"][1]), timing)
+            for timing in scheduler.timings
         ]
 
-        num_two_way = len(feature_pairs)
-        logger.info("Calculating %d two-way PDPs.", num_two_way)
+        profile_data = {
+            "phases": profiler.phases,
+            "tasks": [
+                {
+                    "task": kind,
+                    "features": features,
+                    "seconds": timing["seconds"],
+                    "phases": timing["phases"],
+                }
+                for kind, features, timing in task_timings
+            ],
+        }
 
-        if n_jobs == 1:
-            two_way_pds = [
-                _calc_two_way_pd(**args)
-                for args in tqdm(two_way_work, ncols=80, disable=disable_tqdm)
-            ]
-        else:
-            with tqdm_joblib(
-                tqdm(total=num_two_way, unit="PDP", ncols=80, disable=disable_tqdm)
-            ) as _:
-                two_way_pds = Parallel(n_jobs=n_jobs)(
-                    delayed(_calc_two_way_pd)(**args) for args in two_way_work
-                )
+        if profile:
+            results["profile"] = profile_data
+
+    if output_path:
+        with _profile_phase(profiler, "output"):
+            if output_format == "binary":
+                write_results(results, path)
+            else:
+                path.write_text(json.dumps(results), encoding="utf-8")
+
+    if profile_callback is not None:
+        profile_callback(profile_data)
+
+    yield {"type": "results", "results": results}
+
+
+def _get_scheduler(executor, n_jobs, profiler=None, progress=None):
+    if executor is None:
+        return TaskScheduler(profiler=profiler, progress=progress)
+
+    return TaskScheduler(
+        executor=executor,
+        max_workers=effective_n_jobs(n_jobs),
+        profiler=profiler,
+        progress=progress,
+    )
+
+
+def _profile_phase(profiler, name):
+    # phases of the main thread that are outside of the tasks
+    return profiler.phase(name) if profiler is not None else nullcontext()
+
+
+def _get_child_random_state(seed_sequence, index):
+    # a random state for the child of seed_sequence with the given index,
+    # without spawning from seed_sequence, which would change its state
+    return RandomState(
+        MT19937(
+            SeedSequence(
+                seed_sequence.entropy,
+                spawn_key=seed_sequence.spawn_key + (index,),
+            )
+        )
+    )
+
+
+def _share_dataset(data, data_copy, md, backend, directory):
+    if backend == "threads":
+        return ThreadLocalDataset(data, data_copy, md)
+
+    return SharedDataset(data, data_copy, md, directory=directory)
+
+
+def _set_up_logging(logging_level):
+    valid_levels = ["DEBUG", "INFO", "WARNING", "ERROR"]
+    if logging_level not in valid_levels:
+        raise ValueError(f"Unknown logging_level {logging_level}.")
+
+    log_level = logging.getLevelName(logging_level)
+    logger.setLevel(log_level)
+
+    ch = logging.StreamHandler()
+    formatter = logging.Formatter("%(name)s - %(levelname)s - %(message)s")
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+    return log_level
+
+
+def _check_params(
+    cluster_preprocessing,
+    cluster_method,
+    silhouette_method,
+    explanation_method,
+    predict_input,
+    batch_size,
+    pdp_method="brute",
+):
+    # check for valid cluster preprocessing
+    valid_preprocessing = ["diff", "center"]
+    if cluster_preprocessing not in valid_preprocessing:
+        raise ValueError(f"Unknown cluster_preprocessing {cluster_preprocessing}.")
+
+    if cluster_method not in CLUSTER_METHODS:
+        raise ValueError(f"Unknown cluster_method {cluster_method}.")
+
+    if silhouette_method not in SILHOUETTE_METHODS:
+        raise ValueError(f"Unknown silhouette_method {silhouette_method}.")
 
-        two_way_pds.sort(key=itemgetter("H"), reverse=True)
+    if explanation_method not in EXPLANATION_METHODS:
+        raise ValueError(f"Unknown explanation_method {explanation_method}.")
 
+    valid_predict_inputs = ["dataframe", "numpy"]
+    if predict_input not in valid_predict_inputs:
+        raise ValueError(f"Unknown predict_input {predict_input}.")
+
+    if batch_size is not None and batch_size < 1:
+        raise ValueError(f"batch_size must be positive, but got {batch_size}.")
+
+    valid_pdp_methods = ["brute", "recursion"]
+    if pdp_method not in valid_pdp_methods:
+        raise ValueError(f"Unknown pdp_method {pdp_method}.")
+
+
+def _get_results(one_way_pds, feature_to_ice_lines, two_way_pds, md, df, params):
+    # Sort the two-way PDPs and calculate the extents across all of the plots.
+    two_way_pds.sort(key=itemgetter("H"), reverse=True)
+
+    if params["compute_two_way_pdps"]:
         two_way_pdp_min = math.inf
         two_way_pdp_max = -math.inf
 
@@ -264,7 +1197,6 @@ def partial_dependence(
             if twp["interaction_max"] > two_way_interaction_max:
                 two_way_interaction_max = twp["interaction_max"]
     else:
-        two_way_pds = []
         two_way_pdp_min = 0
         two_way_pdp_max = 0
         two_way_interaction_max = 0
@@ -322,7 +1254,7 @@ def partial_dependence(
 
     # to make the dataset easier to work with on the frontend,
     # turn one-hot encoded features into integer encoded categories
-    frontend_df = _turn_one_hot_into_category(subset, md)
+    frontend_df = _turn_one_hot_into_category(df, md)
 
     # output
 
@@ -339,24 +1271,14 @@ def partial_dependence(
         "ice_line_extent": [ice_line_min, ice_line_max],
         "ice_cluster_center_extent": [ice_cluster_center_min, ice_cluster_center_max],
         "centered_ice_line_extent": [centered_ice_line_min, centered_ice_line_max],
-        "num_instances": md.size,
+        "num_instances": df.shape[0],
         "dataset": frontend_df.to_dict(orient="list"),
         "feature_info": md.feature_info,
         "one_hot_encoded_col_name_to_feature": md.one_hot_encoded_col_name_to_feature,
-        "params": {
-            "resolution": resolution,
-            "num_clusters_extent": num_clusters_extent,
-            "decision_tree_params": decision_tree_params,
-            "mixed_shape_tolerance": mixed_shape_tolerance,
-            "compute_two_way_pdps": compute_two_way_pdps,
-            "cluster_preprocessing": cluster_preprocessing,
-        },
+        "params": params,
     }
 
-    if output_path:
-        path.write_text(json.dumps(results), encoding="utf-8")
-    else:
-        return results
+    return results
 
 
 def _calc_one_way_pd(
@@ -370,23 +1292,54 @@ def _calc_one_way_pd(
     cluster_preprocessing,
     decision_tree_params,
     seed_sequence,
+    cluster_method="kmeans",
+    cluster_sample_size=10_000,
+    silhouette_method="auto",
+    silhouette_sample_size=5000,
+    explanation_method="one_vs_rest",
+    explanation_sample_size=None,
+    explanation_max_bins=None,
+    batch_size=None,
+    cache=None,
+    ice_lines=None,
+    ice_summary=None,
+    candidate_clusterings=None,
+    recursion_model=None,
 ):
     random_state = RandomState(MT19937(seed_sequence))
 
+    # the silhouette and explanation samples are drawn from random states of
+    # their own, so that sampling does not change the clusterings
+    silhouette_random_state = _get_child_random_state(seed_sequence, 0)
+    explanation_random_state = _get_child_random_state(seed_sequence, 1)
+
     feat_info = md.feature_info[feature]
 
-    ice_lines = []
+    if ice_lines is None:
+        ice_lines = _calc_ice_lines(
+            predict=predict,
+            data=data,
+            data_copy=data_copy,
+            feature=feature,
+            md=md,
+            batch_size=batch_size,
+            cache=cache,
+        )
 
-    for value in feat_info["values"]:
-        _set_feature(feature, value, data, feat_info)
-        predictions = predict(data)
-        ice_lines.append(predictions.tolist())
+    # the summary can be given when ice_lines are only a sample of the lines
+    if ice_summary is None:
+        ice_summary = _summarize_ice_lines(ice_lines)
 
-    _reset_feature(feature, data, data_copy, feat_info)
+    ice_deviation = ice_summary["deviation"]
+    mean_predictions = ice_summary["mean_predictions"]
 
-    ice_lines = np.array(ice_lines).T
-    ice_deviation = np.std(ice_lines, axis=1).mean().item()
-    mean_predictions = np.mean(ice_lines, axis=0)
+    if recursion_model is not None:
+        mean_predictions = recursion_grid_means(
+            model=recursion_model,
+            features=[feature],
+            cells=[(value,) for value in feat_info["values"]],
+            column_indices=md.column_indices,
+        )
 
     mean_predictions_centered = (mean_predictions - mean_predictions.mean()).tolist()
 
@@ -397,15 +1350,28 @@ def _calc_one_way_pd(
 
     ice, pairs = _calculate_ice(
         ice_lines=ice_lines,
-        data=data,
+        data=data_copy,
         feature=feature,
         md=md,
         num_clusters_extent=num_clusters_extent,
         cluster_preprocessing=cluster_preprocessing,
         decision_tree_params=decision_tree_params,
         random_state=random_state,
+        silhouette_random_state=silhouette_random_state,
+        explanation_random_state=explanation_random_state,
+        cluster_method=cluster_method,
+        cluster_sample_size=cluster_sample_size,
+        silhouette_method=silhouette_method,
+        silhouette_sample_size=silhouette_sample_size,
+        explanation_method=explanation_method,
+        explanation_sample_size=explanation_sample_size,
+        explanation_max_bins=explanation_max_bins,
+        candidate_clusterings=candidate_clusterings,
     )
 
+    for key in ["ice_min", "ice_max", "centered_ice_min", "centered_ice_max"]:
+        ice[key] = ice_summary[key]
+
     par_dep = {
         "num_features": 1,
         "id": feature,
@@ -438,71 +1404,330 @@ def _calc_one_way_pd(
     return par_dep, pairs, ice_lines.tolist()
 
 
-def _calc_two_way_pd(
+def _summarize_ice_lines(ice_lines):
+    centered_ice_lines = ice_lines - ice_lines[:, 0].reshape(-1, 1)
+
+    return {
+        "mean_predictions": np.mean(ice_lines, axis=0),
+        "deviation": np.std(ice_lines, axis=1).mean().item(),
+        "ice_min": ice_lines.min().item(),
+        "ice_max": ice_lines.max().item(),
+        "centered_ice_min": centered_ice_lines.min().item(),
+        "centered_ice_max": centered_ice_lines.max().item(),
+    }
+
+
+def _calc_ice_lines(predict, data, data_copy, feature, md, batch_size=None, cache=None):
+    cells = [(value,) for value in md.feature_info[feature]["values"]]
+
+    if cache is not None:
+        cache_key = cache.key("ice", [feature], cells)
+        ice_lines = cache.get(cache_key)
+
+        if ice_lines is not None:
+            return ice_lines
+
+    # all values x all rows, scored in as few calls to predict as
+    # batch_size allows
+    with profile_phase("ice_lines"):
+        ice_lines = predict_grid(
+            predict=predict,
+            data=data,
+            data_copy=data_copy,
+            features=[feature],
+            cells=cells,
+            feature_info=md.feature_info,
+            batch_size=batch_size,
+            column_indices=md.column_indices,
+        ).T
+
+    if cache is not None:
+        cache.put(cache_key, ice_lines)
+
+    return ice_lines
+
+
+def _calc_ice_progressively(
+    predict,
+    data,
+    data_copy,
+    md,
+    shared_data,
+    tolerance,
+    block_size,
+    random_state,
+    batch_size,
+    n_jobs,
+    executor=None,
+    profiler=None,
+    progress=None,
+):
+    # Add random blocks of rows to the ICE lines of every feature until the
+    # PDP of every feature is within the tolerance. All features use the same
+    # rows so that the ICE lines line up with the returned rows of the dataset.
+    order = random_state.permutation(md.size)
+
+    feature_to_blocks = {feature: [] for feature in md.features_to_plot}
+    feature_to_stats = {
+        feature: (
+            np.zeros(len(md.feature_info[feature]["values"])),
+            np.zeros(len(md.feature_info[feature]["values"])),
+            0,
+        )
+        for feature in md.features_to_plot
+    }
+    feature_to_standard_error = {}
+    num_rows = 0
+
+    for start in range(0, md.size, block_size):
+        rows = order[start : start + block_size]
+        num_rows += len(rows)
+
+        scheduler = _get_scheduler(executor, n_jobs, profiler, progress)
+
+        for feature in md.features_to_plot:
+            if scheduler.executor is None:
+                fn = _calc_ice_block
+                data_args = {"data": data, "data_copy": data_copy, "md": md}
+            else:
+                fn = _calc_ice_block_shared
+                data_args = {"shared_data": shared_data}
+
+            scheduler.submit(
+                key=("ice_block", (feature,)),
+                cost=len(md.feature_info[feature]["values"]) * len(rows),
+                fn=fn,
+                kwargs={
+                    **data_args,
+                    "predict": predict,
+                    "feature": feature,
+                    "rows": rows,
+                    "batch_size": batch_size,
+                },
+            )
+
+        feature_to_block = {
+            feature: block for (_, (feature,)), block in scheduler.as_completed()
+        }
+
+        for feature in md.features_to_plot:
+            block = feature_to_block[feature]
+            feature_to_blocks[feature].append(block)
+            feature_to_stats[feature] = update_statistics(
+                *feature_to_stats[feature], block.T
+            )
+
+        feature_to_standard_error = {
+            feature: get_standard_error(m2, count)
+            for feature, (_, m2, count) in feature_to_stats.items()
+        }
+
+        if all(se <= tolerance for se in feature_to_standard_error.values()):
+            break
+
+    # put the rows back in the order that they have in the dataset
+    sort_order = np.argsort(order[:num_rows])
+    row_indices = order[:num_rows][sort_order]
+
+    feature_to_ice_lines = {
+        feature: (
+            np.vstack(blocks)[sort_order]
+            if blocks
+            else np.empty((0, len(md.feature_info[feature]["values"])))
+        )
+        for feature, blocks in feature_to_blocks.items()
+    }
+
+    return row_indices, feature_to_ice_lines, feature_to_standard_error
+
+
+def _calc_ice_block(predict, data, data_copy, md, feature, rows, batch_size):
+    block_data, block_data_copy = take_rows(data, data_copy, rows)
+
+    with profile_phase("ice_lines"):
+        return predict_grid(
+            predict=predict,
+            data=block_data,
+            data_copy=block_data_copy,
+            features=[feature],
+            cells=[(value,) for value in md.feature_info[feature]["values"]],
+            feature_info=md.feature_info,
+            batch_size=batch_size,
+            column_indices=md.column_indices,
+        ).T
+
+
+def _calc_ice_lines_shared(shared_data, **kwargs):
+    data, data_copy, md = shared_data.attach()
+    return _calc_ice_lines(data=data, data_copy=data_copy, md=md, **kwargs)
+
+
+def _calc_ice_block_shared(shared_data, **kwargs):
+    data, data_copy, md = shared_data.attach()
+    return _calc_ice_block(data=data, data_copy=data_copy, md=md, **kwargs)
+
+
+def _calc_one_way_pd_shared(shared_data, **kwargs):
+    data, data_copy, md = shared_data.attach()
+    return _calc_one_way_pd(data=data, data_copy=data_copy, md=md, **kwargs)
+
+
+def _calc_two_way_means_in_threads(
     predict,
     data,
     data_copy,
     pair,
     feature_info,
-    feature_to_pd,
+    n_jobs,
+    batch_size=None,
+    column_indices=None,
 ):
-    x_feature, y_feature = pair
-    x_feat_info = feature_info[x_feature]
-    y_feat_info = feature_info[y_feature]
+    # split the cells of a two-way grid among threads that each perturb their
+    # own copy of the dataset, in the order that _calc_two_way_pd uses
+    x_feature, y_feature = _orient_pair(pair, feature_info)
+    cells = [
+        (x_value, y_value)
+        for x_value in feature_info[x_feature]["values"]
+        for y_value in feature_info[y_feature]["values"]
+    ]
 
-    # when one feature is quantitative and the other is categorical,
-    # make the y feature be categorical
+    num_workers = effective_n_jobs(n_jobs)
+    cells_per_task = math.ceil(len(cells) / num_workers)
+    shared_data = ThreadLocalDataset(data, data_copy, md=None)
+
+    with LimitedThreadPoolExecutor(num_workers) as executor:
+        scheduler = TaskScheduler(executor=executor, max_workers=num_workers)
+
+        for start in range(0, len(cells), cells_per_task):
+            scheduler.submit(
+                key=start,
+                cost=len(cells) - start,
+                fn=_mean_grid_predictions_shared,
+                kwargs={
+                    "shared_data": shared_data,
+                    "predict": predict,
+                    "features": [x_feature, y_feature],
+                    "cells": cells[start : start + cells_per_task],
+                    "feature_info": feature_info,
+                    "batch_size": batch_size,
+                    "column_indices": column_indices,
+                },
+            )
 
-    if y_feat_info["kind"] == "quantitative" and x_feat_info["kind"] != "quantitative":
-        x_feature, y_feature = y_feature, x_feature
-        x_feat_info, y_feat_info = y_feat_info, x_feat_info
+        start_to_means = dict(scheduler.as_completed())
 
-    x_axis = x_feat_info["values"]
-    y_axis = y_feat_info["values"]
+    return np.concatenate([start_to_means[start] for start in sorted(start_to_means)])
 
-    x_values = []
-    y_values = []
-    rows = []
-    cols = []
-    mean_predictions = []
 
-    x_pdp = feature_to_pd[x_feature]
-    y_pdp = feature_to_pd[y_feature]
-    no_interactions = []
+def _mean_grid_predictions_shared(shared_data, **kwargs):
+    data, data_copy, _ = shared_data.attach()
+    return mean_grid_predictions(data=data, data_copy=data_copy, **kwargs)
 
-    pdp_min = math.inf
-    pdp_max = -math.inf
 
-    for c, x_value in enumerate(x_axis):
-        _set_feature(x_feature, x_value, data, x_feat_info)
+def _calc_two_way_pd_shared(shared_data, **kwargs):
+    data, data_copy, md = shared_data.attach()
+    return _calc_two_way_pd(
+        data=data,
+        data_copy=data_copy,
+        feature_info=md.feature_info,
+        column_indices=md.column_indices,
+        **kwargs,
+    )
 
-        for r, y_value in enumerate(y_axis):
-            _set_feature(y_feature, y_value, data, y_feat_info)
 
-            predictions = predict(data)
-            mean_pred = np.mean(predictions).item()
+def _calc_two_way_pd(
+    predict,
+    data,
+    data_copy,
+    pair,
+    feature_info,
+    feature_to_pd,
+    batch_size=None,
+    column_indices=None,
+    cache=None,
+    progressive_tolerance=None,
+    progressive_block_size=1000,
+    seed_sequence=None,
+    mean_predictions=None,
+    recursion_model=None,
+):
+    x_feature, y_feature = _orient_pair(pair, feature_info)
+    x_feat_info = feature_info[x_feature]
+    y_feat_info = feature_info[y_feature]
 
-            mean_predictions.append(mean_pred)
+    x_axis = x_feat_info["values"]
+    y_axis = y_feat_info["values"]
 
-            x_values.append(x_value)
-            y_values.append(y_value)
-            rows.append(r)
-            cols.append(c)
+    x_pdp = feature_to_pd[x_feature]
+    y_pdp = feature_to_pd[y_feature]
 
-            no_interactions.append(
-                x_pdp["mean_predictions_centered"][c]
-                + y_pdp["mean_predictions_centered"][r]
+    # the x value changes slowest, so cell i is in column i // len(y_axis)
+    # and row i % len(y_axis) of the grid
+    cells = [(x_value, y_value) for x_value in x_axis for y_value in y_axis]
+
+    standard_error = None
+
+    if mean_predictions is not None:
+        # already computed
+        mean_predictions = np.asarray(mean_predictions)
+    elif recursion_model is not None:
+        with profile_phase("two_way_grid"):
+            mean_predictions = recursion_grid_means(
+                model=recursion_model,
+                features=[x_feature, y_feature],
+                cells=cells,
+                column_indices=column_indices,
+            )
+    elif progressive_tolerance is not None:
+        with profile_phase("two_way_grid"):
+            mean_predictions, standard_error, num_rows_scored = estimate_grid_means(
+                predict=predict,
+                data=data,
+                data_copy=data_copy,
+                features=[x_feature, y_feature],
+                cells=cells,
+                feature_info=feature_info,
+                tolerance=progressive_tolerance,
+                block_size=progressive_block_size,
+                random_state=RandomState(MT19937(seed_sequence)),
+                batch_size=batch_size,
+                column_indices=column_indices,
+            )
+    elif cache is not None:
+        cache_key = cache.key("two_way", [x_feature, y_feature], cells)
+        mean_predictions = cache.get(cache_key)
+    else:
+        mean_predictions = None
+
+    if mean_predictions is None:
+        with profile_phase("two_way_grid"):
+            mean_predictions = mean_grid_predictions(
+                predict=predict,
+                data=data,
+                data_copy=data_copy,
+                features=[x_feature, y_feature],
+                cells=cells,
+                feature_info=feature_info,
+                batch_size=batch_size,
+                column_indices=column_indices,
             )
 
-            if mean_pred < pdp_min:
-                pdp_min = mean_pred
+        if cache is not None:
+            cache.put(cache_key, mean_predictions)
+
+    pdp_min = mean_predictions.min().item()
+    pdp_max = mean_predictions.max().item()
 
-            if mean_pred > pdp_max:
-                pdp_max = mean_pred
+    mean_predictions = mean_predictions.tolist()
 
-            _reset_feature(y_feature, data, data_copy, y_feat_info)
+    x_values = [x_value for x_value, _ in cells]
+    y_values = [y_value for _, y_value in cells]
 
-        _reset_feature(x_feature, data, data_copy, x_feat_info)
+    no_interactions = [
+        x_pdp["mean_predictions_centered"][c] + y_pdp["mean_predictions_centered"][r]
+        for c in range(len(x_axis))
+        for r in range(len(y_axis))
+    ]
 
     mean_predictions_centered = np.array(mean_predictions) - np.mean(mean_predictions)
     interactions = mean_predictions_centered - np.array(no_interactions)
@@ -537,30 +1762,26 @@ def _calc_two_way_pd(
         "deviation": np.std(mean_predictions).item(),
     }
 
+    if standard_error is not None:
+        par_dep["standard_error"] = standard_error
+        par_dep["num_rows_scored"] = num_rows_scored
+
     return par_dep
 
 
-def _set_feature(feature, value, data, feature_info):
-    if feature_info["subkind"] == "one_hot":
-        col = feature_info["value_to_column"][feature_info["value_map"][value]]
-        all_features = [feat for feat, _ in feature_info["columns_and_values"]]
-        data[all_features] = 0
-        data[col] = 1
-    else:
-        data[feature] = value
+def _orient_pair(pair, feature_info):
+    x_feature, y_feature = pair
 
+    # when one feature is quantitative and the other is categorical,
+    # make the y feature be categorical
 
-def _reset_feature(
-    feature,
-    data,
-    data_copy,
-    feature_info,
-):
-    if feature_info["subkind"] == "one_hot":
-        all_features = [col for col, _ in feature_info["columns_and_values"]]
-        data[all_features] = data_copy[all_features]
-    else:
-        data[feature] = data_copy[feature]
+    if (
+        feature_info[y_feature]["kind"] == "quantitative"
+        and feature_info[x_feature]["kind"] != "quantitative"
+    ):
+        x_feature, y_feature = y_feature, x_feature
+
+    return x_feature, y_feature
 
 
 def _get_feature_to_pd(one_way_pds):
@@ -576,39 +1797,55 @@ def _calculate_ice(
     cluster_preprocessing,
     decision_tree_params,
     random_state,
+    silhouette_random_state,
+    explanation_random_state,
+    cluster_method="kmeans",
+    cluster_sample_size=10_000,
+    silhouette_method="auto",
+    silhouette_sample_size=5000,
+    explanation_method="one_vs_rest",
+    explanation_sample_size=None,
+    explanation_max_bins=None,
+    candidate_clusterings=None,
 ):
     centered_ice_lines = ice_lines - ice_lines[:, 0].reshape(-1, 1)
     centered_pdp = centered_ice_lines.mean(axis=0)
 
-    if cluster_preprocessing == "diff":
-        lines_to_cluster = np.diff(ice_lines)
-    elif cluster_preprocessing == "center":
-        lines_to_cluster = centered_ice_lines
+    lines_to_cluster = _get_lines_to_cluster(ice_lines, cluster_preprocessing)
 
-    distances = euclidean_distances(lines_to_cluster, lines_to_cluster)
+    scorer = SilhouetteScorer(
+        lines=lines_to_cluster,
+        method=silhouette_method,
+        sample_size=silhouette_sample_size,
+        random_state=silhouette_random_state,
+    )
+
+    explainer = ClusterExplainer(
+        data=data,
+        one_hot_encoded_col_name_to_feature=md.one_hot_encoded_col_name_to_feature,
+        decision_tree_params=decision_tree_params,
+        random_state=random_state,
+        method=explanation_method,
+        sample_size=explanation_sample_size,
+        max_bins=explanation_max_bins,
+        sample_random_state=explanation_random_state,
+    )
 
     best_score = -math.inf
     best_n_clusters = -1
 
     clusterings = {}
 
-    for n_clusters in range(num_clusters_extent[0], num_clusters_extent[1] + 1):
-        cluster_model = KMeans(
-            n_clusters=n_clusters,
-            init="k-means++",
-            n_init=5,
-            max_iter=300,
-            algorithm="lloyd",
+    if candidate_clusterings is None:
+        candidate_clusterings = iter_clusterings(
+            lines=lines_to_cluster,
+            num_clusters_extent=num_clusters_extent,
+            method=cluster_method,
+            sample_size=cluster_sample_size,
             random_state=random_state,
         )
 
-        with warnings.catch_warnings():
-            # Supress ConvergenceWarning warning. Log it below.
-            warnings.simplefilter("ignore", category=ConvergenceWarning)
-            cluster_model.fit(lines_to_cluster)
-
-        labels = cluster_model.labels_
-
+    for n_clusters, labels, centers in candidate_clusterings:
         if len(np.unique(labels)) < n_clusters:
             # Fewer than n_clusters clusters were found.
             # This could happen if the feature is not used by the model, causing
@@ -624,22 +1861,21 @@ def _calculate_ice(
 
             break
 
-        score = silhouette_score(distances, cluster_model.labels_, metric="precomputed")
+        with profile_phase("silhouette"):
+            score = scorer.score(labels, centers)
 
         if score > best_score:
             best_score = score
             best_n_clusters = n_clusters
 
-        clusterings[str(n_clusters)] = _get_clusters_info(
-            labels=labels,
-            n_clusters=n_clusters,
-            centered_ice_lines=centered_ice_lines,
-            centered_pdp=centered_pdp,
-            data=data,
-            one_hot_encoded_col_name_to_feature=md.one_hot_encoded_col_name_to_feature,
-            decision_tree_params=decision_tree_params,
-            random_state=random_state,
-        )
+        with profile_phase("explanation"):
+            clusterings[str(n_clusters)] = _get_clusters_info(
+                labels=labels,
+                n_clusters=n_clusters,
+                centered_ice_lines=centered_ice_lines,
+                centered_pdp=centered_pdp,
+                explainer=explainer,
+            )
 
     if best_n_clusters == 1:
         pairs = set()
@@ -659,27 +1895,57 @@ def _calculate_ice(
         "clusterings": clusterings,
         "adjusted_clusterings": {},
         "num_clusters": best_n_clusters,
+        "silhouette_method": scorer.method,
     }
 
     return ice, pairs
 
 
+def _get_lines_to_cluster(ice_lines, cluster_preprocessing):
+    if cluster_preprocessing == "diff":
+        return np.diff(ice_lines)
+    elif cluster_preprocessing == "center":
+        return ice_lines - ice_lines[:, 0].reshape(-1, 1)
+
+
+def _cluster_ice_lines_batched(
+    feature_to_ice_lines, num_clusters_extent, cluster_preprocessing, random_state
+):
+    # features whose lines have the same number of points are clustered together
+    length_to_features = defaultdict(list)
+
+    for feature, ice_lines in feature_to_ice_lines.items():
+        length_to_features[ice_lines.shape[1]].append(feature)
+
+    feature_to_clusterings = {}
+
+    for features in length_to_features.values():
+        lines = np.stack(
+            [
+                _get_lines_to_cluster(
+                    feature_to_ice_lines[feature], cluster_preprocessing
+                )
+                for feature in features
+            ]
+        )
+
+        clusterings = batched_kmeans(lines, num_clusters_extent, random_state)
+        feature_to_clusterings.update(zip(features, clusterings))
+
+    return feature_to_clusterings
+
+
 def _get_clusters_info(
     labels,
     n_clusters,
     centered_ice_lines,
     centered_pdp,
-    data,
-    one_hot_encoded_col_name_to_feature,
-    decision_tree_params,
-    random_state,
+    explainer,
 ):
     cluster_distance = np.float64(0)
 
     local_clusters = []
 
-    interacting_features = defaultdict(float)
-
     centered_mean_min = math.inf
     centered_mean_max = -math.inf
 
@@ -706,24 +1972,14 @@ def _get_clusters_info(
         centered_mean_min = min(centered_mean_min, centered_mean.min())
         centered_mean_max = max(centered_mean_max, centered_mean.max())
 
-        y = mask.astype(int)
+    interacting_features = explainer.interacting_features(labels, n_clusters)
 
-        importances = _get_interacting_features(
-            X=data,
-            y=y,
-            one_hot_encoded_col_name_to_feature=one_hot_encoded_col_name_to_feature,
-            decision_tree_params=decision_tree_params,
-            random_state=random_state,
+    sorted_interacting_features = [
+        f
+        for f, _ in sorted(
+            interacting_features.items(), key=itemgetter(1), reverse=True
         )
-        for feat, imp in importances.items():
-            interacting_features[feat] += imp
-
-        sorted_interacting_features = [
-            f
-            for f, _ in sorted(
-                interacting_features.items(), key=itemgetter(1), reverse=True
-            )
-        ]
+    ]
 
     return {
         "clusters": local_clusters,
@@ -735,28 +1991,6 @@ def _get_clusters_info(
     }
 
 
-def _get_interacting_features(
-    X,
-    y,
-    one_hot_encoded_col_name_to_feature,
-    decision_tree_params,
-    random_state,
-):
-    clf = DecisionTreeClassifier(
-        **decision_tree_params,
-        random_state=random_state,
-    )
-    clf.fit(X, y)
-
-    importances = {}
-
-    for i in np.nonzero(clf.feature_importances_)[0]:
-        feat = one_hot_encoded_col_name_to_feature.get(X.columns[i], X.columns[i])
-        importances[feat] = clf.feature_importances_[i]
-
-    return importances
-
-
 def _turn_one_hot_into_category(df_one_hot, md):
     df = df_one_hot.copy()
 
@@ -0,0 +1,122 @@
+"""
+Record where the time of a :func:`pdpilot.partial_dependence` run goes.
+
+Code that makes up a phase of the computation, such as calling ``predict`` or
+clustering ICE lines, is wrapped in :func:`profile_phase`. This does nothing
+unless a :class:`Profiler` is active in the current thread. Tasks that run in
+other threads or processes record their phases in a profiler of their own,
+which is sent back with their results and merged into the run's profiler.
+"""
+
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+# the phases of a run. they can be nested, such as predict within ice_lines,
+# so the time of a phase includes the time of the phases within it.
+PHASES = [
+    "metadata",
+    "ice_lines",
+    "predict",
+    "clustering",
+    "silhouette",
+    "explanation",
+    "two_way_grid",
+    "output",
+]
+
+_local = threading.local()
+
+
+class Profiler:
+    """Records the wall time, number of calls, and number of rows scored of
+    each phase.
+
+    :param hooks: A dictionary from a phase's name to a function that returns
+        a context manager, which is entered whenever the phase starts and
+        exited when it ends. For example, ``{"clustering": cProfile.Profile}``
+        profiles the clustering with cProfile. Defaults to None.
+    :type hooks: dict[str, Callable[[], ContextManager]] | None, optional
+    """
+
+    def __init__(self, hooks=None):
+        self.hooks = hooks if hooks is not None else {}
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name, rows=0):
+        """Record the time spent in the body of the ``with`` statement."""
+        with ExitStack() as stack:
+            if name in self.hooks:
+                stack.enter_context(self.hooks[name]())
+
+            start = time.perf_counter()
+
+            try:
+                yield
+            finally:
+                self.add(name, time.perf_counter() - start, 1, rows)
+
+    def add(self, name, seconds, calls, rows):
+        """Add to the totals of a phase."""
+        totals = self.phases.setdefault(name, {"seconds": 0.0, "calls": 0, "rows": 0})
+        totals["seconds"] += seconds
+        totals["calls"] += calls
+        totals["rows"] += rows
+
+    def merge(self, phases):
+        """Add the totals recorded by another profiler."""
+        for name, totals in phases.items():
+            self.add(name, totals["seconds"], totals["calls"], totals["rows"])
+
+
+@contextmanager
+def activate(profiler):
+    """Make ``profiler`` record the phases that run in this thread."""
+    previous = getattr(_local, "profiler", None)
+    _local.profiler = profiler
+
+    try:
+        yield profiler
+    finally:
+        _local.profiler = previous
+
+
+def get_active_profiler():
+    """Get the profiler that is active in this thread, or None."""
+    return getattr(_local, "profiler", None)
+
+
+@contextmanager
+def profile_phase(name, rows=0):
+    """Record a phase with the active profiler, if there is one.
+
+    :param name: One of :data:`PHASES`.
+    :type name: str
+    :param rows: The number of rows that the phase scored. Defaults to 0.
+    :type rows: int, optional
+    """
+    profiler = get_active_profiler()
+
+    if profiler is None:
+        yield
+        return
+
+    with profiler.phase(name, rows):
+        yield
+
+
+def profile_calls(fn, name):
+    """Wrap a function that is passed a dataset so that each call to it is
+    recorded as a phase with the number of rows in the dataset. If no
+    profiler is active, ``fn`` is returned unchanged."""
+    profiler = get_active_profiler()
+
+    if profiler is None:
+        return fn
+
+    def wrapper(data):
+        with profiler.phase(name, rows=data.shape[0]):
+            return fn(data)
+
+    return wrapper
@@ -0,0 +1,133 @@
+"""
+Report the progress of the tasks of a :func:`pdpilot.partial_dependence` run.
+
+The schedulers that run the tasks notify a :class:`ProgressTracker` when a task
+is added, when it is handed to a worker, and when it finishes. The tracker
+updates a tqdm progress bar and sends each event to a callback, so progress is
+reported the same way whether the tasks run in this thread, in a thread pool,
+in a process pool, or on another executor.
+
+Each event is a dictionary with these keys:
+
+- ``event``: "task_started" when a task is handed to a worker or, with one
+  job, when it starts, and "task_finished" when it is done.
+- ``task``: The type of the task. "one_way" and "two_way" compute a PDP,
+  "ice_lines" computes the ICE lines of a feature before they are clustered
+  with ``cluster_method="batched"``, and "ice_block" computes the ICE lines
+  of a feature for one block of rows with ``progressive_tolerance``.
+- ``features``: The features of the task.
+- ``estimated_cost``: The estimated cost of the task, in units of predictions
+  of one row.
+- ``num_finished`` and ``num_tasks``: The number of tasks that are done and
+  that have been added so far. Two-way PDPs are added once the one-way PDPs of
+  both of their features are done, so ``num_tasks`` can grow.
+- ``elapsed``: The number of seconds since the first task was added.
+- ``eta``: The estimated number of seconds until the tasks that have been
+  added so far are done, based on their estimated costs, or None before any
+  task has finished.
+
+"task_finished" events also have these keys:
+
+- ``seconds``: The number of seconds the task took.
+- ``rows_scored``: The number of rows that the task passed to ``predict``.
+- ``result``: For "one_way" and "two_way" tasks, the PDP, in the same form as
+  in the results of :func:`pdpilot.partial_dependence`. None for other tasks.
+"""
+
+import time
+
+from tqdm import tqdm
+
+
+class ProgressTracker:
+    """Tracks the tasks of a run.
+
+    :param callback: A function that is called with each event. Defaults to
+        None.
+    :type callback: Callable[[dict], None] | None, optional
+    :param show_bar: Whether to show a tqdm progress bar. Defaults to True.
+    :type show_bar: bool, optional
+    """
+
+    def __init__(self, callback=None, show_bar=True):
+        self.callback = callback
+        self.bar = tqdm(total=0, unit="task", ncols=80, disable=not show_bar)
+        self.num_tasks = 0
+        self.num_finished = 0
+        self.total_cost = 0
+        self.finished_cost = 0
+        self.start = None
+
+    def task_added(self, key, cost):
+        """Called when a task is added to a scheduler."""
+        if self.start is None:
+            self.start = time.perf_counter()
+
+        self.num_tasks += 1
+        self.total_cost += cost
+        self.bar.total = self.num_tasks
+        self.bar.refresh()
+
+    def task_started(self, key, cost):
+        """Called when a task is handed to a worker."""
+        self._emit("task_started", key, cost)
+
+    def task_finished(self, key, cost, timing, result):
+        """Called when a task is done.
+
+        :param timing: The seconds taken and, if the task was profiled, its
+            phases.
+        :type timing: dict
+        :param result: The value that the task returned.
+        """
+        self.num_finished += 1
+        self.finished_cost += cost
+        self.bar.update()
+
+        phases = timing.get("phases", {})
+        kind = key[0]
+
+        self._emit(
+            "task_finished",
+            key,
+            cost,
+            seconds=timing["seconds"],
+            rows_scored=phases.get("predict", {}).get("rows", 0),
+            # one-way tasks also return the pairs to consider and the ICE lines
+            result=(
+                result[0]
+                if kind == "one_way"
+                else result if kind == "two_way" else None
+            ),
+        )
+
+    def close(self):
+        """Close the progress bar."""
+        self.bar.close()
+
+    def _emit(self, event, key, cost, **kwargs):
+        if self.callback is None:
+            return
+
+        kind, features = key
+        elapsed = time.perf_counter() - self.start
+
+        if self.finished_cost > 0:
+            remaining_cost = self.total_cost - self.finished_cost
+            eta = elapsed * remaining_cost / self.finished_cost
+        else:
+            eta = None
+
+        self.callback(
+            {
+                "event": event,
+                "task": kind,
+                "features": list(features),
+                "estimated_cost": cost,
+                "num_finished": self.num_finished,
+                "num_tasks": self.num_tasks,
+                "elapsed": elapsed,
+                "eta": eta,
+                **kwargs,
+            }
+        )
@@ -0,0 +1,232 @@
+"""
+Compute the mean predictions of PDPs for scikit-learn tree models by
+traversing their trees, rather than by predicting on a perturbed copy of the
+dataset for every grid value.
+
+For each grid value, the traversal follows the branch of every split on one of
+the grid's features and both branches of every other split, weighting them by
+the fraction of the model's training instances that went down each branch.
+This means that the result is the partial dependence with respect to the
+training data, rather than to the dataset passed to
+:func:`pdpilot.partial_dependence`. The two are the same when that dataset is
+the training data.
+"""
+
+import inspect
+import warnings
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import (
+    GradientBoostingClassifier,
+    GradientBoostingRegressor,
+    HistGradientBoostingClassifier,
+    HistGradientBoostingRegressor,
+    RandomForestRegressor,
+)
+from sklearn.inspection import partial_dependence
+from sklearn.tree import DecisionTreeRegressor
+
+from pdpilot.grid import set_array_feature
+
+# the methods of a model whose output the traversal computes
+_RECURSION_METHODS = ["predict", "decision_function"]
+
+_GRADIENT_BOOSTING = (GradientBoostingRegressor, GradientBoostingClassifier)
+_HIST_GRADIENT_BOOSTING = (
+    HistGradientBoostingRegressor,
+    HistGradientBoostingClassifier,
+)
+
+# partial_dependence only traverses a grid of custom values since
+# scikit-learn 1.7. With older versions, the PDPs are computed by brute force.
+_HAS_CUSTOM_VALUES = "custom_values" in inspect.signature(partial_dependence).parameters
+
+# partial_dependence returns an array with one axis per column, and NumPy 1
+# supports at most 32 axes
+_MAX_TRAVERSED_COLUMNS = 31
+
+# the number of grid values above which the cells are traversed one at a time,
+# rather than as the product of the values of their columns
+_MAX_GRID_SIZE = 10_000
+
+
+def get_recursion_model(predict):
+    """Get the model that a prediction function belongs to, checking that its
+    PDPs can be computed by traversing its trees.
+
+    :param predict: The ``predict`` method of a fitted
+        ``GradientBoostingRegressor``, ``HistGradientBoostingRegressor``,
+        ``RandomForestRegressor``, or ``DecisionTreeRegressor``, or the
+        ``decision_function`` method of a fitted ``GradientBoostingClassifier``
+        or ``HistGradientBoostingClassifier`` for binary classification.
+    :type predict: Callable
+    :raises ValueError: If ``predict`` is not one of those methods.
+    :return: The model, or None if the installed scikit-learn cannot traverse
+        its trees, in which case the PDPs are computed by brute force.
+    :rtype: sklearn.base.BaseEstimator | None
+    """
+    model = getattr(predict, "__self__", None)
+    method = getattr(predict, "__name__", None)
+
+    supported = (
+        *_GRADIENT_BOOSTING,
+        *_HIST_GRADIENT_BOOSTING,
+        RandomForestRegressor,
+        DecisionTreeRegressor,
+    )
+
+    if not isinstance(model, supported) or method not in _RECURSION_METHODS:
+        raise ValueError(
+            "pdp_method 'recursion' requires predict to be the predict method of"
+            " a GradientBoostingRegressor, HistGradientBoostingRegressor,"
+            " RandomForestRegressor, or DecisionTreeRegressor, or the"
+            " decision_function method of a GradientBoostingClassifier or"
+            " HistGradientBoostingClassifier."
+        )
+
+    if isinstance(model, _GRADIENT_BOOSTING) and model.init is not None:
+        raise ValueError(
+            "pdp_method 'recursion' does not support gradient boosting models"
+            " with an init estimator."
+        )
+
+    if method == "predict" and hasattr(model, "classes_"):
+        raise ValueError(
+            "pdp_method 'recursion' requires the decision_function method of"
+            " classifiers, since it computes the mean raw score."
+        )
+
+    if hasattr(model, "classes_") and len(model.classes_) > 2:
+        raise ValueError(
+            "pdp_method 'recursion' does not support multiclass classifiers."
+        )
+
+    if not _HAS_CUSTOM_VALUES:
+        warnings.warn(
+            "pdp_method 'recursion' requires scikit-learn 1.7 or later. The PDPs"
+            " are computed by brute force instead.",
+            stacklevel=2,
+        )
+        return None
+
+    if (
+        isinstance(model, _HIST_GRADIENT_BOOSTING)
+        and model.n_features_in_ > _MAX_TRAVERSED_COLUMNS
+    ):
+        warnings.warn(
+            "pdp_method 'recursion' supports histogram-based gradient boosting"
+            f" models with at most {_MAX_TRAVERSED_COLUMNS} columns. The PDPs are"
+            " computed by brute force instead.",
+            stacklevel=2,
+        )
+        return None
+
+    return model
+
+
+def check_recursion_columns(model, columns):
+    """Check that a model was trained on a dataset with the given columns.
+
+    :raises ValueError: If the number or names of the columns do not match.
+    """
+    if model.n_features_in_ != len(columns):
+        raise ValueError(
+            f"The model was trained on {model.n_features_in_} columns, but the"
+            f" dataset has {len(columns)}."
+        )
+
+    names = getattr(model, "feature_names_in_", None)
+
+    if names is not None and list(names) != list(columns):
+        raise ValueError(
+            "The columns of the dataset do not match the columns that the model"
+            " was trained on."
+        )
+
+
+def recursion_grid_means(model, features, cells, column_indices):
+    """Get the model's mean prediction for every cell in a grid by traversing
+    its trees.
+
+    :param model: A model returned by :func:`get_recursion_model`.
+    :param features: The names of the features that make up the grid.
+    :param cells: List of tuples containing a value for each feature.
+    :param column_indices: The positions of each feature's columns in the
+        dataset that the model was trained on.
+    :return: Array with one mean prediction per cell.
+    :rtype: np.ndarray
+    """
+    target_columns = [i for f in features for i in column_indices[f]["indices"]]
+
+    # the cells are written into rows of the model's columns, so that one-hot
+    # encoded features are set the same way as when predicting
+    rows = np.zeros((len(cells), model.n_features_in_))
+
+    for j, cell in enumerate(cells):
+        for feature, value in zip(features, cell):
+            set_array_feature(value, rows[j : j + 1], column_indices[feature])
+
+    targets = rows[:, target_columns]
+    axes = [np.unique(targets[:, k]) for k in range(len(target_columns))]
+
+    if np.prod([len(axis) for axis in axes]) <= max(len(cells), _MAX_GRID_SIZE):
+        grid_means = _traverse(model, target_columns, axes)
+        means = grid_means[
+            tuple(np.searchsorted(axis, targets[:, k]) for k, axis in enumerate(axes))
+        ]
+    else:
+        # the columns of one-hot encoded features take far fewer combinations
+        # of values than the product of their values
+        means = np.array(
+            [_traverse(model, target_columns, row[:, None]).item() for row in targets]
+        )
+
+    if isinstance(model, (*_GRADIENT_BOOSTING, *_HIST_GRADIENT_BOOSTING)):
+        means = means + _get_baseline(model)
+
+    return means
+
+
+def _get_row(model):
+    row = np.zeros((1, model.n_features_in_))
+    names = getattr(model, "feature_names_in_", None)
+    return row if names is None else pd.DataFrame(row, columns=names)
+
+
+def _traverse(model, columns, axes):
+    # the mean raw prediction for the product of the values in axes, which has
+    # one axis per column
+    result = partial_dependence(
+        model,
+        _get_row(model),
+        features=columns,
+        custom_values=dict(zip(columns, axes)),
+        method="recursion",
+        kind="average",
+    )
+    return result["average"][0]
+
+
+def _get_baseline(model):
+    # the traversal leaves out the constant that boosting starts from, which is
+    # the difference between the model's output and the sum of its trees
+    row = _get_row(model)
+    output = (
+        model.decision_function(row)
+        if hasattr(model, "classes_")
+        else model.predict(row)
+    )
+
+    if model.n_features_in_ <= _MAX_TRAVERSED_COLUMNS:
+        # setting every column follows a single path through each tree
+        columns = list(range(model.n_features_in_))
+        trees = _traverse(model, columns, [[0.0]] * len(columns)).item()
+    else:
+        # the trees are fitted on arrays without column names
+        values = np.zeros((1, model.n_features_in_))
+        trees = model.learning_rate * sum(
+            tree.predict(values)[0] for tree in model.estimators_[:, 0]
+        )
+
+    return np.ravel(output)[0] - trees
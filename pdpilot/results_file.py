@@ -0,0 +1,190 @@
+"""
+Read and write the results of :func:`pdpilot.partial_dependence` in a compact
+binary format.
+
+The results are written to a directory. Large numeric lists, such as the ICE
+lines, the cluster labels, and the columns of the dataset, are stored as
+``.npy`` files in its ``arrays`` subdirectory, and everything else is stored in
+``manifest.json`` with references to those files. Floats are stored as 32-bit
+floats, except for the values of the grids and axes of the plots, which the
+widget looks up by exact match. When the results are read, the arrays are
+memory-mapped, so only the parts that are used are loaded from disk.
+"""
+
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from pdpilot.utils import convert_keys_to_ints
+
+FORMAT_VERSION = 1
+
+# numeric lists with fewer elements than this are kept in the manifest
+MIN_ARRAY_SIZE = 64
+
+_MANIFEST = "manifest.json"
+_ARRAYS = "arrays"
+_ARRAY_KEY = "__ndarray__"
+
+# the keys of grid values, which are kept as 64-bit floats so that the values
+# of two-way PDPs still equal the values of their axes
+GRID_KEYS = frozenset(["values", "x_values", "y_values", "x_axis", "y_axis"])
+
+
+def is_results_dir(path):
+    """Check if a path is a directory of results written by :func:`write_results`."""
+    return (Path(path) / _MANIFEST).is_file()
+
+
+def write_results(results, path):
+    """Write the results to a directory in the binary format.
+
+    :param results: The dictionary returned by :func:`pdpilot.partial_dependence`.
+    :type results: dict
+    :param path: The directory to write to. It is created if it does not exist.
+        If it contains results from a previous call, they are replaced.
+    :type path: str | Path
+    :raises OSError: Raised when ``path`` exists and is not an empty directory
+        or a directory of results.
+    """
+    path = Path(path).resolve()
+
+    if path.exists():
+        if is_results_dir(path):
+            shutil.rmtree(path / _ARRAYS, ignore_errors=True)
+        elif not path.is_dir() or any(path.iterdir()):
+            raise OSError(f"Cannot write results to {path}")
+
+    arrays_dir = path / _ARRAYS
+    arrays_dir.mkdir(parents=True, exist_ok=True)
+
+    arrays = []
+
+    def encode(value, key=None):
+        if isinstance(value, dict):
+            return {k: encode(val, k) for k, val in value.items()}
+
+        if isinstance(value, (list, tuple, np.ndarray)):
+            array = _to_numeric_array(value)
+
+            if array is None:
+                return [encode(val, key) for val in value]
+
+            if array.size >= MIN_ARRAY_SIZE:
+                name = f"{len(arrays)}.npy"
+                np.save(arrays_dir / name, _compact(array, key))
+                arrays.append(name)
+                return {_ARRAY_KEY: name}
+
+            return array.tolist()
+
+        if isinstance(value, np.generic):
+            return value.item()
+
+        return value
+
+    manifest = {"version": FORMAT_VERSION, "results": encode(results)}
+
+    # the manifest is written last, so an interrupted write is not mistaken
+    # for complete results
+    (path / _MANIFEST).write_text(json.dumps(manifest), encoding="utf-8")
+
+
+def read_results(path, mmap_mode="r"):
+    """Read results that were written by :func:`write_results`.
+
+    :param path: The directory of results.
+    :type path: str | Path
+    :param mmap_mode: How to memory-map the arrays, as in :func:`numpy.load`.
+        If None, the arrays are loaded into memory. Defaults to "r".
+    :type mmap_mode: str | None, optional
+    :raises OSError: Raised when ``path`` is not a directory of results.
+    :raises ValueError: Raised when the results were written in a newer format.
+    :return: The results, where large numeric lists are NumPy arrays.
+    :rtype: dict
+    """
+    path = Path(path).resolve()
+
+    if not is_results_dir(path):
+        raise OSError(f"Cannot read results from {path}")
+
+    manifest = json.loads((path / _MANIFEST).read_text(encoding="utf-8"))
+
+    if manifest["version"] > FORMAT_VERSION:
+        raise ValueError(
+            f"Results were written in format version {manifest['version']}, "
+            f"but only versions up to {FORMAT_VERSION} can be read."
+        )
+
+    arrays_dir = path / _ARRAYS
+
+    def decode(value):
+        if isinstance(value, dict):
+            if _ARRAY_KEY in value:
+                return np.load(arrays_dir / value[_ARRAY_KEY], mmap_mode=mmap_mode)
+            return {key: decode(val) for key, val in value.items()}
+
+        if isinstance(value, list):
+            return [decode(val) for val in value]
+
+        return value
+
+    results = decode(manifest["results"])
+
+    # In JSON, object keys are all strings. Here, we convert
+    # ints back to ints.
+    for info in results["feature_info"].values():
+        if "value_map" in info:
+            info["value_map"] = convert_keys_to_ints(info["value_map"])
+
+    return results
+
+
+def arrays_to_lists(value):
+    """Recursively convert the NumPy arrays in the results into lists."""
+    if isinstance(value, dict):
+        return {key: arrays_to_lists(val) for key, val in value.items()}
+
+    if isinstance(value, list):
+        return [arrays_to_lists(val) for val in value]
+
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+
+    return value
+
+
+def _to_numeric_array(value):
+    # get a list of numbers or a rectangular list of lists of numbers as an
+    # array, or None if it is anything else
+    if isinstance(value, np.ndarray):
+        array = value
+    else:
+        if not value or isinstance(value[0], (dict, str)):
+            return None
+
+        try:
+            array = np.asarray(value)
+        except ValueError:
+            # ragged
+            return None
+
+    if array.ndim == 0 or array.dtype.kind not in "biuf":
+        return None
+
+    return array
+
+
+def _compact(array, key=None):
+    # key is the key of the array in the results
+    if array.dtype.kind == "f":
+        return array if key in GRID_KEYS else array.astype(np.float32)
+
+    if array.dtype.kind in "iu" and array.size > 0:
+        info = np.iinfo(np.int32)
+        if info.min <= array.min() and array.max() <= info.max:
+            return array.astype(np.int32)
+
+    return array
@@ -0,0 +1,192 @@
+"""
+Schedule the one-way and two-way PDP tasks by their estimated cost.
+"""
+
+import heapq
+import itertools
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from joblib import cpu_count
+from threadpoolctl import threadpool_limits
+
+from pdpilot.profiling import Profiler, activate
+
+# rough cost of clustering one point of an ICE line for one number of
+# clusters, relative to the cost of predicting one row
+_CLUSTER_COST = 0.05
+
+
+def estimate_one_way_cost(num_values, num_rows, num_clusters_extent, predict=True):
+    """Estimate the cost of a one-way PDP.
+
+    :param num_values: The number of values in the feature's grid.
+    :type num_values: int
+    :param num_rows: The number of rows in the dataset.
+    :type num_rows: int
+    :param num_clusters_extent: The minimum and maximum number of clusters.
+    :type num_clusters_extent: tuple[int, int]
+    :param predict: Whether the ICE lines need to be predicted, rather than
+        having been computed already. Defaults to True.
+    :type predict: bool, optional
+    :return: The estimated cost, in units of predictions of one row.
+    :rtype: float
+    """
+    num_points = num_values * num_rows
+    num_clusterings = sum(range(num_clusters_extent[0], num_clusters_extent[1] + 1))
+    return num_points * (predict + _CLUSTER_COST * num_clusterings)
+
+
+def estimate_two_way_cost(num_x_values, num_y_values, num_rows):
+    """Estimate the cost of a two-way PDP, in units of predictions of one row."""
+    return num_x_values * num_y_values * num_rows
+
+
+class TaskScheduler:
+    """Runs tasks on an executor, starting the most expensive tasks first.
+
+    Tasks are only handed to the executor when one of its workers is free, so
+    tasks that are added while the results of earlier tasks are being consumed
+    are still started in order of cost.
+
+    :param executor: A ``concurrent.futures`` executor to run the tasks on.
+        If None, the tasks are run one at a time in the calling thread.
+    :type executor: concurrent.futures.Executor | None
+    :param max_workers: The number of tasks to run at once. Defaults to 1.
+    :type max_workers: int, optional
+    :param profiler: If given, each task records its phases with a profiler
+        that has the same hooks. They are added to the task's timings and
+        merged into this profiler. Defaults to None.
+    :type profiler: pdpilot.profiling.Profiler | None, optional
+    :param progress: If given, it is told when each task is added, started,
+        and finished. The keys of the tasks must then be tuples of the type
+        of the task and its features. Defaults to None.
+    :type progress: pdpilot.progress.ProgressTracker | None, optional
+    """
+
+    def __init__(self, executor=None, max_workers=1, profiler=None, progress=None):
+        self.executor = executor
+        self.max_workers = max_workers if executor is not None else 1
+        self.profiler = profiler
+        self.progress = progress
+        # the key, estimated cost, and seconds taken of each finished task
+        self.timings = []
+        self._pending = []
+        self._order = itertools.count()
+
+    def submit(self, key, cost, fn, kwargs):
+        """Add a task.
+
+        :param key: Identifies the task in the results and timings.
+        :type key: Hashable
+        :param cost: The estimated cost of the task.
+        :type cost: float
+        :param fn: The function to run.
+        :type fn: Callable
+        :param kwargs: The keyword arguments to call ``fn`` with.
+        :type kwargs: dict
+        """
+        # ties are broken by the order the tasks were added in
+        heapq.heappush(self._pending, (-cost, next(self._order), key, fn, kwargs))
+
+        if self.progress is not None:
+            self.progress.task_added(key, cost)
+
+    def as_completed(self):
+        """Run the tasks.
+
+        :return: Yields the key and result of each task as it finishes.
+        :rtype: Iterator[tuple[Hashable, Any]]
+        """
+        running = {}
+
+        try:
+            while self._pending or running:
+                while self._pending and len(running) < self.max_workers:
+                    neg_cost, _, key, fn, kwargs = heapq.heappop(self._pending)
+
+                    run_args = self._get_run_args(fn, kwargs)
+
+                    if self.progress is not None:
+                        self.progress.task_started(key, -neg_cost)
+
+                    if self.executor is None:
+                        result, timing = _run_timed(*run_args)
+                        self._record(key, -neg_cost, timing, result)
+                        yield key, result
+                    else:
+                        future = self.executor.submit(_run_timed, *run_args)
+                        running[future] = (key, -neg_cost)
+
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    key, cost = running.pop(future)
+                    result, timing = future.result()
+                    self._record(key, cost, timing, result)
+                    yield key, result
+        finally:
+            for future in running:
+                future.cancel()
+
+    def _get_run_args(self, fn, kwargs):
+        if self.profiler is None:
+            return fn, kwargs
+
+        return fn, kwargs, self.profiler.hooks
+
+    def _record(self, key, cost, timing, result):
+        self.timings.append({"key": key, "cost": cost, **timing})
+
+        if self.profiler is not None:
+            self.profiler.merge(timing["phases"])
+
+        if self.progress is not None:
+            self.progress.task_finished(key, cost, timing, result)
+
+
+class LimitedThreadPoolExecutor(ThreadPoolExecutor):
+    """A thread pool for models that release the GIL. The native thread pools
+    that models use internally are limited so that the pool's threads share
+    the CPUs rather than each trying to use all of them.
+
+    OpenMP, which is used by models such as LightGBM and XGBoost, is limited
+    in each of the pool's threads. BLAS libraries can only be limited for the
+    whole process, so they are limited until the pool is shut down.
+
+    :param max_workers: The number of threads.
+    :type max_workers: int
+    """
+
+    def __init__(self, max_workers):
+        inner_threads = max(1, cpu_count() // max_workers)
+        self._blas_limits = threadpool_limits(limits=inner_threads, user_api="blas")
+
+        super().__init__(
+            max_workers=max_workers,
+            thread_name_prefix="pdpilot",
+            initializer=threadpool_limits,
+            initargs=(inner_threads, "openmp"),
+        )
+
+    def shutdown(self, *args, **kwargs):
+        super().shutdown(*args, **kwargs)
+        self._blas_limits.restore_original_limits()
+
+
+def _run_timed(fn, kwargs, profile_hooks=None):
+    # profile_hooks is only given when the task is profiled
+    if profile_hooks is None:
+        start = time.perf_counter()
+        result = fn(**kwargs)
+        return result, {"seconds": time.perf_counter() - start}
+
+    with activate(Profiler(hooks=profile_hooks)) as profiler:
+        start = time.perf_counter()
+        result = fn(**kwargs)
+        seconds = time.perf_counter() - start
+
+    return result, {"seconds": seconds, "phases": profiler.phases}
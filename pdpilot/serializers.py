@@ -0,0 +1,97 @@
+"""
+Serializers that send the widget's numeric data to the frontend as binary
+buffers rather than as JSON.
+
+Large numeric lists are replaced by a header containing their ``dtype`` and
+``shape`` and a ``buffer`` with their values. ipywidgets sends the buffers as
+binary parts of the message, and ``deserializeArrays`` in ``src/serializers.ts``
+turns them back into arrays.
+"""
+
+import numpy as np
+
+from pdpilot.results_file import MIN_ARRAY_SIZE, _compact, _to_numeric_array
+
+_ARRAY_KEY = "__ndarray__"
+
+# dtypes that have a typed array in JavaScript, keyed by numpy dtype
+_DTYPES = {
+    np.dtype(np.float32): "float32",
+    np.dtype(np.float64): "float64",
+    np.dtype(np.int32): "int32",
+    np.dtype(np.bool_): "bool",
+}
+
+
+def encode_array(array, key=None):
+    """Get the header and the buffer for a numeric array.
+
+    :param array: A numeric array.
+    :type array: np.ndarray
+    :param key: The key of the array in the results. Floats are sent as 32-bit
+        floats, unless this is one of the keys of grid values. Defaults to None.
+    :type key: str | None, optional
+    :return: A dictionary with the array's dtype and shape, and the buffer.
+    :rtype: tuple[dict, memoryview]
+    """
+    array = _compact(np.asarray(array), key)
+
+    if array.dtype not in _DTYPES:
+        # 64-bit integers that do not fit in 32 bits
+        array = array.astype(np.float64)
+
+    array = np.ascontiguousarray(array)
+    header = {_ARRAY_KEY: _DTYPES[array.dtype], "shape": list(array.shape)}
+
+    return header, memoryview(array.view(np.uint8).reshape(-1))
+
+
+def decode_array(header, buffer):
+    """Get an array from the header and buffer made by :func:`encode_array`."""
+    dtype = {name: dtype for dtype, name in _DTYPES.items()}[header[_ARRAY_KEY]]
+    return np.frombuffer(buffer, dtype=dtype).reshape(header["shape"])
+
+
+def arrays_to_json(value, widget):
+    """Replace the large numeric lists and arrays in a traitlet's value with
+    binary buffers."""
+    return _arrays_to_json(value, None)
+
+
+def _arrays_to_json(value, key):
+    if isinstance(value, dict):
+        return {k: _arrays_to_json(val, k) for k, val in value.items()}
+
+    if isinstance(value, (list, tuple, np.ndarray)):
+        array = _to_numeric_array(value)
+
+        if array is None:
+            return [_arrays_to_json(val, key) for val in value]
+
+        if array.size >= MIN_ARRAY_SIZE:
+            header, buffer = encode_array(array, key)
+            return {**header, "buffer": buffer}
+
+        return array.tolist()
+
+    if isinstance(value, np.generic):
+        return value.item()
+
+    return value
+
+
+def arrays_from_json(value, widget):
+    """Replace the binary buffers in a value from the frontend with lists.
+    Values that the frontend changes are sent back as plain JSON."""
+    if isinstance(value, dict):
+        if _ARRAY_KEY in value:
+            return decode_array(value, value["buffer"]).tolist()
+        return {key: arrays_from_json(val, widget) for key, val in value.items()}
+
+    if isinstance(value, list):
+        return [arrays_from_json(val, widget) for val in value]
+
+    return value
+
+
+array_serialization = {"to_json": arrays_to_json, "from_json": arrays_from_json}
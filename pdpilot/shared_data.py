@@ -0,0 +1,153 @@
+"""
+Share the dataset with parallel workers through a memory-mapped file, or with
+threads through per-thread copies.
+"""
+
+import shutil
+import tempfile
+import threading
+import uuid
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+# datasets that have already been loaded by this process, keyed by dataset id,
+# with the most recently used last
+_attached = OrderedDict()
+
+# a run shares at most two datasets, the full dataset and the rows sampled by
+# progressive estimation, so workers keep both loaded. older ones are from
+# earlier runs on the same reusable workers.
+_MAX_ATTACHED = 2
+
+
+class SharedDataset:
+    """Writes the dataset and metadata to a file once, so that only the path
+    to that file needs to be sent to each parallel task. Workers memory-map
+    the file read-only and load it at most once per process.
+
+    :param data: The dataset that features are perturbed in. Either a
+        DataFrame or a 2-D array.
+    :param data_copy: An unmodified DataFrame of the dataset.
+    :param md: The metadata for the dataset.
+    :param directory: The directory to create the file's temporary directory in.
+        If None, the system's temporary directory is used.
+    """
+
+    def __init__(self, data, data_copy, md, directory=None):
+        self.dataset_id = uuid.uuid4().hex
+        self.directory = Path(tempfile.mkdtemp(prefix="pdpilot_", dir=directory))
+        self.path = str(self.directory / f"{self.dataset_id}.joblib")
+
+        # with an array, only the array is stored, since the unmodified
+        # DataFrame is only needed to explain the clusters and can be a view of
+        # it. with a DataFrame, the worker's copy is made from data_copy.
+        if isinstance(data, np.ndarray):
+            payload = {
+                "data": data,
+                "columns": list(data_copy.columns),
+                "data_copy": None,
+                "md": md,
+            }
+        else:
+            payload = {"data": None, "data_copy": data_copy, "md": md}
+
+        joblib.dump(payload, self.path)
+
+        # delete the file even if the computation fails before close is called
+        self._finalizer = weakref.finalize(
+            self, shutil.rmtree, self.directory, ignore_errors=True
+        )
+
+    def attach(self):
+        """Load the dataset in a worker.
+
+        :return: The dataset to perturb, an unmodified copy of it, and the metadata.
+            Arrays stay memory-mapped and read-only, so the grid engine perturbs
+            copies of their rows in its own buffer rather than writing to them.
+        :rtype: tuple
+        """
+        if self.dataset_id not in _attached:
+            payload = joblib.load(self.path, mmap_mode="r")
+
+            if payload["data"] is not None:
+                data = payload["data"]
+                data_copy = pd.DataFrame(data, columns=payload["columns"], copy=False)
+            else:
+                # DataFrames are perturbed by assigning columns, which can write
+                # into the existing memory on older versions of pandas, so each
+                # process gets one private copy
+                data_copy = payload["data_copy"]
+                data = data_copy.copy()
+
+            _attached[self.dataset_id] = (data, data_copy, payload["md"])
+
+            while len(_attached) > _MAX_ATTACHED:
+                _attached.popitem(last=False)
+
+        _attached.move_to_end(self.dataset_id)
+
+        return _attached[self.dataset_id]
+
+    def close(self):
+        """Delete the file. Workers that still have it mapped keep their view."""
+        _attached.pop(self.dataset_id, None)
+        self._finalizer()
+
+    def __getstate__(self):
+        # only the location is sent to workers. they never delete the file.
+        return {
+            "dataset_id": self.dataset_id,
+            "directory": self.directory,
+            "path": self.path,
+        }
+
+    def __setstate__(self, state):
+        self.dataset_id = state["dataset_id"]
+        self.directory = state["directory"]
+        self.path = state["path"]
+        self._finalizer = lambda: None
+
+
+class ThreadLocalDataset:
+    """Shares the dataset with tasks that run on threads of this process.
+    Features are perturbed by writing into the dataset, so each thread gets
+    its own copy to perturb, which is made the first time it runs a task.
+    The unmodified copy of the dataset is shared by all threads.
+
+    It has the same interface as :class:`SharedDataset`.
+
+    :param data: The dataset that features are perturbed in. Either a
+        DataFrame or a 2-D array.
+    :param data_copy: An unmodified DataFrame of the dataset.
+    :param md: The metadata for the dataset.
+    """
+
+    def __init__(self, data, data_copy, md):
+        self.data = data
+        self.data_copy = data_copy
+        self.md = md
+        self._local = threading.local()
+
+    def attach(self):
+        """Get this thread's copy of the dataset.
+
+        :return: The dataset to perturb, an unmodified copy of it, and the metadata.
+        :rtype: tuple
+        """
+        if not hasattr(self._local, "data"):
+            if isinstance(self.data, np.ndarray):
+                self._local.data = self.data.copy()
+            else:
+                self._local.data = self.data_copy.copy()
+
+        return self._local.data, self.data_copy, self.md
+
+    def close(self):
+        """Release the reference to the dataset. Threads keep their copies
+        until they exit."""
+        self.data = None
@@ -0,0 +1,494 @@
+"""
+Compute partial dependence plots for datasets that do not fit in memory
+"""
+
+import logging
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from numpy.random import MT19937, RandomState, SeedSequence
+from tqdm import tqdm
+
+from pdpilot.grid import mean_grid_predictions, predict_grid
+from pdpilot.metadata import Metadata
+from pdpilot.pdp import (
+    _calc_one_way_pd,
+    _calc_two_way_pd,
+    _check_params,
+    _cluster_ice_lines_batched,
+    _get_feature_to_pd,
+    _get_results,
+    _orient_pair,
+    _set_up_logging,
+)
+
+logger = logging.getLogger("pdpilot")
+
+
+def partial_dependence_streaming(
+    *,
+    predict: Callable[[Union[pd.DataFrame, np.ndarray]], List[float]],
+    source: Union[str, Path, Callable[[], Iterable[pd.DataFrame]]],
+    features: List[str],
+    output_dir: Union[str, Path],
+    resolution: int = 20,
+    one_hot_features: Union[Dict[str, List[Tuple[str, str]]], None] = None,
+    nominal_features: Union[List[str], None] = None,
+    ordinal_features: Union[List[str], None] = None,
+    feature_value_mappings: Union[Dict[str, Dict[str, str]], None] = None,
+    num_clusters_extent: Tuple[int, int] = (2, 5),
+    decision_tree_params: Union[Dict[str, Any], None] = None,
+    mixed_shape_tolerance: float = 0.29,
+    compute_two_way_pdps: bool = True,
+    cluster_preprocessing: str = "diff",
+    cluster_method: str = "kmeans",
+    cluster_sample_size: int = 10_000,
+    silhouette_method: str = "auto",
+    silhouette_sample_size: int = 5000,
+    explanation_method: str = "one_vs_rest",
+    explanation_sample_size: Union[int, None] = None,
+    explanation_max_bins: Union[int, None] = None,
+    batch_size: Union[int, None] = None,
+    predict_input: str = "dataframe",
+    chunk_size: int = 100_000,
+    sample_size: int = 10_000,
+    seed: Union[int, None] = None,
+    logging_level: str = "INFO",
+) -> dict:
+    """Calculates the data needed for the widget without loading the whole
+    dataset into memory. The dataset is read in chunks. The ICE lines for every
+    instance are written to a memory-mapped ``.npy`` file per feature, and the
+    PDPs and the extents of the ICE lines are computed incrementally over all
+    instances. The ICE lines are clustered and explained using a uniform random
+    sample of the instances, which is also the dataset shown in the widget.
+
+    The dataset is read three times: once to sample it and compute the feature
+    metadata, once to compute the ICE lines, and once to compute the two-way PDPs.
+    The parameters that are shared with :func:`pdpilot.partial_dependence` have
+    the same meaning.
+
+    :param predict: A function whose input is a DataFrame of instances and
+        returns the model's predictions on those instances.
+    :type predict: Callable[[pd.DataFrame | np.ndarray], list[float]]
+    :param source: The dataset. Either the path to a Parquet or CSV file, or a
+        function that returns a new iterator over DataFrame chunks each time it
+        is called. Reading Parquet files requires pyarrow.
+    :type source: str | Path | Callable[[], Iterable[pd.DataFrame]]
+    :param features: List of feature names in the dataset.
+    :type features: list[str]
+    :param output_dir: The directory to write the ICE lines and the sample to.
+        It is created if it does not exist.
+    :type output_dir: str | Path
+    :param chunk_size: The number of rows to read at a time from a file.
+        Defaults to 100,000.
+    :type chunk_size: int, optional
+    :param sample_size: The number of instances to sample for computing the
+        feature metadata, clustering the ICE lines, and showing in the widget.
+        Defaults to 10,000.
+    :type sample_size: int, optional
+    :raises ValueError: Raised when the type of ``source`` is not supported or
+        when it does not contain any rows.
+    :raises ImportError: Raised when ``source`` is a Parquet file and pyarrow
+        is not installed.
+    :return: Widget data for the sample of instances. It also includes
+        ``num_rows``, the total number of instances, ``row_indices``, the
+        positions of the sampled instances in the dataset, ``ice_paths``,
+        which maps from each feature to the file containing the ICE lines for
+        all of the instances, and ``sample_path``, a pickled DataFrame of the
+        sampled instances that can be passed to :class:`pdpilot.PDPilotWidget`.
+    :rtype: dict
+    """
+
+    log_level = _set_up_logging(logging_level)
+
+    _check_params(
+        cluster_preprocessing=cluster_preprocessing,
+        cluster_method=cluster_method,
+        silhouette_method=silhouette_method,
+        explanation_method=explanation_method,
+        predict_input=predict_input,
+        batch_size=batch_size,
+    )
+
+    output_dir = Path(output_dir).resolve()
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    if decision_tree_params is None:
+        decision_tree_params = {"max_depth": 3, "ccp_alpha": 0.01}
+
+    disable_tqdm = log_level > logging.INFO
+
+    seed_sequence = SeedSequence(seed)
+    sample_seed, *seeds = seed_sequence.spawn(len(features) + 1)
+
+    # first pass: sample the dataset and calculate the feature metadata
+
+    logger.info("Sampling the dataset.")
+
+    num_rows, row_indices, sample_df, extremes_df = _sample_chunks(
+        _iter_chunks(source, chunk_size),
+        sample_size,
+        RandomState(MT19937(sample_seed)),
+    )
+
+    # the rows containing the minimum and maximum value of each feature are
+    # included so that the grids span the entire range of the dataset
+    md = Metadata(
+        pd.concat([sample_df, extremes_df], ignore_index=True),
+        resolution,
+        features,
+        one_hot_features,
+        nominal_features,
+        ordinal_features,
+        feature_value_mappings,
+    )
+
+    # second pass: calculate the ICE lines
+
+    logger.info(
+        "Calculating ICE lines for %d features and %d instances.",
+        len(md.features_to_plot),
+        num_rows,
+    )
+
+    ice_paths = {
+        feature: output_dir / f"ice_{i}.npy"
+        for i, feature in enumerate(md.features_to_plot)
+    }
+
+    feature_to_ice = {
+        feature: np.lib.format.open_memmap(
+            ice_paths[feature],
+            mode="w+",
+            dtype=np.float64,
+            shape=(num_rows, len(md.feature_info[feature]["values"])),
+        )
+        for feature in md.features_to_plot
+    }
+
+    feature_to_summary = {feature: _IceSummary() for feature in md.features_to_plot}
+
+    start = 0
+
+    for chunk in tqdm(
+        _iter_chunks(source, chunk_size), unit="chunk", ncols=80, disable=disable_tqdm
+    ):
+        data, data_copy = _get_chunk_data(chunk, predict_input)
+        end = start + chunk.shape[0]
+
+        for feature in md.features_to_plot:
+            ice_lines = predict_grid(
+                predict=predict,
+                data=data,
+                data_copy=data_copy,
+                features=[feature],
+                cells=[(value,) for value in md.feature_info[feature]["values"]],
+                feature_info=md.feature_info,
+                batch_size=batch_size,
+                column_indices=md.column_indices,
+            ).T
+
+            feature_to_ice[feature][start:end] = ice_lines
+            feature_to_summary[feature].update(ice_lines)
+
+        start = end
+
+    # cluster and explain the ICE lines of the sampled instances
+
+    logger.info("Clustering ICE lines for %d sampled instances.", len(row_indices))
+
+    feature_to_sample_ice_lines = {}
+
+    for feature in md.features_to_plot:
+        ice = feature_to_ice[feature]
+        ice.flush()
+        feature_to_sample_ice_lines[feature] = np.asarray(ice[row_indices])
+
+    if cluster_method == "batched":
+        feature_to_clusterings = _cluster_ice_lines_batched(
+            feature_to_ice_lines=feature_to_sample_ice_lines,
+            num_clusters_extent=num_clusters_extent,
+            cluster_preprocessing=cluster_preprocessing,
+            random_state=RandomState(MT19937(seed_sequence.spawn(1)[0])),
+        )
+    else:
+        feature_to_clusterings = {}
+
+    one_way_results = []
+
+    for i, feature in enumerate(
+        tqdm(md.features_to_plot, ncols=80, disable=disable_tqdm)
+    ):
+        one_way_results.append(
+            _calc_one_way_pd(
+                predict=predict,
+                data=None,
+                data_copy=sample_df,
+                feature=feature,
+                md=md,
+                num_clusters_extent=num_clusters_extent,
+                mixed_shape_tolerance=mixed_shape_tolerance,
+                cluster_preprocessing=cluster_preprocessing,
+                decision_tree_params=decision_tree_params,
+                seed_sequence=seeds[i],
+                cluster_method=cluster_method,
+                cluster_sample_size=cluster_sample_size,
+                silhouette_method=silhouette_method,
+                silhouette_sample_size=silhouette_sample_size,
+                explanation_method=explanation_method,
+                explanation_sample_size=explanation_sample_size,
+                explanation_max_bins=explanation_max_bins,
+                ice_lines=feature_to_sample_ice_lines[feature],
+                ice_summary=feature_to_summary[feature].get(),
+                candidate_clusterings=feature_to_clusterings.get(feature),
+            )
+        )
+
+    one_way_pds = sorted(
+        [x[0] for x in one_way_results], key=lambda p: p["deviation"], reverse=True
+    )
+    feature_pairs = sorted({pair for x in one_way_results for pair in x[1]})
+    feature_to_ice_lines = {
+        owp["x_feature"]: lines for owp, _, lines in one_way_results
+    }
+
+    feature_to_pd = _get_feature_to_pd(one_way_pds) if one_way_pds else None
+
+    # third pass: calculate the two-way PDPs
+
+    two_way_pds = []
+
+    if compute_two_way_pdps and feature_pairs:
+        logger.info("Calculating %d two-way PDPs.", len(feature_pairs))
+
+        pairs = [_orient_pair(pair, md.feature_info) for pair in feature_pairs]
+        pair_to_cells = {
+            pair: [
+                (x_value, y_value)
+                for x_value in md.feature_info[pair[0]]["values"]
+                for y_value in md.feature_info[pair[1]]["values"]
+            ]
+            for pair in pairs
+        }
+        pair_to_sums = {
+            pair: np.zeros(len(cells)) for pair, cells in pair_to_cells.items()
+        }
+
+        for chunk in tqdm(
+            _iter_chunks(source, chunk_size),
+            unit="chunk",
+            ncols=80,
+            disable=disable_tqdm,
+        ):
+            data, data_copy = _get_chunk_data(chunk, predict_input)
+
+            for pair, cells in pair_to_cells.items():
+                pair_to_sums[pair] += chunk.shape[0] * mean_grid_predictions(
+                    predict=predict,
+                    data=data,
+                    data_copy=data_copy,
+                    features=list(pair),
+                    cells=cells,
+                    feature_info=md.feature_info,
+                    batch_size=batch_size,
+                    column_indices=md.column_indices,
+                )
+
+        two_way_pds = [
+            _calc_two_way_pd(
+                predict=predict,
+                data=None,
+                data_copy=None,
+                pair=pair,
+                feature_info=md.feature_info,
+                feature_to_pd=feature_to_pd,
+                mean_predictions=sums / num_rows,
+            )
+            for pair, sums in pair_to_sums.items()
+        ]
+
+    sample_path = output_dir / "sample.pkl"
+    sample_df.to_pickle(sample_path)
+
+    results = _get_results(
+        one_way_pds=one_way_pds,
+        feature_to_ice_lines=feature_to_ice_lines,
+        two_way_pds=two_way_pds,
+        md=md,
+        df=sample_df,
+        params={
+            "resolution": resolution,
+            "num_clusters_extent": num_clusters_extent,
+            "decision_tree_params": decision_tree_params,
+            "mixed_shape_tolerance": mixed_shape_tolerance,
+            "compute_two_way_pdps": compute_two_way_pdps,
+            "cluster_preprocessing": cluster_preprocessing,
+            "cluster_method": cluster_method,
+            "cluster_sample_size": cluster_sample_size,
+            "silhouette_method": silhouette_method,
+            "silhouette_sample_size": silhouette_sample_size,
+            "explanation_method": explanation_method,
+            "explanation_sample_size": explanation_sample_size,
+            "explanation_max_bins": explanation_max_bins,
+            "batch_size": batch_size,
+            "predict_input": predict_input,
+            "chunk_size": chunk_size,
+            "sample_size": sample_size,
+        },
+    )
+
+    results["num_rows"] = num_rows
+    results["row_indices"] = row_indices.tolist()
+    results["ice_paths"] = {feature: str(path) for feature, path in ice_paths.items()}
+    results["sample_path"] = str(sample_path)
+
+    return results
+
+
+class _IceSummary:
+    """Incrementally computes the statistics of the ICE lines that
+    are returned by ``pdpilot.pdp._summarize_ice_lines``."""
+
+    def __init__(self):
+        self.num_rows = 0
+        self.sums = 0
+        self.deviation_sum = 0
+        self.ice_min = np.inf
+        self.ice_max = -np.inf
+        self.centered_ice_min = np.inf
+        self.centered_ice_max = -np.inf
+
+    def update(self, ice_lines):
+        centered_ice_lines = ice_lines - ice_lines[:, 0].reshape(-1, 1)
+
+        self.num_rows += ice_lines.shape[0]
+        self.sums = self.sums + ice_lines.sum(axis=0)
+        self.deviation_sum += np.std(ice_lines, axis=1).sum()
+        self.ice_min = min(self.ice_min, ice_lines.min().item())
+        self.ice_max = max(self.ice_max, ice_lines.max().item())
+        self.centered_ice_min = min(
+            self.centered_ice_min, centered_ice_lines.min().item()
+        )
+        self.centered_ice_max = max(
+            self.centered_ice_max, centered_ice_lines.max().item()
+        )
+
+    def get(self):
+        return {
+            "mean_predictions": self.sums / self.num_rows,
+            "deviation": (self.deviation_sum / self.num_rows).item(),
+            "ice_min": self.ice_min,
+            "ice_max": self.ice_max,
+            "centered_ice_min": self.centered_ice_min,
+            "centered_ice_max": self.centered_ice_max,
+        }
+
+
+def _iter_chunks(source, chunk_size):
+    if callable(source):
+        yield from source()
+        return
+
+    path = Path(source)
+    suffix = path.suffix.lower()
+
+    if suffix in (".parquet", ".pq"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Reading Parquet files requires pyarrow.") from e
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    elif suffix == ".csv":
+        yield from pd.read_csv(path, chunksize=chunk_size)
+    else:
+        raise ValueError(f"Unsupported source {source}.")
+
+
+def _sample_chunks(chunks, sample_size, random_state):
+    # Reservoir sampling (Algorithm R) of the rows, vectorized over each chunk.
+    # This also keeps the rows that contain the minimum and maximum of each
+    # numeric column.
+    num_rows = 0
+    columns = None
+    reservoir = None
+    reservoir_indices = np.zeros(0, dtype=np.int64)
+    extremes = {}
+
+    for chunk in chunks:
+        if chunk.shape[0] == 0:
+            continue
+
+        chunk = chunk.reset_index(drop=True)
+
+        if columns is None:
+            columns = list(chunk.columns)
+            reservoir = {col: chunk[col].to_numpy()[:0] for col in columns}
+
+        # fill the reservoir
+        num_fill = max(0, min(sample_size - len(reservoir_indices), chunk.shape[0]))
+
+        if num_fill > 0:
+            reservoir = {
+                col: np.concatenate([reservoir[col], chunk[col].to_numpy()[:num_fill]])
+                for col in columns
+            }
+            reservoir_indices = np.concatenate(
+                [reservoir_indices, num_rows + np.arange(num_fill)]
+            )
+
+        # row i of the dataset replaces a random slot with probability
+        # sample_size / (i + 1). when several rows in the chunk pick the same
+        # slot, the last one wins, as it would if they were added one at a time.
+        positions = np.arange(num_fill, chunk.shape[0])
+        slots = random_state.randint(0, num_rows + positions + 1)
+        keep = slots < sample_size
+
+        if keep.any():
+            for col in columns:
+                values = reservoir[col].copy()
+                values[slots[keep]] = chunk[col].to_numpy()[positions[keep]]
+                reservoir[col] = values
+            reservoir_indices[slots[keep]] = num_rows + positions[keep]
+
+        for col in chunk.select_dtypes(["number"]).columns:
+            rows = [
+                chunk.iloc[[chunk[col].idxmin()]],
+                chunk.iloc[[chunk[col].idxmax()]],
+            ]
+            if col in extremes:
+                rows += extremes[col]
+            extremes[col] = [
+                min(rows, key=lambda row: row[col].item()),
+                max(rows, key=lambda row: row[col].item()),
+            ]
+
+        num_rows += chunk.shape[0]
+
+    if num_rows == 0:
+        raise ValueError("The source does not contain any rows.")
+
+    extreme_rows = [row for rows in extremes.values() for row in rows]
+    extremes_df = (
+        pd.concat(extreme_rows, ignore_index=True)
+        if extreme_rows
+        else pd.DataFrame(columns=columns)
+    )
+
+    # order the sample in the same way as the dataset
+    order = np.argsort(reservoir_indices)
+    sample_df = pd.DataFrame({col: reservoir[col][order] for col in columns})
+
+    return num_rows, reservoir_indices[order], sample_df, extremes_df
+
+
+def _get_chunk_data(chunk, predict_input):
+    chunk = chunk.reset_index(drop=True)
+
+    if predict_input == "numpy":
+        return chunk.to_numpy(copy=True), chunk
+
+    return chunk.copy(), chunk
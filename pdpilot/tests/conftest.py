@@ -0,0 +1,60 @@
+"""Fixtures shared by the unit tests."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def _predict(df):
+    # defined at the top level of the module so that it can be pickled
+    return (df["x1"] * df["x2"] + df["x3"]).to_numpy()
+
+
+@pytest.fixture
+def make_data():
+    """Get a function that makes a dataset with the given number of instances.
+    x1 and x2 are continuous and x3 is an integer from 0 to 3."""
+
+    def make_data(num_instances=100):
+        rng = np.random.default_rng(seed=1)
+        return pd.DataFrame(
+            {
+                "x1": rng.uniform(low=-1, high=1, size=(num_instances,)),
+                "x2": rng.uniform(low=-1, high=1, size=(num_instances,)),
+                "x3": rng.integers(0, 4, size=(num_instances,)),
+            }
+        )
+
+    return make_data
+
+
+@pytest.fixture
+def df(make_data):
+    """A dataset with 100 instances."""
+    return make_data()
+
+
+@pytest.fixture
+def predict():
+    """A predict function where x1 and x2 interact and x3 is additive."""
+    return _predict
+
+
+@pytest.fixture
+def pd_kwargs(predict):
+    """Get a function that returns the arguments to
+    :func:`pdpilot.partial_dependence` for a dataset, plotting all of its
+    features with a small grid."""
+
+    def pd_kwargs(df, **kwargs):
+        return {
+            "predict": predict,
+            "df": df,
+            "features": list(df.columns),
+            "resolution": 10,
+            "seed": 1,
+            "logging_level": "WARNING",
+            **kwargs,
+        }
+
+    return pd_kwargs
@@ -0,0 +1,100 @@
+"""Unit tests for computing PDPs of additive models from their contributions."""
+
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression, LogisticRegression
+
+from pdpilot import AdditiveModel, LinearModel, partial_dependence
+
+
+@pytest.fixture
+def df(make_data):
+    # x3 is replaced by a one-hot encoded color
+    df = make_data(200)
+    color = df.pop("x3") % 3
+    return df.assign(
+        red=(color == 0).astype(int),
+        green=(color == 1).astype(int),
+        blue=(color == 2).astype(int),
+    )
+
+
+def _run(predict, df, **kwargs):
+    results = partial_dependence(
+        predict=predict,
+        df=df,
+        features=["x1", "x2", "color"],
+        one_hot_features={
+            "color": [("red", "red"), ("green", "green"), ("blue", "blue")]
+        },
+        seed=1,
+        logging_level="WARNING",
+        **kwargs,
+    )
+    results.pop("timings")
+    return results
+
+
+def _assert_same_pdps(actual, expected):
+    for feature, lines in expected["feature_to_ice_lines"].items():
+        np.testing.assert_allclose(actual["feature_to_ice_lines"][feature], lines)
+
+    for key in ["one_way_pds", "two_way_pds"]:
+        for actual_pd, expected_pd in zip(actual[key], expected[key]):
+            assert actual_pd["id"] == expected_pd["id"]
+            np.testing.assert_allclose(
+                actual_pd["mean_predictions"],
+                expected_pd["mean_predictions"],
+                atol=1e-12,
+            )
+
+
+@pytest.mark.parametrize("predict_input", ["dataframe", "numpy"])
+def test_linear_regression(predict_input, df):
+    """the PDPs match calling the model, and there are no interactions"""
+    y = 2 * df["x1"] - df["x2"] + 3 * df["red"]
+    model = LinearRegression().fit(df.to_numpy(), y)
+
+    class CountingLinearModel(LinearModel):
+        num_calls = 0
+
+        def contributions(self, data):
+            CountingLinearModel.num_calls += 1
+            return super().contributions(data)
+
+    adapter = CountingLinearModel.from_sklearn(model)
+
+    expected = _run(model.predict, df, predict_input="numpy")
+    actual = _run(adapter, df, predict_input=predict_input)
+
+    _assert_same_pdps(actual, expected)
+
+    for pdp in actual["two_way_pds"]:
+        assert pdp["H"] == pytest.approx(0, abs=1e-9)
+
+    # two calls per one-way and two-way PDP, rather than one per grid value
+    assert CountingLinearModel.num_calls == 2 * (3 + len(actual["two_way_pds"]))
+
+
+def test_logistic_regression(df):
+    """the predictions are the probabilities of the positive class"""
+    y = df["x1"] + df["red"] > 0.5
+    model = LogisticRegression().fit(df, y)
+    adapter = LinearModel.from_sklearn(model)
+
+    np.testing.assert_allclose(adapter(df), model.predict_proba(df)[:, 1])
+
+    expected = _run(lambda df: model.predict_proba(df)[:, 1], df)
+    actual = _run(adapter, df)
+
+    _assert_same_pdps(actual, expected)
+
+
+def test_contributions_are_required():
+    """a subclass without contributions cannot be instantiated"""
+
+    class IncompleteModel(AdditiveModel):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteModel()
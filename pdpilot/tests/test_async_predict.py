@@ -0,0 +1,171 @@
+"""Unit tests for async prediction functions."""
+
+import asyncio
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pdpilot import AsyncPredictor, partial_dependence
+from pdpilot.cache import get_model_id
+
+
+class _ModelServer:
+    """A model server on localhost that reads a JSON list of rows per line and
+    writes back a JSON list of the model's predictions. The first connection is
+    closed without a response."""
+
+    def __init__(self, model):
+        self.model = model
+        self.num_connections = 0
+        self.num_rows = []
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.server = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(self._handle, "127.0.0.1", 0), self.loop
+        ).result()
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def _handle(self, reader, writer):
+        self.num_connections += 1
+
+        if self.num_connections > 1:
+            rows = json.loads(await reader.readline())
+            self.num_rows.append(len(rows))
+            df = pd.DataFrame(rows, columns=["x1", "x2", "x3"])
+            writer.write(json.dumps(self.model(df).tolist()).encode() + b"\n")
+            await writer.drain()
+
+        writer.close()
+
+    async def predict(self, df):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        writer.write(json.dumps(df.to_numpy().tolist()).encode() + b"\n")
+        await writer.drain()
+        response = await reader.readuntil(b"\n")
+        writer.close()
+        return json.loads(response)
+
+    def close(self):
+        self.server.close()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+@pytest.fixture
+def server(predict):
+    server = _ModelServer(predict)
+    yield server
+    server.close()
+
+
+def test_failed_request_is_retried(server, df, predict):
+    """the connection that is closed early is retried"""
+    predictor = AsyncPredictor(server.predict, retry_delay=0.01)
+
+    np.testing.assert_allclose(predictor(df), predict(df))
+    assert server.num_connections == 2
+
+    predictor.close()
+
+
+def test_small_requests_are_combined(server, df, predict):
+    """concurrent calls are sent in as few requests as fit in max_batch_rows"""
+    parts = [df.iloc[i : i + 10] for i in range(0, 100, 10)]
+    predictor = AsyncPredictor(
+        server.predict, max_batch_rows=50, max_delay=0.5, retry_delay=0.01
+    )
+
+    results = [None] * len(parts)
+
+    def call(i):
+        results[i] = predictor(parts[i])
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(parts))]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    predictor.close()
+
+    for part, result in zip(parts, results):
+        np.testing.assert_allclose(result, predict(part))
+
+    # the first combined request is retried
+    assert server.num_rows == [50, 50]
+
+
+def test_partial_dependence_with_async_predict(server, df, pd_kwargs):
+    """an async predict function gives the same results as a regular one"""
+    expected = partial_dependence(**pd_kwargs(df))
+    actual = partial_dependence(**pd_kwargs(df, predict=server.predict))
+
+    assert len(actual.pop("timings")) == len(expected.pop("timings"))
+    np.testing.assert_equal(actual, expected)
+
+
+def test_predictor_is_reused_after_close(df, predict):
+    """a closed predictor starts a new event loop when it is called again"""
+
+    async def slow_predict(df):
+        await asyncio.sleep(0.01)
+        return predict(df)
+
+    # one call in flight at a time, so that the calls wait on the semaphore
+    predictor = AsyncPredictor(slow_predict, max_in_flight=1)
+
+    for _ in range(2):
+        results = [None] * 4
+
+        def call(i):
+            results[i] = predictor(df)
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(4)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        predictor.close()
+
+        for result in results:
+            np.testing.assert_allclose(result, predict(df))
+
+
+def test_given_predictor_is_closed(server, df, predict, pd_kwargs):
+    """a predictor that is passed in is stopped at the end of the run and
+    starts again when it is called"""
+    predictor = AsyncPredictor(server.predict, retry_delay=0.01)
+
+    partial_dependence(**pd_kwargs(df, predict=predictor))
+
+    assert predictor._loop is None
+    np.testing.assert_allclose(predictor(df), predict(df))
+    predictor.close()
+
+
+class _AsyncModel:
+    def __init__(self, coef):
+        self.coef = coef
+
+    async def predict(self, df):
+        return self.coef * df.sum(axis=1).to_numpy()
+
+
+def test_predictor_is_identified_by_its_function():
+    """the cache and checkpoints identify a predictor by the function that it
+    wraps, rather than by its settings"""
+    model = _AsyncModel(coef=2)
+    model_id = get_model_id(model.predict)
+
+    assert get_model_id(AsyncPredictor(model.predict)) == model_id
+    assert get_model_id(AsyncPredictor(model.predict, max_in_flight=2)) == model_id
+    assert get_model_id(AsyncPredictor(_AsyncModel(coef=3).predict)) != model_id
@@ -0,0 +1,85 @@
+"""Unit tests for the prediction cache."""
+
+import os
+
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from pdpilot import partial_dependence
+from pdpilot.cache import PredictionCache
+
+
+def test_cache_round_trip(tmp_path):
+    """cached predictions are returned unchanged"""
+    cache = PredictionCache(tmp_path, "model", "dataset", max_size=2**20)
+    key = cache.key("ice", ["x1"], [(0.0,), (1.0,)])
+    predictions = np.arange(12, dtype=float).reshape(6, 2)
+
+    assert cache.get(key) is None
+
+    cache.put(key, predictions)
+
+    np.testing.assert_array_equal(cache.get(key), predictions)
+
+
+def test_cache_key_depends_on_model_and_grid(tmp_path):
+    """different models and grids do not share entries"""
+    cache = PredictionCache(tmp_path, "model", "dataset", max_size=2**20)
+    other_model = PredictionCache(tmp_path, "other", "dataset", max_size=2**20)
+
+    key = cache.key("ice", ["x1"], [(0.0,), (1.0,)])
+
+    assert key != other_model.key("ice", ["x1"], [(0.0,), (1.0,)])
+    assert key != cache.key("ice", ["x1"], [(0.0,), (2.0,)])
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """old entries are deleted when the cache is too large"""
+    predictions = np.zeros(100)
+    entry_size = 928  # 800 bytes of data plus the .npy header
+    cache = PredictionCache(tmp_path, "model", "dataset", max_size=2 * entry_size)
+
+    keys = [cache.key("ice", [f"x{i}"], [(0,)]) for i in range(3)]
+
+    for i, key in enumerate(keys[:2]):
+        cache.put(key, predictions)
+        os.utime(tmp_path / f"{key}.npy", (i, i))
+
+    cache.put(keys[2], predictions)
+
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[1]) is not None
+    assert cache.get(keys[2]) is not None
+
+
+def test_retrained_model_is_not_loaded(tmp_path, df, predict, pd_kwargs):
+    """the predictions of a model are not loaded after it is retrained"""
+    model = LinearRegression().fit(df, predict(df))
+    kwargs = pd_kwargs(df, predict=model.predict)
+
+    partial_dependence(**kwargs, cache_dir=tmp_path)
+    model.fit(df, -predict(df))
+
+    actual = partial_dependence(**kwargs, cache_dir=tmp_path)
+    expected = partial_dependence(**kwargs)
+    actual.pop("timings")
+    expected.pop("timings")
+
+    assert actual == expected
+
+
+def test_function_requires_model_id(tmp_path, df, predict, pd_kwargs):
+    """a function that calls a model cannot be cached without a model id"""
+    model = LinearRegression().fit(df, predict(df))
+
+    def predict_with_model(df):
+        return model.predict(df)
+
+    kwargs = pd_kwargs(df, predict=predict_with_model, cache_dir=tmp_path)
+
+    with pytest.raises(ValueError, match="cache_model_id"):
+        partial_dependence(**kwargs)
+
+    partial_dependence(**kwargs, cache_model_id="model")
+    assert any(tmp_path.iterdir())
@@ -0,0 +1,84 @@
+"""Unit tests for checkpointing partial dependence runs."""
+
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from pdpilot import partial_dependence
+from pdpilot.checkpoint import Checkpoint
+
+
+def _run(**kwargs):
+    results = partial_dependence(cache_model_id="model", n_jobs=1, **kwargs)
+    results.pop("timings")
+    return results
+
+
+def test_finished_run_is_loaded(tmp_path, df, pd_kwargs):
+    """rerunning a finished run does not call the model"""
+    kwargs = pd_kwargs(df, checkpoint_dir=tmp_path)
+    expected = _run(**kwargs)
+
+    def fail(df):
+        raise AssertionError("predict should not be called")
+
+    assert _run(**{**kwargs, "predict": fail}) == expected
+
+
+def test_interrupted_run_is_resumed(tmp_path, df, predict, pd_kwargs):
+    """a run that fails partway through resumes with the finished PDPs"""
+    num_calls = 0
+
+    def interrupted(df):
+        nonlocal num_calls
+        num_calls += 1
+
+        if num_calls > 50:
+            raise RuntimeError("interrupted")
+
+        return predict(df)
+
+    kwargs = pd_kwargs(df, checkpoint_dir=tmp_path / "checkpoint")
+
+    with pytest.raises(RuntimeError):
+        _run(**{**kwargs, "predict": interrupted})
+
+    assert any((tmp_path / "checkpoint").glob("*/one_way/*.pkl"))
+
+    expected = _run(**{**kwargs, "checkpoint_dir": tmp_path / "expected"})
+
+    assert _run(**kwargs) == expected
+
+
+def test_retrained_model_is_not_resumed(tmp_path, df, predict, pd_kwargs):
+    """the saved PDPs of a model are not loaded after it is retrained"""
+    model = LinearRegression().fit(df, predict(df))
+    kwargs = pd_kwargs(df, predict=model.predict)
+
+    partial_dependence(**kwargs, checkpoint_dir=tmp_path)
+    model.fit(df, -predict(df))
+
+    actual = partial_dependence(**kwargs, checkpoint_dir=tmp_path)
+    expected = partial_dependence(**kwargs)
+    actual.pop("timings")
+    expected.pop("timings")
+
+    assert actual == expected
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_function_requires_model_id(tmp_path, df, pd_kwargs):
+    """a plain function cannot be checkpointed without a model id"""
+    with pytest.raises(ValueError, match="cache_model_id"):
+        partial_dependence(**pd_kwargs(df, checkpoint_dir=tmp_path))
+
+
+@pytest.mark.parametrize(
+    "contents", [b"", b"not a pickle", b"\x80\x04corrupt", b"\x80\x04\x95\x10"]
+)
+def test_corrupt_checkpoint_is_ignored(tmp_path, contents):
+    """a result that cannot be loaded is treated as missing"""
+    checkpoint = Checkpoint(tmp_path, "run")
+    checkpoint.put("one_way", ["x1"], {"x_feature": "x1"})
+    checkpoint._path("one_way", ["x1"]).write_bytes(contents)
+
+    assert checkpoint.get("one_way", ["x1"]) is None
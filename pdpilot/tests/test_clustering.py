@@ -0,0 +1,191 @@
+"""Unit tests for clustering ICE lines."""
+
+import numpy as np
+import pandas as pd
+from numpy.random import RandomState
+from sklearn.cluster import KMeans
+from sklearn.metrics import adjusted_rand_score, silhouette_score
+
+from pdpilot import partial_dependence
+from pdpilot.clustering import (
+    SilhouetteScorer,
+    batched_kmeans,
+    chunked_silhouette_score,
+    iter_clusterings,
+    simplified_silhouette_score,
+)
+
+
+def _make_clusters(num_lines=300):
+    rng = np.random.default_rng(seed=6)
+    centers = rng.uniform(low=-5, high=5, size=(3, 8))
+    labels = rng.integers(0, 3, size=(num_lines,))
+    lines = centers[labels] + rng.normal(size=(num_lines, 8))
+    model = KMeans(n_clusters=3, n_init=1, random_state=0).fit(lines)
+    return lines, model.labels_, model.cluster_centers_
+
+
+def test_chunked_silhouette_matches_sklearn(monkeypatch):
+    """computing the score in chunks gives the exact score"""
+    lines, labels, _ = _make_clusters()
+
+    # force many small chunks
+    monkeypatch.setattr("pdpilot.clustering._CHUNK_NUM_DISTANCES", 1000)
+
+    np.testing.assert_allclose(
+        chunked_silhouette_score(lines, labels), silhouette_score(lines, labels)
+    )
+
+
+def test_chunked_silhouette_handles_singletons():
+    """lines in a cluster of their own have a coefficient of 0, as in sklearn"""
+    lines = np.array([[0.0], [0.1], [0.2], [5.0]])
+    labels = np.array([0, 0, 0, 1])
+
+    np.testing.assert_allclose(
+        chunked_silhouette_score(lines, labels), silhouette_score(lines, labels)
+    )
+
+
+def test_simplified_silhouette_agrees_with_exact():
+    """the simplified score is close to the exact one for separated clusters"""
+    lines, labels, centers = _make_clusters()
+
+    simplified = simplified_silhouette_score(lines, labels, centers)
+
+    assert -1 <= simplified <= 1
+    assert abs(simplified - silhouette_score(lines, labels)) < 0.1
+
+
+def test_scorer_chooses_method():
+    """auto uses the exact score for small datasets and a sample otherwise"""
+    lines, labels, centers = _make_clusters()
+
+    small = SilhouetteScorer(lines, "auto", 1000, RandomState(0))
+    large = SilhouetteScorer(lines, "auto", 100, RandomState(0))
+
+    assert small.method == "exact"
+    assert large.method == "sampled"
+    assert large.distances.shape == (100, 100)
+
+    np.testing.assert_allclose(
+        small.score(labels, centers), silhouette_score(lines, labels)
+    )
+    assert abs(large.score(labels, centers) - small.score(labels, centers)) < 0.1
+
+
+def test_minibatch_clustering_assigns_all_lines():
+    """fitting on a sample still labels every line and finds the clusters"""
+    lines, expected_labels, _ = _make_clusters()
+
+    clusterings = list(
+        iter_clusterings(lines, (2, 4), "minibatch", 100, RandomState(0))
+    )
+
+    assert [n_clusters for n_clusters, _, _ in clusterings] == [2, 3, 4]
+
+    for n_clusters, labels, centers in clusterings:
+        assert labels.shape == (lines.shape[0],)
+        assert centers.shape == (n_clusters, lines.shape[1])
+
+    _, labels, _ = clusterings[1]
+    assert adjusted_rand_score(expected_labels, labels) > 0.95
+
+
+def test_batched_kmeans_clusters_each_feature(monkeypatch):
+    """clustering stacked features finds the clusters of each one"""
+    lines, expected_labels, _ = _make_clusters()
+    shuffled = np.random.default_rng(seed=1).permutation(lines.shape[0])
+    stacked = np.stack([lines, lines[shuffled], lines])
+
+    # force the features to be split into two batches
+    monkeypatch.setattr("pdpilot.clustering._BATCH_NUM_VALUES", 20_000)
+
+    clusterings = batched_kmeans(stacked, (2, 4), RandomState(0))
+
+    assert len(clusterings) == 3
+
+    for feature_clusterings, feature_labels in zip(
+        clusterings, [expected_labels, expected_labels[shuffled], expected_labels]
+    ):
+        assert [n_clusters for n_clusters, _, _ in feature_clusterings] == [2, 3, 4]
+
+        for n_clusters, labels, centers in feature_clusterings:
+            assert labels.shape == (lines.shape[0],)
+            assert centers.shape == (n_clusters, lines.shape[1])
+
+        _, labels, _ = feature_clusterings[1]
+        assert adjusted_rand_score(feature_labels, labels) > 0.95
+
+
+def test_batched_partial_dependence_matches_kmeans():
+    """batched clustering only changes how the lines are clustered"""
+    rng = np.random.default_rng(seed=3)
+    df = pd.DataFrame(
+        {
+            "x1": rng.uniform(low=-1, high=1, size=(200,)),
+            "x2": rng.uniform(low=-1, high=1, size=(200,)),
+            "x3": rng.integers(0, 4, size=(200,)),
+        }
+    )
+
+    def predict(df):
+        return (np.where(df["x2"] > 0, df["x1"], -df["x1"]) + df["x3"]).to_numpy()
+
+    kwargs = dict(
+        predict=predict,
+        df=df,
+        features=list(df.columns),
+        n_jobs=1,
+        seed=1,
+        logging_level="WARNING",
+    )
+
+    expected = partial_dependence(cluster_method="kmeans", **kwargs)
+    actual = partial_dependence(cluster_method="batched", **kwargs)
+
+    for actual_pd, expected_pd in zip(actual["one_way_pds"], expected["one_way_pds"]):
+        assert actual_pd["x_feature"] == expected_pd["x_feature"]
+        np.testing.assert_allclose(
+            actual_pd["mean_predictions"], expected_pd["mean_predictions"]
+        )
+
+    # the effect of x1 depends on the sign of x2, so its lines form two clusters
+    [x1] = [owp for owp in actual["one_way_pds"] if owp["x_feature"] == "x1"]
+    assert x1["ice"]["num_clusters"] == 2
+
+
+def test_sampled_silhouette_does_not_change_clusterings():
+    """sampling the lines to score only changes which clustering is chosen"""
+    rng = np.random.default_rng(seed=8)
+    num_instances = 6000
+    df = pd.DataFrame(
+        {
+            "x1": rng.uniform(low=-1, high=1, size=(num_instances,)),
+            "x2": rng.uniform(low=-1, high=1, size=(num_instances,)),
+        }
+    )
+
+    def predict(df):
+        return (df["x1"] * df["x2"]).to_numpy()
+
+    kwargs = dict(
+        predict=predict,
+        df=df,
+        features=["x1"],
+        resolution=5,
+        num_clusters_extent=(2, 3),
+        compute_two_way_pdps=False,
+        seed=1,
+        logging_level="WARNING",
+    )
+
+    # more lines than silhouette_sample_size, so "auto" samples them
+    sampled = partial_dependence(silhouette_method="auto", **kwargs)
+    chunked = partial_dependence(silhouette_method="chunked", **kwargs)
+
+    [sampled_pd] = sampled["one_way_pds"]
+    [chunked_pd] = chunked["one_way_pds"]
+
+    assert sampled_pd["ice"]["silhouette_method"] == "sampled"
+    assert sampled_pd["ice"]["clusterings"] == chunked_pd["ice"]["clusterings"]
@@ -0,0 +1,69 @@
+"""Unit tests for explaining clusters of ICE lines."""
+
+import numpy as np
+from numpy.random import RandomState
+
+from pdpilot import partial_dependence
+from pdpilot.explanation import ClusterExplainer, _stratified_sample
+
+
+def _get_labels(df):
+    # three clusters determined by x1 and x3
+    return np.where(df["x1"] > 0.5, 2, (df["x3"] >= 2).astype(int))
+
+
+def test_explanation_methods_agree(make_data):
+    """the cheaper settings find the same interacting features"""
+    X = make_data(2000)
+    labels = _get_labels(X)
+    params = {"max_depth": 3, "ccp_alpha": 0.01}
+
+    rankings = []
+
+    for kwargs in [
+        {},
+        {"method": "multiclass"},
+        {"method": "multiclass", "sample_size": 500, "max_bins": 16},
+    ]:
+        explainer = ClusterExplainer(X, {}, params, RandomState(0), **kwargs)
+        importances = explainer.interacting_features(labels, 3)
+        rankings.append(sorted(importances, key=importances.get, reverse=True))
+
+    for ranking in rankings:
+        assert set(ranking[:2]) == {"x1", "x3"}
+
+
+def test_stratified_sample_keeps_clusters():
+    """each cluster keeps its share of the rows and no cluster is dropped"""
+    labels = np.array([0] * 900 + [1] * 95 + [2] * 5)
+
+    rows = _stratified_sample(labels, 100, RandomState(0))
+
+    assert np.unique(rows).shape == rows.shape
+    np.testing.assert_array_equal(np.bincount(labels[rows]), [90, 10, 1])
+
+
+def test_explanation_sample_does_not_change_clusterings(make_data, pd_kwargs):
+    """sampling the rows that explain the clusters leaves the clusters alone"""
+
+    def predict(df):
+        return (np.where(df["x3"] >= 2, df["x1"], -df["x1"]) + df["x2"]).to_numpy()
+
+    kwargs = pd_kwargs(
+        make_data(500), predict=predict, resolution=5, compute_two_way_pdps=False
+    )
+
+    sampled = partial_dependence(explanation_sample_size=100, **kwargs)
+    full = partial_dependence(explanation_sample_size=None, **kwargs)
+
+    for sampled_pd, full_pd in zip(sampled["one_way_pds"], full["one_way_pds"]):
+        sampled_clusterings = sampled_pd["ice"]["clusterings"]
+        full_clusterings = full_pd["ice"]["clusterings"]
+
+        assert sampled_clusterings.keys() == full_clusterings.keys()
+
+        for n_clusters, clustering in sampled_clusterings.items():
+            assert (
+                clustering["cluster_labels"]
+                == full_clusterings[n_clusters]["cluster_labels"]
+            )
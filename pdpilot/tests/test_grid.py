@@ -0,0 +1,177 @@
+"""Unit tests for grid evaluation."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from numpy.random import RandomState
+
+from pdpilot.grid import (
+    estimate_grid_means,
+    get_num_predict_calls,
+    mean_grid_predictions,
+    predict_grid,
+)
+from pdpilot.metadata import get_column_indices
+
+
+def _make_data(num_instances=50):
+    rng = np.random.default_rng(seed=1)
+    return pd.DataFrame(
+        {
+            "x1": rng.uniform(low=-1, high=1, size=(num_instances,)),
+            "x2": rng.uniform(low=-1, high=1, size=(num_instances,)),
+            "c_a": np.tile([1, 0], num_instances // 2),
+            "c_b": np.tile([0, 1], num_instances // 2),
+        }
+    )
+
+
+def _predict(df):
+    return (df["x1"] * df["x2"] + 2 * df["c_b"]).to_numpy()
+
+
+FEATURE_INFO = {
+    "x1": {"subkind": "continuous"},
+    "x2": {"subkind": "continuous"},
+    "c": {
+        "subkind": "one_hot",
+        "columns_and_values": [("c_a", "a"), ("c_b", "b")],
+        "value_to_column": {"a": "c_a", "b": "c_b"},
+        "value_map": {0: "a", 1: "b"},
+    },
+}
+
+
+def test_batched_predict_grid_matches_unbatched():
+    """batching cells and rows gives the same predictions"""
+    data = _make_data()
+    cells = [(x, c) for x in [-1.0, 0.0, 0.5] for c in [0, 1]]
+
+    expected = predict_grid(
+        _predict, data.copy(), data.copy(), ["x1", "c"], cells, FEATURE_INFO
+    )
+
+    for batch_size in [7, 50, 120, 1000]:
+        actual = predict_grid(
+            _predict,
+            data.copy(),
+            data.copy(),
+            ["x1", "c"],
+            cells,
+            FEATURE_INFO,
+            batch_size=batch_size,
+        )
+        np.testing.assert_allclose(actual, expected)
+
+
+def test_mean_grid_predictions_matches_predict_grid():
+    """chunked means are the means of the full predictions"""
+    data = _make_data()
+    cells = [(x1, x2) for x1 in [-1.0, 1.0] for x2 in [-0.5, 0.0, 0.5]]
+
+    expected = predict_grid(
+        _predict, data.copy(), data.copy(), ["x1", "x2"], cells, FEATURE_INFO
+    ).mean(axis=1)
+
+    actual = mean_grid_predictions(
+        _predict,
+        data.copy(),
+        data.copy(),
+        ["x1", "x2"],
+        cells,
+        FEATURE_INFO,
+        batch_size=30,
+    )
+
+    np.testing.assert_allclose(actual, expected)
+
+
+def test_array_predict_grid_matches_dataframe():
+    """perturbing a NumPy array gives the same predictions as a DataFrame"""
+    data = _make_data()
+    cells = [(x, c) for x in [-1.0, 0.0, 0.5] for c in [0, 1]]
+    column_indices = get_column_indices(data.columns, FEATURE_INFO)
+
+    def predict_array(X):
+        return _predict(pd.DataFrame(X, columns=data.columns))
+
+    expected = predict_grid(
+        _predict, data.copy(), data.copy(), ["x1", "c"], cells, FEATURE_INFO
+    )
+
+    for batch_size in [None, 7, 120]:
+        array = data.to_numpy(dtype=float)
+        actual = predict_grid(
+            predict_array,
+            array,
+            None,
+            ["x1", "c"],
+            cells,
+            FEATURE_INFO,
+            batch_size=batch_size,
+            column_indices=column_indices,
+        )
+        np.testing.assert_allclose(actual, expected)
+        np.testing.assert_array_equal(array, data.to_numpy(dtype=float))
+
+
+def test_estimate_grid_means():
+    """progressive estimates stop early and are exact when all rows are used"""
+    data = _make_data(num_instances=200)
+    cells = [(x1, x2) for x1 in [-1.0, 1.0] for x2 in [-0.5, 0.0, 0.5]]
+
+    expected = mean_grid_predictions(
+        _predict, data.copy(), data.copy(), ["x1", "x2"], cells, FEATURE_INFO
+    )
+
+    means, standard_error, num_rows = estimate_grid_means(
+        _predict,
+        data.copy(),
+        data.copy(),
+        ["x1", "x2"],
+        cells,
+        FEATURE_INFO,
+        tolerance=0,
+        block_size=64,
+        random_state=RandomState(0),
+    )
+
+    np.testing.assert_allclose(means, expected)
+    assert num_rows == 200
+    assert standard_error > 0
+
+    _, standard_error, num_rows = estimate_grid_means(
+        _predict,
+        data.copy(),
+        data.copy(),
+        ["x1", "x2"],
+        cells,
+        FEATURE_INFO,
+        tolerance=1,
+        block_size=64,
+        random_state=RandomState(0),
+    )
+
+    assert num_rows == 64
+    assert standard_error <= 1
+
+
+def test_predict_grid_restores_data():
+    """the dataset is unchanged after evaluating a grid"""
+    data = _make_data()
+    original = data.copy()
+
+    predict_grid(_predict, data, data.copy(), ["c"], [(0,), (1,)], FEATURE_INFO)
+
+    pd.testing.assert_frame_equal(data, original)
+
+
+def test_get_num_predict_calls():
+    """the number of calls respects the row budget"""
+    assert get_num_predict_calls(100, 20, None) == 20
+    assert get_num_predict_calls(100, 20, 1000) == 2
+    assert get_num_predict_calls(100, 20, 40) == 60
+
+    with pytest.raises(ValueError):
+        get_num_predict_calls(0, 20, 1000)
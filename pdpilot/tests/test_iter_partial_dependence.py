@@ -0,0 +1,109 @@
+"""Unit tests for yielding PDPs as they finish."""
+
+import inspect
+
+import pytest
+
+from pdpilot import iter_partial_dependence, partial_dependence, pdp
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"n_jobs": 1},
+        {"n_jobs": 2, "backend": "threads"},
+        {"progressive_tolerance": 0.01, "progressive_block_size": 20},
+    ],
+)
+def test_items_match_results(kwargs, df, pd_kwargs):
+    """every PDP is yielded once before the results, which are the same as
+    the results of partial_dependence"""
+    items = list(iter_partial_dependence(**pd_kwargs(df, **kwargs)))
+
+    *pdp_items, last = items
+    assert last["type"] == "results"
+    results = last["results"]
+
+    one_way_items = [item for item in pdp_items if item["type"] == "one_way"]
+    two_way_items = [item for item in pdp_items if item["type"] == "two_way"]
+    assert len(one_way_items) + len(two_way_items) == len(pdp_items)
+
+    assert sorted(item["features"][0] for item in one_way_items) == sorted(df.columns)
+    for item in one_way_items:
+        [feature] = item["features"]
+        assert item["pdp"]["x_feature"] == feature
+        assert item["pdp"] in results["one_way_pds"]
+        assert item["ice_lines"] == results["feature_to_ice_lines"][feature]
+
+    assert len(two_way_items) == len(results["two_way_pds"]) > 0
+    for item in two_way_items:
+        pdp = item["pdp"]
+        assert item["features"] == [pdp["x_feature"], pdp["y_feature"]]
+        assert pdp in results["two_way_pds"]
+
+    # a two-way PDP is yielded after the one-way PDPs of both of its features
+    for i, item in enumerate(pdp_items):
+        if item["type"] == "two_way":
+            finished = {
+                earlier["features"][0]
+                for earlier in pdp_items[:i]
+                if earlier["type"] == "one_way"
+            }
+            assert set(item["features"]) <= finished
+
+    expected = partial_dependence(**pd_kwargs(df, **kwargs))
+    results.pop("timings")
+    expected.pop("timings")
+    assert results == expected
+
+
+def test_close_releases_shared_data(tmp_path, df, pd_kwargs):
+    """closing the generator early deletes the dataset's shared file"""
+    items = iter_partial_dependence(**pd_kwargs(df, n_jobs=2, shared_data_dir=tmp_path))
+
+    first = next(items)
+    assert first["type"] == "one_way"
+    assert list(tmp_path.iterdir())
+
+    items.close()
+    assert not list(tmp_path.iterdir())
+
+
+def test_checkpointed_pdps_are_yielded(tmp_path, df, pd_kwargs):
+    """PDPs loaded from a checkpoint are yielded without calling the model"""
+    kwargs = pd_kwargs(df, checkpoint_dir=tmp_path, cache_model_id="model")
+
+    expected = list(iter_partial_dependence(**kwargs))
+
+    def fail(df):
+        raise AssertionError("predict should not be called")
+
+    items = list(iter_partial_dependence(**{**kwargs, "predict": fail}))
+
+    assert len(items) == len(expected)
+    assert items[-1]["results"]["two_way_pds"] == expected[-1]["results"]["two_way_pds"]
+    assert sorted(item["type"] for item in items[:-1]) == sorted(
+        item["type"] for item in expected[:-1]
+    )
+
+
+def test_partial_dependence_forwards_every_parameter(monkeypatch):
+    """partial_dependence has the same parameters as iter_partial_dependence
+    and passes each of them on"""
+    parameters = inspect.signature(iter_partial_dependence).parameters
+    assert inspect.signature(partial_dependence).parameters == parameters
+
+    received = {}
+
+    def fake_iter_partial_dependence(**kwargs):
+        received.update(kwargs)
+        yield {"type": "results", "results": "results"}
+
+    monkeypatch.setattr(pdp, "iter_partial_dependence", fake_iter_partial_dependence)
+
+    # a distinct value for every parameter, without an output path
+    kwargs = {name: object() for name in parameters}
+    kwargs["output_path"] = None
+
+    assert partial_dependence(**kwargs) == "results"
+    assert received == kwargs
@@ -0,0 +1,74 @@
+"""Unit tests for profiling the phases of partial dependence runs."""
+
+from pdpilot import partial_dependence
+
+
+def _count_rows_scored(results, num_instances):
+    one_way = sum(len(pdp["x_values"]) for pdp in results["one_way_pds"])
+    two_way = sum(len(pdp["x_values"]) for pdp in results["two_way_pds"])
+    return (one_way + two_way) * num_instances
+
+
+def test_profile(df, pd_kwargs):
+    """the phases are recorded without changing the results"""
+    expected = partial_dependence(**pd_kwargs(df))
+    actual = partial_dependence(**pd_kwargs(df, profile=True))
+
+    profile = actual.pop("profile")
+    actual.pop("timings")
+    expected.pop("timings")
+
+    assert actual == expected
+
+    phases = profile["phases"]
+    assert phases["predict"]["rows"] == _count_rows_scored(actual, df.shape[0])
+    assert phases["ice_lines"]["calls"] == 3
+    assert phases["two_way_grid"]["calls"] == len(actual["two_way_pds"])
+
+    for name in ["metadata", "clustering", "silhouette", "explanation"]:
+        assert phases[name]["seconds"] > 0
+
+    # each candidate clustering is scored and explained once
+    num_clusterings = sum(
+        len(pdp["ice"]["clusterings"]) for pdp in actual["one_way_pds"]
+    )
+    assert phases["silhouette"]["calls"] == num_clusterings
+    assert phases["explanation"]["calls"] == num_clusterings
+
+    assert len(profile["tasks"]) == 3 + len(actual["two_way_pds"])
+    assert sum(task["phases"]["predict"]["rows"] for task in profile["tasks"]) == (
+        phases["predict"]["rows"]
+    )
+
+
+class _CountingHook:
+    num_entered = 0
+
+    def __enter__(self):
+        _CountingHook.num_entered += 1
+
+    def __exit__(self, *args):
+        pass
+
+
+def test_profile_callback_and_hooks(tmp_path, df, pd_kwargs):
+    """the callback gets the output phase and hooks wrap their phase"""
+    profiles = []
+
+    partial_dependence(
+        **pd_kwargs(
+            df,
+            n_jobs=2,
+            backend="threads",
+            output_path=tmp_path / "results.json",
+            profile_callback=profiles.append,
+            profile_hooks={"metadata": _CountingHook, "silhouette": _CountingHook},
+        )
+    )
+
+    [profile] = profiles
+    phases = profile["phases"]
+
+    assert phases["output"]["calls"] == 1
+    assert _CountingHook.num_entered == 1 + phases["silhouette"]["calls"]
+    assert "profile" not in (tmp_path / "results.json").read_text()
@@ -0,0 +1,67 @@
+"""Unit tests for progress events."""
+
+import pytest
+
+from pdpilot import partial_dependence
+
+
+def _run(kwargs):
+    events = []
+    results = partial_dependence(**kwargs, progress_callback=events.append)
+    return results, events
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"n_jobs": 1},
+        {"n_jobs": 2, "backend": "threads"},
+        {"n_jobs": 2, "backend": "processes"},
+    ],
+)
+def test_progress_events(kwargs, df, pd_kwargs):
+    """every task is started and finished once, whichever backend runs it"""
+    results, events = _run(pd_kwargs(df, **kwargs))
+
+    started = [
+        (e["task"], tuple(e["features"]))
+        for e in events
+        if e["event"] == "task_started"
+    ]
+    finished = [e for e in events if e["event"] == "task_finished"]
+
+    num_pdps = len(results["one_way_pds"]) + len(results["two_way_pds"])
+    assert len(started) == len(finished) == num_pdps
+    assert set(started) == {(e["task"], tuple(e["features"])) for e in finished}
+
+    # each task starts before it finishes
+    for i, event in enumerate(events):
+        if event["event"] == "task_finished":
+            assert any(
+                e["event"] == "task_started" and e["features"] == event["features"]
+                for e in events[:i]
+            )
+
+    assert [e["num_finished"] for e in finished] == list(range(1, num_pdps + 1))
+    assert finished[-1]["num_tasks"] == num_pdps
+    assert finished[-1]["eta"] == 0
+
+    assert sum(e["rows_scored"] for e in finished) == df.shape[0] * (
+        sum(len(pdp["x_values"]) for pdp in results["one_way_pds"])
+        + sum(len(pdp["x_values"]) for pdp in results["two_way_pds"])
+    )
+
+    one_way_results = [e["result"] for e in finished if e["task"] == "one_way"]
+    assert sorted(one_way_results, key=lambda pdp: pdp["id"]) == sorted(
+        results["one_way_pds"], key=lambda pdp: pdp["id"]
+    )
+
+
+def test_progress_events_for_ice_lines(df, pd_kwargs):
+    """tasks that only compute ICE lines are reported without results"""
+    _, events = _run(pd_kwargs(df, cluster_method="batched"))
+
+    ice_lines_events = [e for e in events if e["task"] == "ice_lines"]
+
+    assert len(ice_lines_events) == 2 * df.shape[1]
+    assert all(e.get("result") is None for e in ice_lines_events)
@@ -0,0 +1,167 @@
+"""Unit tests for computing PDPs by traversing trees."""
+
+import numpy as np
+import pytest
+from sklearn.ensemble import (
+    GradientBoostingClassifier,
+    GradientBoostingRegressor,
+    HistGradientBoostingRegressor,
+    RandomForestClassifier,
+    RandomForestRegressor,
+)
+
+from pdpilot import partial_dependence, recursion
+from pdpilot.grid import mean_grid_predictions
+from pdpilot.metadata import Metadata
+from pdpilot.recursion import get_recursion_model, recursion_grid_means
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        GradientBoostingRegressor(random_state=0),
+        HistGradientBoostingRegressor(random_state=0),
+        RandomForestRegressor(n_estimators=20, random_state=0),
+    ],
+)
+def test_recursion_matches_brute(model, make_data, predict):
+    """on the training data, traversing the trees approximates averaging"""
+    df = make_data(500)
+    model.fit(df, predict(df))
+
+    md = Metadata(df, 5, list(df.columns), None, None, None, None)
+    features = ["x1", "x2"]
+    cells = [
+        (x1, x2)
+        for x1 in md.feature_info["x1"]["values"]
+        for x2 in md.feature_info["x2"]["values"]
+    ]
+
+    expected = mean_grid_predictions(
+        predict=model.predict,
+        data=df.copy(),
+        data_copy=df,
+        features=features,
+        cells=cells,
+        feature_info=md.feature_info,
+    )
+    actual = recursion_grid_means(
+        model=get_recursion_model(model.predict),
+        features=features,
+        cells=cells,
+        column_indices=md.column_indices,
+    )
+
+    np.testing.assert_allclose(actual, expected, atol=0.1)
+
+
+def test_partial_dependence_with_recursion(make_data, predict):
+    """the PDPs are traversed while the ICE lines are still predicted"""
+    df = make_data(500)
+    model = GradientBoostingClassifier(random_state=0).fit(df, predict(df) > 0)
+    md = Metadata(df, 20, list(df.columns), None, None, None, None)
+
+    kwargs = dict(
+        predict=model.decision_function,
+        df=df,
+        features=list(df.columns),
+        seed=1,
+        logging_level="WARNING",
+    )
+
+    expected = partial_dependence(**kwargs)
+    actual = partial_dependence(pdp_method="recursion", **kwargs)
+
+    assert actual["feature_to_ice_lines"] == expected["feature_to_ice_lines"]
+    assert len(actual["two_way_pds"]) == len(expected["two_way_pds"])
+
+    for pdp in actual["one_way_pds"] + actual["two_way_pds"]:
+        if pdp["num_features"] == 1:
+            features = [pdp["x_feature"]]
+            cells = [(value,) for value in pdp["x_values"]]
+        else:
+            features = [pdp["x_feature"], pdp["y_feature"]]
+            cells = list(zip(pdp["x_values"], pdp["y_values"]))
+
+        np.testing.assert_allclose(
+            pdp["mean_predictions"],
+            recursion_grid_means(model, features, cells, md.column_indices),
+        )
+
+
+def test_recursion_requires_tree_model(df, predict):
+    """other models and prediction functions are rejected"""
+    y = predict(df)
+    classifier = RandomForestClassifier(n_estimators=5).fit(df, y > 0)
+    regressor = GradientBoostingRegressor(n_estimators=5).fit(df, y)
+
+    for predict in [lambda df: df["x1"], classifier.predict_proba]:
+        with pytest.raises(ValueError):
+            get_recursion_model(predict)
+
+    with pytest.raises(ValueError):
+        partial_dependence(
+            predict=regressor.predict,
+            df=df[["x1", "x2"]],
+            features=["x1", "x2"],
+            pdp_method="recursion",
+            logging_level="WARNING",
+        )
+
+
+def test_recursion_with_one_hot_feature(monkeypatch, make_data, predict):
+    """the cells of a one-hot encoded feature set one column each, whether the
+    cells are traversed together or one at a time"""
+    df = make_data(500)
+    y = predict(df)
+    df = df.assign(**{f"x3_{i}": (df["x3"] == i).astype(float) for i in range(4)})
+    df = df.drop(columns="x3")
+    model = GradientBoostingRegressor(random_state=0).fit(df, y)
+
+    one_hot_features = {"x3": [(f"x3_{i}", str(i)) for i in range(4)]}
+    md = Metadata(df, 5, ["x1", "x3"], one_hot_features, None, None, None)
+    cells = [(x3,) for x3 in md.feature_info["x3"]["values"]]
+
+    expected = mean_grid_predictions(
+        predict=model.predict,
+        data=df.copy(),
+        data_copy=df,
+        features=["x3"],
+        cells=cells,
+        feature_info=md.feature_info,
+    )
+    actual = recursion_grid_means(model, ["x3"], cells, md.column_indices)
+
+    np.testing.assert_allclose(actual, expected, atol=0.1)
+
+    features = ["x1", "x3"]
+    cells = [
+        (x1, x3)
+        for x1 in md.feature_info["x1"]["values"]
+        for x3 in md.feature_info["x3"]["values"]
+    ]
+
+    together = recursion_grid_means(model, features, cells, md.column_indices)
+    monkeypatch.setattr(recursion, "_MAX_GRID_SIZE", 0)
+    one_at_a_time = recursion_grid_means(model, features, cells, md.column_indices)
+
+    np.testing.assert_allclose(one_at_a_time, together)
+
+
+def test_recursion_falls_back_to_brute(monkeypatch, df, predict, pd_kwargs):
+    """without custom grid values in scikit-learn, the PDPs are predicted"""
+    monkeypatch.setattr(recursion, "_HAS_CUSTOM_VALUES", False)
+    model = GradientBoostingRegressor(n_estimators=5, random_state=0)
+    model.fit(df, predict(df))
+    kwargs = pd_kwargs(df, predict=model.predict)
+
+    with pytest.warns(UserWarning, match="brute force"):
+        actual = partial_dependence(pdp_method="recursion", **kwargs)
+
+    expected = partial_dependence(**kwargs)
+
+    for results in [actual, expected]:
+        results.pop("timings")
+        results["params"].pop("pdp_method")
+
+    assert actual == expected
@@ -0,0 +1,92 @@
+"""Unit tests for the binary results format."""
+
+import json
+
+import numpy as np
+import pytest
+
+from pdpilot import PDPilotWidget, partial_dependence
+from pdpilot.results_file import (
+    MIN_ARRAY_SIZE,
+    arrays_to_lists,
+    read_results,
+    write_results,
+)
+
+
+def _assert_results_close(actual, expected):
+    if isinstance(expected, dict):
+        assert actual.keys() == expected.keys()
+        for key in expected:
+            _assert_results_close(actual[key], expected[key])
+    elif isinstance(expected, (list, tuple)) and any(
+        isinstance(x, (dict, list, tuple, str)) for x in expected
+    ):
+        assert len(actual) == len(expected)
+        for a, e in zip(actual, expected):
+            _assert_results_close(a, e)
+    elif isinstance(expected, (list, tuple, float)):
+        np.testing.assert_allclose(actual, expected, rtol=1e-6, atol=1e-6)
+    else:
+        assert actual == expected
+
+
+def test_binary_results_round_trip(tmp_path, df, pd_kwargs):
+    """reading the binary results gives the results that were written"""
+    results = partial_dependence(**pd_kwargs(df))
+
+    path = tmp_path / "results"
+    write_results(results, path)
+
+    loaded = read_results(path)
+
+    # the ICE lines are memory-mapped arrays
+    assert isinstance(loaded["feature_to_ice_lines"]["x1"], np.memmap)
+
+    expected = json.loads(json.dumps(results))
+    expected["feature_info"] = results["feature_info"]
+
+    _assert_results_close(arrays_to_lists(loaded), expected)
+
+    # writing again replaces the previous results
+    write_results(results, path)
+    _assert_results_close(arrays_to_lists(read_results(path)), expected)
+
+
+def test_grid_values_match_axes(tmp_path, df, pd_kwargs):
+    """the values of two-way PDPs equal the values of their axes after reading
+    the binary results"""
+    results = partial_dependence(**pd_kwargs(df, resolution=20))
+    write_results(results, tmp_path / "results")
+    loaded = arrays_to_lists(read_results(tmp_path / "results"))
+
+    # the values of at least one PDP are stored in an array
+    assert any(
+        len(pdp["x_values"]) >= MIN_ARRAY_SIZE for pdp in loaded["two_way_pds"]
+    )
+
+    for pdp in loaded["two_way_pds"]:
+        assert set(pdp["x_values"]) <= set(pdp["x_axis"])
+        assert set(pdp["y_values"]) <= set(pdp["y_axis"])
+
+
+def test_write_results_does_not_overwrite_other_files(tmp_path):
+    """results are not written to a directory that contains other files"""
+    (tmp_path / "other.txt").write_text("other")
+
+    with pytest.raises(OSError):
+        write_results({"feature_info": {}}, tmp_path)
+
+
+def test_widget_reads_binary_results(tmp_path, df, predict, pd_kwargs):
+    """the widget can be created from a directory of binary results"""
+    path = tmp_path / "results"
+
+    partial_dependence(**pd_kwargs(df, output_path=str(path), output_format="binary"))
+
+    widget = PDPilotWidget(
+        predict=predict, df=df, labels=np.zeros(df.shape[0]), pd_data=path
+    )
+
+    assert widget.num_instances == df.shape[0]
+    assert len(widget.feature_to_ice_lines["x1"]) == df.shape[0]
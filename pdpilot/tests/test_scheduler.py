@@ -0,0 +1,63 @@
+"""Unit tests for scheduling PDP tasks."""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from pdpilot import partial_dependence
+from pdpilot.scheduler import TaskScheduler
+
+
+def _identity(value):
+    return value
+
+
+def test_scheduler_runs_longest_tasks_first():
+    """tasks start in order of cost, including tasks added while running"""
+    scheduler = TaskScheduler()
+
+    for key, cost in [("a", 1), ("b", 3), ("c", 2)]:
+        scheduler.submit(key, cost, _identity, {"value": key})
+
+    order = []
+
+    for key, result in scheduler.as_completed():
+        assert key == result
+        order.append(key)
+
+        if key == "b":
+            scheduler.submit("d", 10, _identity, {"value": "d"})
+
+    assert order == ["b", "d", "c", "a"]
+    assert [timing["key"] for timing in scheduler.timings] == order
+    assert all(timing["seconds"] >= 0 for timing in scheduler.timings)
+
+
+def test_scheduler_runs_on_executor():
+    """every task runs once on the executor"""
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        scheduler = TaskScheduler(executor=executor, max_workers=2)
+
+        for i in range(10):
+            scheduler.submit(i, i, _identity, {"value": i * 2})
+
+        results = dict(scheduler.as_completed())
+
+    assert results == {i: i * 2 for i in range(10)}
+    assert sorted(timing["cost"] for timing in scheduler.timings) == list(range(10))
+
+
+def test_partial_dependence_on_executor(tmp_path, make_data, pd_kwargs):
+    """running the tasks on an executor gives the same results"""
+    kwargs = pd_kwargs(make_data(200))
+
+    expected = partial_dependence(n_jobs=1, **kwargs)
+
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        actual = partial_dependence(
+            n_jobs=2, executor=executor, shared_data_dir=tmp_path, **kwargs
+        )
+
+    assert len(actual.pop("timings")) == len(expected.pop("timings"))
+    assert actual == expected
+
+    # the dataset's file is deleted
+    assert not any(tmp_path.iterdir())
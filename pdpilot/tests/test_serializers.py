@@ -0,0 +1,63 @@
+"""Unit tests for the widget's binary serializers."""
+
+import numpy as np
+from ipywidgets.widgets.widget import _put_buffers, _remove_buffers
+
+from pdpilot import partial_dependence
+from pdpilot.serializers import arrays_from_json, arrays_to_json
+
+
+def test_arrays_round_trip_through_buffers():
+    """numeric lists are sent as buffers and decoded back into lists"""
+    rng = np.random.default_rng(seed=5)
+    value = {
+        "ice_lines": rng.uniform(size=(100, 5)).tolist(),
+        "indices": list(range(100)),
+        "big_ints": [2**40] * 100,
+        "names": ["a"] * 100,
+        "small": [0.5, 1.5],
+        "pds": [{"mean_predictions": rng.uniform(size=(100,)).tolist()}],
+    }
+
+    state, buffer_paths, buffers = _remove_buffers(
+        {"value": arrays_to_json(value, None)}
+    )
+
+    assert len(buffers) == 4
+    assert state["value"]["ice_lines"]["__ndarray__"] == "float32"
+    assert state["value"]["indices"]["__ndarray__"] == "int32"
+    assert state["value"]["big_ints"]["__ndarray__"] == "float64"
+    assert state["value"]["names"] == value["names"]
+    assert state["value"]["small"] == value["small"]
+
+    _put_buffers(state, buffer_paths, buffers)
+    decoded = arrays_from_json(state["value"], None)
+
+    np.testing.assert_allclose(decoded["ice_lines"], value["ice_lines"], rtol=1e-6)
+    np.testing.assert_allclose(
+        decoded["pds"][0]["mean_predictions"],
+        value["pds"][0]["mean_predictions"],
+        rtol=1e-6,
+    )
+    assert decoded["indices"] == value["indices"]
+    assert decoded["big_ints"] == value["big_ints"]
+    assert decoded["names"] == value["names"]
+
+
+def test_grid_values_match_axes(df, pd_kwargs):
+    """the values of two-way PDPs equal the values of their axes after they
+    are sent as buffers"""
+    two_way_pds = partial_dependence(**pd_kwargs(df, resolution=20))["two_way_pds"]
+
+    state, buffer_paths, buffers = _remove_buffers(
+        {"value": arrays_to_json(two_way_pds, None)}
+    )
+
+    assert any("__ndarray__" in pdp["x_values"] for pdp in state["value"])
+
+    _put_buffers(state, buffer_paths, buffers)
+    decoded = arrays_from_json(state["value"], None)
+
+    for pdp in decoded:
+        assert set(pdp["x_values"]) <= set(pdp["x_axis"])
+        assert set(pdp["y_values"]) <= set(pdp["y_axis"])
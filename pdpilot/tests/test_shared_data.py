@@ -0,0 +1,89 @@
+"""Unit tests for sharing the dataset with workers."""
+
+import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from pdpilot.shared_data import SharedDataset, ThreadLocalDataset
+
+
+def test_attach_array_is_read_only():
+    """workers get a read-only memory map of the array"""
+    df = pd.DataFrame({"x1": [1.0, 2.0, 3.0], "x2": [4.0, 5.0, 6.0]})
+    shared = SharedDataset(df.to_numpy(), df, md=None)
+
+    # attach to a copy that went through pickling, as a worker would
+    data, data_copy, _ = pickle.loads(pickle.dumps(shared)).attach()
+
+    np.testing.assert_array_equal(data, df.to_numpy())
+    assert not data.flags.writeable
+    pd.testing.assert_frame_equal(data_copy, df)
+
+    shared.close()
+    assert not shared.directory.exists()
+
+
+def test_attach_dataframe_is_private_copy():
+    """workers can modify their DataFrame without changing the original"""
+    df = pd.DataFrame({"x1": [1.0, 2.0, 3.0]})
+
+    shared = SharedDataset(df.copy(), df.copy(), md=None)
+    data, data_copy, _ = shared.attach()
+    data["x1"] = 0.0
+
+    pd.testing.assert_frame_equal(data_copy, df)
+
+    shared.close()
+
+
+def test_threads_get_own_copies():
+    """each thread perturbs its own copy of the dataset"""
+    df = pd.DataFrame({"x1": [1.0, 2.0, 3.0]})
+    shared = ThreadLocalDataset(df.to_numpy(), df, md=None)
+
+    # make both tasks run at the same time, on different threads
+    barrier = threading.Barrier(2)
+
+    def attach(_):
+        barrier.wait()
+        return shared.attach()[0]
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        first, second = executor.map(attach, range(2))
+
+    assert first is not second
+    assert first is not shared.data
+    np.testing.assert_array_equal(first, df.to_numpy())
+
+    # a thread reuses its copy
+    assert shared.attach()[0] is shared.attach()[0]
+
+
+def test_workers_keep_two_datasets():
+    """a worker that alternates between two datasets loads each one once"""
+    df = pd.DataFrame({"x1": [1.0, 2.0, 3.0]})
+    shared_full = SharedDataset(df.to_numpy(), df, md=None)
+    shared_sample = SharedDataset(df.to_numpy()[:2], df.iloc[:2], md=None)
+
+    # attached through copies that went through pickling, as a worker would
+    full = pickle.loads(pickle.dumps(shared_full))
+    sample = pickle.loads(pickle.dumps(shared_sample))
+
+    full_data = full.attach()[0]
+    sample_data = sample.attach()[0]
+
+    assert full.attach()[0] is full_data
+    assert sample.attach()[0] is sample_data
+
+    # a third dataset replaces the least recently used one
+    other = SharedDataset(df.to_numpy(), df, md=None)
+    other.attach()
+
+    assert sample.attach()[0] is sample_data
+    assert full.attach()[0] is not full_data
+
+    for shared in [shared_full, shared_sample, other]:
+        shared.close()
@@ -0,0 +1,127 @@
+"""Unit tests for out-of-core partial dependence."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pdpilot import partial_dependence, partial_dependence_streaming
+
+
+def test_streaming_matches_in_memory(tmp_path, make_data, predict):
+    """chunked computation over a sample gives the PDPs of the full dataset"""
+    df = make_data(300)
+
+    def source():
+        for start in range(0, df.shape[0], 70):
+            yield df.iloc[start : start + 70]
+
+    # the sample contains every row, so the metadata is the same
+    results = partial_dependence_streaming(
+        predict=predict,
+        source=source,
+        features=list(df.columns),
+        output_dir=tmp_path,
+        sample_size=df.shape[0],
+        seed=1,
+        logging_level="WARNING",
+    )
+
+    expected = partial_dependence(
+        predict=predict,
+        df=df,
+        features=list(df.columns),
+        n_jobs=1,
+        seed=1,
+        logging_level="WARNING",
+    )
+
+    assert results["num_rows"] == df.shape[0]
+    assert results["row_indices"] == list(range(df.shape[0]))
+
+    for actual_pd, expected_pd in zip(
+        sorted(results["one_way_pds"], key=lambda p: p["x_feature"]),
+        sorted(expected["one_way_pds"], key=lambda p: p["x_feature"]),
+    ):
+        np.testing.assert_allclose(
+            actual_pd["mean_predictions"], expected_pd["mean_predictions"]
+        )
+        np.testing.assert_allclose(actual_pd["deviation"], expected_pd["deviation"])
+
+    for feature, path in results["ice_paths"].items():
+        ice = np.load(path)
+        assert ice.shape[0] == df.shape[0]
+        np.testing.assert_allclose(
+            ice.mean(axis=0),
+            next(
+                p["mean_predictions"]
+                for p in expected["one_way_pds"]
+                if p["x_feature"] == feature
+            ),
+        )
+
+    # the clusters, and so the pairs of interacting features, can differ
+    # since the features are given different seeds
+    actual_two_way = {
+        (p["x_feature"], p["y_feature"]): p for p in results["two_way_pds"]
+    }
+    expected_two_way = {
+        (p["x_feature"], p["y_feature"]): p for p in expected["two_way_pds"]
+    }
+    pairs = actual_two_way.keys() & expected_two_way.keys()
+
+    assert pairs
+
+    for pair in pairs:
+        np.testing.assert_allclose(
+            actual_two_way[pair]["mean_predictions"],
+            expected_two_way[pair]["mean_predictions"],
+        )
+        np.testing.assert_allclose(
+            actual_two_way[pair]["H"], expected_two_way[pair]["H"]
+        )
+
+
+def test_streaming_sample_is_bounded(tmp_path, make_data, predict):
+    """only sample_size rows are kept in memory and shown in the widget"""
+    df = make_data(300)
+
+    results = partial_dependence_streaming(
+        predict=predict,
+        source=lambda: (df.iloc[start : start + 50] for start in range(0, 300, 50)),
+        features=list(df.columns),
+        output_dir=tmp_path,
+        sample_size=40,
+        seed=1,
+        logging_level="WARNING",
+    )
+
+    assert results["num_instances"] == 40
+    assert len(results["row_indices"]) == 40
+    assert len(set(results["row_indices"])) == 40
+    assert pd.read_pickle(results["sample_path"]).shape[0] == 40
+    assert all(len(lines) == 40 for lines in results["feature_to_ice_lines"].values())
+
+
+@pytest.mark.parametrize("source", ["no_chunks", "empty_chunk", "csv"])
+def test_empty_source_is_rejected(tmp_path, df, predict, source):
+    """a source without any rows raises a clear error"""
+
+    def no_chunks():
+        return iter([])
+
+    def empty_chunk():
+        yield df.iloc[:0]
+
+    csv_path = tmp_path / "empty.csv"
+    df.iloc[:0].to_csv(csv_path, index=False)
+
+    sources = {"no_chunks": no_chunks, "empty_chunk": empty_chunk, "csv": csv_path}
+
+    with pytest.raises(ValueError, match="does not contain any rows"):
+        partial_dependence_streaming(
+            predict=predict,
+            source=sources[source],
+            features=list(df.columns),
+            output_dir=tmp_path / "output",
+            logging_level="WARNING",
+        )
@@ -0,0 +1,98 @@
+"""Unit tests for the widget."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pdpilot import PDPilotWidget, partial_dependence
+from pdpilot.serializers import decode_array
+
+
+def _make_widget(**kwargs):
+    rng = np.random.default_rng(seed=4)
+    df = pd.DataFrame(
+        {
+            "x1": rng.uniform(low=-1, high=1, size=(100,)),
+            "x2": rng.uniform(low=-1, high=1, size=(100,)),
+            "x3": rng.uniform(low=-1, high=1, size=(100,)),
+        }
+    )
+
+    def predict(df):
+        return (df["x1"] * df["x2"] + df["x3"]).to_numpy()
+
+    pd_data = partial_dependence(
+        predict=predict,
+        df=df,
+        features=list(df.columns),
+        seed=1,
+        logging_level="WARNING",
+    )
+
+    widget = PDPilotWidget(
+        predict=predict, df=df, labels=np.zeros(100), pd_data=pd_data, **kwargs
+    )
+
+    return widget, pd_data
+
+
+def test_lazy_ice_lines_are_sent_on_request():
+    """with lazy loading, ICE lines are only sent when they are requested"""
+    widget, pd_data = _make_widget(lazy_ice_lines=True)
+    # a cache smaller than the number of features, to test eviction
+    widget.ice_cache_size = 2
+
+    sent = []
+    widget.send = lambda content, buffers: sent.append((content, buffers))
+
+    assert widget.feature_to_ice_lines == {}
+
+    for feature in ["x1", "x2", "x3", "x1"]:
+        widget._handle_custom_msg(
+            widget, {"type": "request_ice_lines", "feature": feature}, []
+        )
+
+    assert [content["feature"] for content, _ in sent] == ["x1", "x2", "x3", "x1"]
+
+    content, buffers = sent[0]
+    np.testing.assert_allclose(
+        decode_array(content["ice_lines"], buffers[0]),
+        pd_data["feature_to_ice_lines"]["x1"],
+        rtol=1e-6,
+    )
+
+    # only the most recently requested features are kept
+    assert list(widget._ice_lines_cache.keys()) == ["x3", "x1"]
+
+
+def test_ice_cache_must_fit_the_shown_plots():
+    """the ICE lines cache must fit all of the plots that are shown at once"""
+    with pytest.raises(ValueError, match="ice_cache_size"):
+        _make_widget(lazy_ice_lines=True, ice_cache_size=12)
+
+    widget, _ = _make_widget(lazy_ice_lines=True, ice_cache_size=14)
+    assert widget.ice_cache_size == 14
+
+
+def test_eager_ice_lines_are_synced():
+    """without lazy loading, all ICE lines are synced"""
+    widget, pd_data = _make_widget()
+
+    assert widget.feature_to_ice_lines == pd_data["feature_to_ice_lines"]
+
+
+def test_two_way_pdp_in_threads():
+    """splitting a requested two-way PDP among threads gives the same PDP"""
+    results = []
+
+    for n_jobs in [1, 3]:
+        widget, _ = _make_widget(n_jobs=n_jobs)
+        widget.two_way_pds = []
+        widget.two_way_to_calculate = ["x1", "x2"]
+        results.append(widget.two_way_pds[0])
+
+    expected, actual = results
+
+    assert actual["id"] == expected["id"]
+    np.testing.assert_allclose(actual["mean_predictions"], expected["mean_predictions"])
+    np.testing.assert_allclose(actual["interactions"], expected["interactions"])
@@ -8,6 +8,7 @@ PDPilot widget module.
 import copy
 import json
 import math
+from collections import OrderedDict
 from pathlib import Path
 from typing import Callable, List, Union
 
@@ -15,26 +16,48 @@ import numpy as np
 import pandas as pd
 from ipywidgets import DOMWidget
 from numpy.random import MT19937, RandomState, SeedSequence
-from traitlets import Dict, Float, Int, Unicode, observe
+from traitlets import Bool, Dict, Float, Int, Unicode, observe
 from traitlets import List as ListTraitlet
 
 from pdpilot._frontend import module_name, module_version
-from pdpilot.pdp import _calc_two_way_pd, _get_clusters_info, _get_feature_to_pd
+from pdpilot.explanation import ClusterExplainer
+from pdpilot.metadata import get_column_indices
+from pdpilot.pdp import (
+    _calc_two_way_means_in_threads,
+    _calc_two_way_pd,
+    _get_clusters_info,
+    _get_feature_to_pd,
+)
+from pdpilot.recursion import get_recursion_model
+from pdpilot.results_file import arrays_to_lists, is_results_dir, read_results
+from pdpilot.serializers import array_serialization, encode_array
 from pdpilot.utils import convert_keys_to_ints
 
+# the grid shows up to 12 one-way plots per page and the detailed plot shows up
+# to 2 more. they are all mounted at once, so the ICE lines for all of them must
+# fit in the cache or the plots keep evicting and requesting each other's lines.
+MIN_ICE_CACHE_SIZE = 14
+
 
 class PDPilotWidget(DOMWidget):
     """This class creates the interactive widget.
 
     :param predict: A function whose input is a DataFrame of instances and
-        returns the model's predictions on those instances.
-    :type predict: Callable[[pd.DataFrame], list[float]]
+        returns the model's predictions on those instances. If ``pd_data`` was
+        computed with ``predict_input="numpy"``, then the input is a 2-D array.
+    :type predict: Callable[[pd.DataFrame | np.ndarray], list[float]]
     :param df: Instances to use to compute the PDPs and ICE plots.
     :type df: pd.DataFrame
     :param labels: Ground truth labels for the instances in ``df``.
+        If ``pd_data`` was computed with ``progressive_tolerance`` or
+        :func:`pdpilot.partial_dependence_streaming`, then ``df`` and ``labels``
+        can be the whole dataset, in which case they are subset to the rows in
+        its ``row_indices``, or already contain only those rows.
     :type labels: list[float] | list[int] | np.ndarray | pd.Series
     :param pd_data: The dictionary returned by :func:`pdpilot.pdp.partial_dependence`
-        or a path to the file containing that data.
+        or a path to the file containing that data. The path can also be a
+        directory written with ``output_format="binary"``, whose arrays are
+        memory-mapped when they are read.
     :type pd_data: dict | str | Path
     :param seed:  Random state for clustering. Defaults to None.
     :type seed: int | None, optional
@@ -50,7 +73,23 @@ class PDPilotWidget(DOMWidget):
         the visualizations being updated less frequently when a brush is moved.
         Defaults to 100.
     :type brush_throttle_duration: float, optional
+    :param lazy_ice_lines: If True, the ICE lines are kept in Python and only
+        sent to the frontend for a feature when one of its plots is shown. This
+        makes the widget faster to load for datasets with many features or
+        instances. Defaults to False.
+    :type lazy_ice_lines: bool, optional
+    :param ice_cache_size: When ``lazy_ice_lines`` is True, the number of
+        features to keep the ICE lines for, both in the frontend and in the
+        buffers prepared to send to it. Must be at least 14, the number of
+        one-way plots that can be shown at once. Defaults to 32.
+    :type ice_cache_size: int, optional
+    :param n_jobs: The number of threads to use to compute the two-way PDPs that
+        are requested in the widget. Each thread perturbs its own copy of the
+        dataset, so this is most useful for models that release the GIL.
+        Defaults to 1.
+    :type n_jobs: int, optional
     :raises OSError: Raised if ``pd_data`` is a str or Path and the file cannot be read.
+    :raises ValueError: Raised if ``ice_cache_size`` is less than 14.
     """
 
     _model_name = Unicode("PDPilotModel").tag(sync=True)
@@ -65,13 +104,13 @@ class PDPilotWidget(DOMWidget):
     feature_names = ListTraitlet([]).tag(sync=True)
     feature_info = Dict({}).tag(sync=True)
 
-    dataset = Dict({}).tag(sync=True)
+    dataset = Dict({}).tag(sync=True, **array_serialization)
 
-    labels = ListTraitlet([]).tag(sync=True)
+    labels = ListTraitlet([]).tag(sync=True, **array_serialization)
 
     num_instances = Int(0).tag(sync=True)
 
-    one_way_pds = ListTraitlet([]).tag(sync=True)
+    one_way_pds = ListTraitlet([]).tag(sync=True, **array_serialization)
     """
     The ice lines are a lot of data, so we want to limit how often we have to
     transfer them between the backend and frontend. If they were a part of
@@ -79,9 +118,14 @@ class PDPilotWidget(DOMWidget):
     adjusted in the detailed plot view. By separating them out, adjusting
     the clusters becomes faster and won't run into the "message too big"
     errors with tornado.
+
+    When lazy_ice_lines is True, this is empty. The frontend instead requests
+    the lines for one feature at a time with a custom message.
     """
-    feature_to_ice_lines = Dict({}).tag(sync=True)
-    two_way_pds = ListTraitlet([]).tag(sync=True)
+    feature_to_ice_lines = Dict({}).tag(sync=True, **array_serialization)
+    lazy_ice_lines = Bool(False).tag(sync=True)
+    ice_cache_size = Int(32).tag(sync=True)
+    two_way_pds = ListTraitlet([]).tag(sync=True, **array_serialization)
 
     two_way_pdp_extent = ListTraitlet([0, 0]).tag(sync=True)
     two_way_interaction_extent = ListTraitlet([0, 0]).tag(sync=True)
@@ -103,7 +147,7 @@ class PDPilotWidget(DOMWidget):
 
     def __init__(
         self,
-        predict: Callable[[pd.DataFrame], List[float]],
+        predict: Callable[[Union[pd.DataFrame, np.ndarray]], List[float]],
         df: pd.DataFrame,
         labels: Union[List[float], List[int], np.ndarray, pd.Series],
         pd_data: Union[str, Path, dict],
@@ -111,10 +155,19 @@ class PDPilotWidget(DOMWidget):
         height: int = 600,
         opacity: float = 0.2,
         brush_throttle_duration: int = 100,
+        lazy_ice_lines: bool = False,
+        ice_cache_size: int = 32,
+        n_jobs: int = 1,
         **kwargs,
     ):
         super().__init__(**kwargs)
 
+        if ice_cache_size < MIN_ICE_CACHE_SIZE:
+            raise ValueError(
+                f"ice_cache_size must be at least {MIN_ICE_CACHE_SIZE}, the number "
+                "of one-way plots that can be shown at once."
+            )
+
         # if pd_data is a path or string, then read the file at that path
         if isinstance(pd_data, Path) or isinstance(pd_data, str):
             path = Path(pd_data).resolve()
@@ -122,14 +175,27 @@ class PDPilotWidget(DOMWidget):
             if not path.exists():
                 raise OSError(f"Cannot read {path}")
 
-            json_data = path.read_text(encoding="utf-8")
-            pd_data = json.loads(json_data)
-
-            # In JSON, object keys are all strings. Here, we convert
-            # ints back to ints.
-            for info in pd_data["feature_info"].values():
-                if "value_map" in info:
-                    info["value_map"] = convert_keys_to_ints(info["value_map"])
+            if is_results_dir(path):
+                pd_data = read_results(path)
+                # the synced traitlets are sent to the frontend as JSON.
+                # the ICE lines stay memory-mapped until they are needed.
+                feature_to_ice_lines = pd_data.pop("feature_to_ice_lines")
+                pd_data = arrays_to_lists(pd_data)
+                pd_data["feature_to_ice_lines"] = feature_to_ice_lines
+            else:
+                json_data = path.read_text(encoding="utf-8")
+                pd_data = json.loads(json_data)
+
+                # In JSON, object keys are all strings. Here, we convert
+                # ints back to ints.
+                for info in pd_data["feature_info"].values():
+                    if "value_map" in info:
+                        info["value_map"] = convert_keys_to_ints(info["value_map"])
+
+        # PDPs that were estimated progressively only use some of the rows
+        if "row_indices" in pd_data and df.shape[0] != len(pd_data["row_indices"]):
+            df = df.iloc[pd_data["row_indices"]].reset_index(drop=True)
+            labels = np.asarray(labels)[pd_data["row_indices"]]
 
         # synced widget state
 
@@ -141,7 +207,13 @@ class PDPilotWidget(DOMWidget):
         self.num_instances = pd_data["num_instances"]
 
         self.one_way_pds = pd_data["one_way_pds"]
-        self.feature_to_ice_lines = pd_data["feature_to_ice_lines"]
+
+        self.lazy_ice_lines = lazy_ice_lines
+        self.ice_cache_size = ice_cache_size
+
+        if not lazy_ice_lines:
+            self.feature_to_ice_lines = arrays_to_lists(pd_data["feature_to_ice_lines"])
+
         self.two_way_pds = pd_data["two_way_pds"]
 
         self.two_way_pdp_extent = pd_data["two_way_pdp_extent"]
@@ -163,16 +235,44 @@ class PDPilotWidget(DOMWidget):
         # not synced
         self.df = df
         self.predict = predict
+        self.n_jobs = n_jobs
         # TODO: should this be recalculated after any changes to one_way_pds?
         self.feature_to_pd = _get_feature_to_pd(self.one_way_pds)
         self.one_hot_encoded_col_name_to_feature = pd_data[
             "one_hot_encoded_col_name_to_feature"
         ]
         self.params = pd_data["params"]
+        # the ICE lines for each feature, as lists or memory-mapped arrays
+        self._all_ice_lines = pd_data["feature_to_ice_lines"]
+        # feature to encoded ICE lines, least recently requested first
+        self._ice_lines_cache = OrderedDict()
+
+        self.on_msg(self._handle_custom_msg)
 
         seed_sequence = SeedSequence(seed)
         self.random_state = RandomState(MT19937(seed_sequence))
 
+    def _handle_custom_msg(self, widget, content, buffers):
+        if content.get("type") == "request_ice_lines":
+            feature = content["feature"]
+            header, buffer = self._get_encoded_ice_lines(feature)
+            self.send(
+                {"type": "ice_lines", "feature": feature, "ice_lines": header},
+                [buffer],
+            )
+
+    def _get_encoded_ice_lines(self, feature):
+        if feature in self._ice_lines_cache:
+            self._ice_lines_cache.move_to_end(feature)
+        else:
+            self._ice_lines_cache[feature] = encode_array(
+                np.asarray(self._all_ice_lines[feature])
+            )
+            if len(self._ice_lines_cache) > self.ice_cache_size:
+                self._ice_lines_cache.popitem(last=False)
+
+        return self._ice_lines_cache[feature]
+
     @observe("two_way_to_calculate")
     def _on_two_way_to_calculate_change(self, change):
         pair = change["new"]
@@ -186,13 +286,47 @@ class PDPilotWidget(DOMWidget):
             ):
                 return
 
+        if self.params.get("pdp_method", "brute") == "recursion":
+            recursion_model = get_recursion_model(self.predict)
+        else:
+            recursion_model = None
+
+        if self.params.get("predict_input", "dataframe") == "numpy":
+            data = self.df.to_numpy(copy=True)
+            column_indices = get_column_indices(self.df.columns, self.feature_info)
+        else:
+            data = self.df.copy()
+            column_indices = (
+                get_column_indices(self.df.columns, self.feature_info)
+                if recursion_model is not None
+                else None
+            )
+
+        if self.n_jobs != 1 and recursion_model is None:
+            mean_predictions = _calc_two_way_means_in_threads(
+                predict=self.predict,
+                data=data,
+                data_copy=self.df,
+                pair=pair,
+                feature_info=self.feature_info,
+                n_jobs=self.n_jobs,
+                batch_size=self.params.get("batch_size"),
+                column_indices=column_indices,
+            )
+        else:
+            mean_predictions = None
+
         result = _calc_two_way_pd(
             self.predict,
-            self.df.copy(),
+            data,
             self.df.copy(),
             pair,
             self.feature_info,
             self.feature_to_pd,
+            batch_size=self.params.get("batch_size"),
+            column_indices=column_indices,
+            mean_predictions=mean_predictions,
+            recursion_model=recursion_model,
         )
 
         # update the extents
@@ -235,7 +369,7 @@ class PDPilotWidget(DOMWidget):
         owp = copy.deepcopy(owp)
         ice = owp["ice"]
 
-        ice_lines = np.array(self.feature_to_ice_lines[feature])
+        ice_lines = np.array(self._all_ice_lines[feature])
         centered_ice_lines = ice_lines - ice_lines[:, 0].reshape(-1, 1)
         centered_pdp = np.array(ice["centered_pdp"])
 
@@ -288,10 +422,15 @@ class PDPilotWidget(DOMWidget):
             n_clusters=new_num_clusters,
             centered_ice_lines=centered_ice_lines,
             centered_pdp=centered_pdp,
-            data=self.df,
-            one_hot_encoded_col_name_to_feature=self.one_hot_encoded_col_name_to_feature,
-            decision_tree_params=self.params["decision_tree_params"],
-            random_state=self.random_state,
+            explainer=ClusterExplainer(
+                data=self.df,
+                one_hot_encoded_col_name_to_feature=self.one_hot_encoded_col_name_to_feature,
+                decision_tree_params=self.params["decision_tree_params"],
+                random_state=self.random_state,
+                method=self.params.get("explanation_method", "one_vs_rest"),
+                sample_size=self.params.get("explanation_sample_size"),
+                max_bins=self.params.get("explanation_max_bins"),
+            ),
         )
 
         ice["num_clusters"] = new_num_clusters
@@ -434,6 +434,11 @@ export function drawICELines(
   strokeStyle: string,
   globalAlpha: number
 ) {
+  // the lines have not been loaded yet
+  if (iceLines.length === 0) {
+    return;
+  }
+
   ctx.lineWidth = lineWidth;
   ctx.strokeStyle = strokeStyle;
   ctx.globalAlpha = globalAlpha;
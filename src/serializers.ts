@@ -0,0 +1,113 @@
+/**
+ * Decodes the numeric arrays that are sent from Python as binary buffers.
+ * See pdpilot/serializers.py.
+ */
+
+type ArrayHeader = {
+  __ndarray__: 'float32' | 'float64' | 'int32' | 'bool';
+  shape: number[];
+};
+
+type EncodedArray = ArrayHeader & { buffer: DataView | ArrayBuffer };
+
+function isEncodedArray(value: unknown): value is EncodedArray {
+  return (
+    typeof value === 'object' &&
+    value !== null &&
+    '__ndarray__' in value &&
+    'buffer' in value
+  );
+}
+
+/**
+ * Gets the values of a buffer as a typed array.
+ * @param dtype the type of the values
+ * @param buffer the buffer containing the values
+ * @returns typed array of the values
+ */
+function toTypedArray(
+  dtype: ArrayHeader['__ndarray__'],
+  buffer: DataView | ArrayBuffer
+): Float32Array | Float64Array | Int32Array | Uint8Array {
+  // copy the bytes so that the typed array is aligned
+  const bytes =
+    buffer instanceof DataView
+      ? buffer.buffer.slice(
+          buffer.byteOffset,
+          buffer.byteOffset + buffer.byteLength
+        )
+      : buffer;
+
+  switch (dtype) {
+    case 'float32':
+      return new Float32Array(bytes);
+    case 'float64':
+      return new Float64Array(bytes);
+    case 'int32':
+      return new Int32Array(bytes);
+    case 'bool':
+      return new Uint8Array(bytes);
+  }
+}
+
+/**
+ * Turns an encoded array back into nested arrays of numbers.
+ * @param header the dtype and shape of the array
+ * @param buffer the buffer containing the values
+ * @returns array with the given shape
+ */
+function decodeArray(
+  header: ArrayHeader,
+  buffer: DataView | ArrayBuffer
+): unknown[] {
+  const typed = toTypedArray(header.__ndarray__, buffer);
+  const values: (number | boolean)[] =
+    header.__ndarray__ === 'bool'
+      ? Array.from(typed, (d) => d !== 0)
+      : Array.from(typed);
+
+  const shape = header.shape;
+
+  if (shape.length <= 1) {
+    return values;
+  }
+
+  // split the flat values into rows, starting from the innermost dimension
+  let nested: unknown[] = values;
+  for (let dim = shape.length - 1; dim > 0; dim--) {
+    const size = shape[dim];
+    const rows: unknown[] = [];
+    for (let i = 0; i < nested.length; i += size) {
+      rows.push(nested.slice(i, i + size));
+    }
+    nested = rows;
+  }
+
+  return nested;
+}
+
+/**
+ * Recursively replaces the encoded arrays in a value from Python.
+ * @param value a traitlet's value
+ * @returns the value with arrays of numbers in place of the buffers
+ */
+function deserializeArrays(value: unknown): unknown {
+  if (isEncodedArray(value)) {
+    return decodeArray(value, value.buffer);
+  }
+
+  if (Array.isArray(value)) {
+    return value.map(deserializeArrays);
+  }
+
+  if (typeof value === 'object' && value !== null) {
+    return Object.fromEntries(
+      Object.entries(value).map(([key, val]) => [key, deserializeArrays(val)])
+    );
+  }
+
+  return value;
+}
+
+export { decodeArray, deserializeArrays };
+export type { ArrayHeader };
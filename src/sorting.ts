@@ -79,6 +79,12 @@ const singlePDPSortingOptions: PDSortingOption[] = [
       const scores = Object.fromEntries(
         data.map((pd) => {
           const allIceLines = featureToIceLines[pd.x_feature];
+
+          // with lazy loading, only some features have their lines loaded
+          if (!allIceLines) {
+            return [pd.x_feature, -Infinity];
+          }
+
           const standardIceLines = indices.map((i) => allIceLines[i]);
           const highlightedLines = centerIceLines(standardIceLines);
           const highlightedCenter = transpose<number>(highlightedLines).map(
@@ -18,6 +18,8 @@ import { scaleSequential, scaleDiverging } from 'd3-scale';
 import type { ScaleSequential, ScaleDiverging } from 'd3-scale';
 import { interpolateYlGnBu, interpolateBrBG } from 'd3-scale-chromatic';
 import { getHighlightedBins, getNiceDomain } from './vis-utils';
+import { decodeArray } from './serializers';
+import type { ArrayHeader } from './serializers';
 
 /**
  *
@@ -67,6 +69,76 @@ function createSyncedStore<T>(
   };
 }
 
+/**
+ * Creates a store of ICE lines that are requested from Python one feature at
+ * a time, rather than synced all at once. The most recently requested features
+ * are kept, up to the given capacity.
+ * @param model backbone model containing state synced between Python and JS
+ * @param capacity maximum number of features to keep the ICE lines for
+ * @returns the store and a function to request the ICE lines for a feature
+ */
+function createLazyIceLinesStore(
+  model: DOMWidgetModel,
+  capacity: number
+): {
+  store: Readable<Record<string, number[][]>>;
+  request: (feature: string) => void;
+} {
+  const store: Writable<Record<string, number[][]>> = writable({});
+  // least recently requested first
+  const order: string[] = [];
+  const pending = new Set<string>();
+
+  function touch(feature: string) {
+    const i = order.indexOf(feature);
+    if (i !== -1) {
+      order.splice(i, 1);
+    }
+    order.push(feature);
+  }
+
+  model.on(
+    'msg:custom',
+    (
+      content: { type: string; feature: string; ice_lines: ArrayHeader },
+      buffers: (DataView | ArrayBuffer)[]
+    ) => {
+      if (content.type !== 'ice_lines') {
+        return;
+      }
+
+      // the lines are sent as a binary buffer
+      const iceLines = decodeArray(
+        content.ice_lines,
+        buffers[0]
+      ) as number[][];
+
+      pending.delete(content.feature);
+      touch(content.feature);
+      const evicted = order.splice(0, Math.max(0, order.length - capacity));
+
+      store.update((featureToIceLines) => {
+        const updated = { ...featureToIceLines };
+        evicted.forEach((feature) => delete updated[feature]);
+        updated[content.feature] = iceLines;
+        return updated;
+      });
+    },
+    null
+  );
+
+  function request(feature: string) {
+    if (order.includes(feature)) {
+      touch(feature);
+    } else if (!pending.has(feature)) {
+      pending.add(feature);
+      model.send({ type: 'request_ice_lines', feature }, {});
+    }
+  }
+
+  return { store, request };
+}
+
 // ==== Stores that are synced with traitlets ====
 
 export let feature_names: Writable<string[]>;
@@ -79,7 +151,7 @@ export let labels: Writable<number[]>;
 export let num_instances: Writable<number>;
 
 export let one_way_pds: Writable<OneWayPD[]>;
-export let feature_to_ice_lines: Writable<Record<string, number[][]>>;
+export let feature_to_ice_lines: Readable<Record<string, number[][]>>;
 export let two_way_pds: Writable<TwoWayPD[]>;
 
 export let two_way_pdp_extent: Writable<[number, number]>;
@@ -100,8 +172,15 @@ export let two_way_to_calculate: Writable<string[]>;
 
 export let cluster_update: Writable<ClusterUpdate>;
 
+export let lazy_ice_lines: Writable<boolean>;
+export let ice_cache_size: Writable<number>;
+
 // ==== Stores that are not synced with traitlets ====
 
+// Loads the ICE lines for a feature when lazy_ice_lines is true.
+// Otherwise, all of the ICE lines are already in feature_to_ice_lines.
+export let requestIceLines: (feature: string) => void;
+
 export let selectedTab: Writable<Tab>;
 
 export let featureToPd: Readable<Map<string, OneWayPD>>;
@@ -163,11 +242,26 @@ export function setStores(model: DOMWidgetModel): void {
   num_instances = createSyncedStore<number>('num_instances', 0, model);
 
   one_way_pds = createSyncedStore<OneWayPD[]>('one_way_pds', [], model);
-  feature_to_ice_lines = createSyncedStore<Record<string, number[][]>>(
-    'feature_to_ice_lines',
-    {},
-    model
-  );
+
+  lazy_ice_lines = createSyncedStore<boolean>('lazy_ice_lines', false, model);
+  ice_cache_size = createSyncedStore<number>('ice_cache_size', 32, model);
+
+  if (model.get('lazy_ice_lines')) {
+    const lazyIceLines = createLazyIceLinesStore(
+      model,
+      model.get('ice_cache_size')
+    );
+    feature_to_ice_lines = lazyIceLines.store;
+    requestIceLines = lazyIceLines.request;
+  } else {
+    feature_to_ice_lines = createSyncedStore<Record<string, number[][]>>(
+      'feature_to_ice_lines',
+      {},
+      model
+    );
+    requestIceLines = () => undefined;
+  }
+
   two_way_pds = createSyncedStore<TwoWayPD[]>('two_way_pds', [], model);
 
   two_way_pdp_extent = createSyncedStore<[number, number]>(
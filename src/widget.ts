@@ -1,6 +1,7 @@
 import { DOMWidgetModel, DOMWidgetView } from '@jupyter-widgets/base';
 import type { ISerializers } from '@jupyter-widgets/base';
 import { setStores } from './stores';
+import { deserializeArrays } from './serializers';
 
 import { MODULE_NAME, MODULE_VERSION } from './version';
 
@@ -36,12 +37,19 @@ export class PDPilotModel extends DOMWidgetModel {
       highlighted_indices: [],
       two_way_to_calculate: [],
       cluster_update: {},
+      lazy_ice_lines: false,
+      ice_cache_size: 32,
     };
   }
 
   static serializers: ISerializers = {
     ...DOMWidgetModel.serializers,
-    // Add any extra serializers here
+    // large numeric arrays are sent from Python as binary buffers
+    dataset: { deserialize: deserializeArrays },
+    labels: { deserialize: deserializeArrays },
+    one_way_pds: { deserialize: deserializeArrays },
+    feature_to_ice_lines: { deserialize: deserializeArrays },
+    two_way_pds: { deserialize: deserializeArrays },
   };
 
   static model_name = 'PDPilotModel';
@@ -0,0 +1,56 @@
+import { test } from 'uvu';
+import * as assert from 'uvu/assert';
+import { decodeArray, deserializeArrays } from '../src/serializers';
+
+test('decode array', () => {
+  const values = new Float32Array([0, 0.5, 1, 1.5, 2, 2.5]);
+  const buffer = new DataView(values.buffer);
+
+  assert.equal(decodeArray({ __ndarray__: 'float32', shape: [6] }, buffer), [
+    0, 0.5, 1, 1.5, 2, 2.5,
+  ]);
+  assert.equal(
+    decodeArray({ __ndarray__: 'float32', shape: [2, 3] }, buffer),
+    [
+      [0, 0.5, 1],
+      [1.5, 2, 2.5],
+    ]
+  );
+  assert.equal(
+    decodeArray({ __ndarray__: 'float32', shape: [3, 2] }, buffer),
+    [
+      [0, 0.5],
+      [1, 1.5],
+      [2, 2.5],
+    ]
+  );
+});
+
+test('deserialize arrays', () => {
+  const indices = new Int32Array([3, 1, 2]);
+  const flags = new Uint8Array([1, 0]);
+
+  const value = {
+    name: 'x1',
+    small: [1, 2],
+    clusters: [
+      {
+        indices: {
+          __ndarray__: 'int32',
+          shape: [3],
+          buffer: new DataView(indices.buffer),
+        },
+      },
+    ],
+    flags: { __ndarray__: 'bool', shape: [2], buffer: flags.buffer },
+  };
+
+  assert.equal(deserializeArrays(value), {
+    name: 'x1',
+    small: [1, 2],
+    clusters: [{ indices: [3, 1, 2] }],
+    flags: [true, false],
+  });
+});
+
+test.run();